@@ -0,0 +1,275 @@
+# api/approximate.py
+
+"""
+Approximate analytics for the chart analysis text.
+
+In 'approximate' mode the statistics quoted in analysis_text (means,
+medians, spread, skewness, correlations and their p-values, group sums) are
+estimated from a uniform random sample instead of every row. Each estimate
+carries a confidence interval and is printed as "value [low, high]". When an
+interval is wider than the tolerance (default +/-1% of the value, absolute
+for correlations) the statistic is recomputed exactly, so a number is never
+reported with less precision than was asked for.
+
+hypertune_params options:
+  - 'analytics_mode': 'exact' | 'approximate' (default 'exact')
+  - 'approx_sample_rows': sample size (default APPROX_SAMPLE_ROWS)
+  - 'approx_tolerance': accepted relative half-width (default APPROX_TOLERANCE)
+  - 'approx_confidence': confidence level of the intervals (default 0.95)
+
+Exact mode returns plain floats from the same calls, so generators do not
+branch on the mode.
+"""
+
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from . import correlation
+from . import sampling
+
+MODES = ('exact', 'approximate')
+
+
+class Estimate(float):
+    """A float carrying a confidence interval; formats as 'value [low, high]'."""
+
+    def __new__(cls, value, low, high):
+        obj = super().__new__(cls, value)
+        obj.low = float(low)
+        obj.high = float(high)
+        return obj
+
+    def __format__(self, format_spec):
+        return f"{float(self):{format_spec}} [{self.low:{format_spec}}, {self.high:{format_spec}}]"
+
+    def __reduce__(self):
+        return (Estimate, (float(self), self.low, self.high))
+
+
+class ApproxCorrelations(correlation.CorrelationMatrices):
+    """Sample-based correlation matrices whose pair()/estimate() carry Fisher-z intervals."""
+
+    def __init__(self, sampled, low, high, pearson_p):
+        super().__init__(sampled.pearson, pearson_p, sampled.spearman, sampled.spearman_p, sampled.counts)
+        self.low = low
+        self.high = high
+
+    def estimate(self, x_col, y_col):
+        r = self.pearson.at[x_col, y_col]
+        if pd.isna(r):
+            return float(r)
+        return Estimate(r, self.low.at[x_col, y_col], self.high.at[x_col, y_col])
+
+    def pair(self, x_col, y_col, method='pearson'):
+        r, p, n = super().pair(x_col, y_col, method)
+        if method == 'pearson':
+            r = self.estimate(x_col, y_col)
+        return r, p, n
+
+
+class Analytics:
+    """Computes analysis statistics exactly or from a sample, and records what it did."""
+
+    def __init__(self, mode='exact', sample_rows=None, tolerance=None, confidence=0.95, random_state=None):
+        self.mode = mode
+        self.sample_rows = int(sample_rows or getattr(settings, 'APPROX_SAMPLE_ROWS', 200_000))
+        self.tolerance = float(tolerance if tolerance is not None else getattr(settings, 'APPROX_TOLERANCE', 0.01))
+        self.confidence = float(confidence)
+        self.random_state = random_state
+        self.z = NormalDist().inv_cdf(0.5 + self.confidence / 2)
+        self.estimated = []  # statistics reported from the sample
+        self.fallbacks = []  # statistics recomputed exactly because the interval was too wide
+        self.population_rows = 0
+
+    @classmethod
+    def from_params(cls, hypertune_params, random_state=None):
+        """Builds an Analytics object from hypertune_params, raising ValueError on bad options."""
+        hypertune_params = hypertune_params or {}
+        mode = hypertune_params.get('analytics_mode') or 'exact'
+        if mode not in MODES:
+            raise ValueError(f"Invalid analytics_mode '{mode}'. Must be one of: {', '.join(MODES)}.")
+        try:
+            sample_rows = hypertune_params.get('approx_sample_rows')
+            sample_rows = int(sample_rows) if sample_rows not in (None, '') else None
+            tolerance = hypertune_params.get('approx_tolerance')
+            tolerance = float(tolerance) if tolerance not in (None, '') else None
+            confidence = float(hypertune_params.get('approx_confidence') or 0.95)
+        except (TypeError, ValueError):
+            raise ValueError("approx_sample_rows, approx_tolerance and approx_confidence must be numbers.")
+        if sample_rows is not None and sample_rows < 100:
+            raise ValueError("approx_sample_rows must be at least 100.")
+        if tolerance is not None and not 0 < tolerance < 1:
+            raise ValueError("approx_tolerance must be between 0 and 1.")
+        if not 0.5 <= confidence < 1:
+            raise ValueError("approx_confidence must be between 0.5 and 1.")
+        return cls(mode, sample_rows, tolerance, confidence, random_state)
+
+    @property
+    def approximate(self):
+        return self.mode == 'approximate'
+
+    def report(self):
+        """Summary for the API response."""
+        return {
+            'mode': self.mode, 'sample_rows': self.sample_rows, 'population_rows': self.population_rows,
+            'confidence': self.confidence, 'tolerance': self.tolerance,
+            'estimated': self.estimated, 'exact_fallbacks': self.fallbacks,
+        }
+
+    def summary_line(self):
+        """One line for analysis_text explaining the bracketed intervals (None when nothing was estimated)."""
+        if not self.estimated:
+            return None
+        return (f"\nNote: values shown as 'value [low, high]' are estimated from a random sample of "
+                f"{min(self.sample_rows, self.population_rows):,} of {self.population_rows:,} rows "
+                f"({self.confidence:.0%} confidence intervals).")
+
+    # --- Internals ---
+
+    def _draw(self, obj):
+        """Uniform sample of obj, or None when sampling is off or would not save anything."""
+        if not self.approximate or len(obj) <= self.sample_rows:
+            return None
+        self.population_rows = max(self.population_rows, len(obj))
+        return sampling.uniform_sample(obj, self.sample_rows, self.random_state)
+
+    @staticmethod
+    def _fpc(n, population):
+        """Finite population correction for a sample of n out of `population`."""
+        return np.sqrt(max(population - n, 0) / (population - 1)) if population > 1 else 0.0
+
+    def _accept(self, name, value, half_width, scale):
+        ok = bool(np.isfinite(value) and np.isfinite(half_width) and half_width <= self.tolerance * max(abs(value), scale))
+        (self.estimated if ok else self.fallbacks).append(name)
+        return ok
+
+    def _influence_estimate(self, name, value, influence, scale, population, exact_fn):
+        """Normal interval from the empirical influence values of a statistic."""
+        n = len(influence)
+        half_width = self.z * np.std(influence, ddof=1) / np.sqrt(n) * self._fpc(n, population)
+        if not self._accept(name, value, half_width, scale):
+            return exact_fn()
+        return Estimate(value, value - half_width, value + half_width)
+
+    # --- Univariate statistics (series should already be NaN-free) ---
+
+    def mean(self, series, name='mean'):
+        sample = self._draw(series)
+        if sample is None:
+            return series.mean()
+        values = sample.to_numpy(dtype='float64')
+        value = values.mean()
+        return self._influence_estimate(name, value, values - value, values.std(ddof=1), len(series), series.mean)
+
+    def std(self, series, name='std'):
+        sample = self._draw(series)
+        if sample is None:
+            return series.std()
+        values = sample.to_numpy(dtype='float64')
+        value = values.std(ddof=1)
+        if value == 0:
+            return self._exact(name, series.std)
+        z = (values - values.mean()) / value
+        return self._influence_estimate(name, value, value * (z ** 2 - 1) / 2, value, len(series), series.std)
+
+    def skew(self, series, name='skewness'):
+        sample = self._draw(series)
+        if sample is None:
+            return series.skew()
+        values = sample.to_numpy(dtype='float64')
+        sd = values.std(ddof=1)
+        if sd == 0:
+            return self._exact(name, series.skew)
+        value = float(sample.skew())
+        z = (values - values.mean()) / sd
+        influence = z ** 3 - 3 * z - 1.5 * value * (z ** 2 - 1)
+        # Skewness is unitless and compared against +/-0.5, so small values get an absolute floor.
+        return self._influence_estimate(name, value, influence, 1.0, len(series), series.skew)
+
+    def median(self, series, name='median'):
+        sample = self._draw(series)
+        if sample is None:
+            return series.median()
+        values = np.sort(sample.to_numpy(dtype='float64'))
+        n = len(values)
+        value = float(np.median(values))
+        # Distribution-free interval from the order statistics around n/2.
+        k = self.z * np.sqrt(n) / 2 * self._fpc(n, len(series))
+        low = values[max(int(np.floor(n / 2 - k)), 0)]
+        high = values[min(int(np.ceil(n / 2 + k)), n - 1)]
+        if not self._accept(name, value, max(value - low, high - value), values.std(ddof=1)):
+            return series.median()
+        return Estimate(value, low, high)
+
+    def _exact(self, name, exact_fn):
+        self.fallbacks.append(name)
+        return exact_fn()
+
+    # --- Correlations ---
+
+    def correlations(self, df, columns, exact_fn):
+        """
+        Correlation matrices for `columns`: exact_fn() in exact mode or when any
+        requested pair's interval is too wide, otherwise ApproxCorrelations.
+        """
+        sample = self._draw(df[columns])
+        if sample is None:
+            return exact_fn()
+        name = f"correlation({', '.join(columns)})"
+        sampled = correlation.compute_correlations(sample, columns)
+        r = sampled.pearson.to_numpy()
+        counts = sampled.counts.to_numpy()
+        population_counts = counts * (len(df) / len(sample))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fpc = np.sqrt(np.clip((population_counts - counts) / (population_counts - 1), 0, None))
+            se = fpc / np.sqrt(counts - 3)
+            fisher = np.arctanh(np.clip(r, -0.999999, 0.999999))
+            low, high = np.tanh(fisher - self.z * se), np.tanh(fisher + self.z * se)
+        off_diagonal = ~np.eye(len(columns), dtype=bool)
+        half_width = np.maximum(r - low, high - r)[off_diagonal]
+        defined = np.isfinite(r[off_diagonal])
+        if not defined.any() or not (half_width[defined] <= self.tolerance).all():
+            return self._exact(name, exact_fn)
+        self.estimated.append(name)
+
+        def frame(matrix):
+            return pd.DataFrame(matrix, index=sampled.pearson.index, columns=sampled.pearson.columns)
+        # p-values describe the full data, so they use the population pair counts.
+        return ApproxCorrelations(sampled, frame(low), frame(high), frame(correlation._p_values(r, population_counts)))
+
+    # --- Group sums ---
+
+    def group_sums(self, df, by, value_col, name=None):
+        """
+        Per-group sums of value_col. In approximate mode the totals are scaled up
+        from the sample (object Series of Estimate). Groups too rare to appear
+        in the sample cannot be detected for non-categorical columns; groups
+        with too few sampled rows widen their interval and force the exact path.
+        """
+        def exact():
+            return df.groupby(by)[value_col].sum()
+
+        sample = self._draw(df[[by, value_col]])
+        if sample is None:
+            return exact()
+        name = name or f"sum({value_col}) by {by}"
+        if isinstance(df[by].dtype, pd.CategoricalDtype) and set(df[by].cat.categories) - set(sample[by].unique()):
+            return self._exact(name, exact)
+
+        n, population = len(sample), len(df)
+        values = pd.to_numeric(sample[value_col], errors='coerce').fillna(0)
+        grouped = pd.DataFrame({'y': values, 'y2': values ** 2, 'g': sample[by]}).groupby('g', observed=True)
+        sums, sums_sq = grouped['y'].sum(), grouped['y2'].sum()
+        totals = sums * (population / n)
+        # Variance of the total estimator N * mean(y * 1[group]).
+        variance = (sums_sq / n - (sums / n) ** 2) / n
+        half_widths = self.z * population * np.sqrt(variance.clip(lower=0) * (n / max(n - 1, 1))) * self._fpc(n, population)
+        ok = (half_widths <= self.tolerance * totals.abs()) & np.isfinite(half_widths)
+        if totals.empty or not ok.all():
+            return self._exact(name, exact)
+        self.estimated.append(name)
+        totals.index.name = by
+        return pd.Series([Estimate(t, t - h, t + h) for t, h in zip(totals, half_widths)], index=totals.index, dtype=object, name=value_col)
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self):
+        # Optional warm-up: import the heavy scientific libraries once, before
+        # the server forks its workers (e.g. gunicorn --preload).
+        if getattr(settings, 'PRELOAD_HEAVY_MODULES', False):
+            from . import lazy_imports
+            lazy_imports.preload()
@@ -0,0 +1,355 @@
+# api/cleaning.py
+
+"""
+Cleaning operations on a project DataFrame.
+
+Each operation is a step dict, e.g.
+
+    {"operation": "impute", "column_name": "age", "method": "median"}
+    {"operation": "remove_column", "column_name": "notes"}
+    {"operation": "treat_outliers", "column_name": "price", "method": "cap"}
+    {"operation": "recode", "column_name": "city", "recode_map": {"NYC": "New York"}}
+    {"operation": "model_impute", "columns": ["age", "income"], "method": "knn", "n_neighbors": 5}
+    {"operation": "derive_column", "column_name": "margin", "expression": "(price - cost) / price"}
+
+validate_steps() checks the shape of a list of steps before any data is
+loaded; apply_steps() then runs them in order on one in-memory DataFrame,
+and written_columns() tells the column store (api/column_store.py) which
+columns a run of steps rewrites.
+
+Operations replace whole columns (df[name] = ...) or return a new frame and
+never write into a column's existing array: the frame they are given is a
+shallow copy sharing column data with the cached head version, which
+concurrent readers may be using (api/transformations.py).
+
+The single-operation cleaning views and CleaningPipelineView share these
+functions (through api/transformations.py, which also logs the steps), so a
+pipeline behaves exactly like the same requests sent one at a time, except
+that the data is re-described only once.
+
+Model-based imputation (BACKGROUND_OPERATIONS) is too slow for a request:
+validate_steps() only accepts it for a background job
+(transformations.apply_in_background), which passes its job handle to
+apply_steps() for progress reporting and cancellation.
+"""
+
+import numpy as np
+import pandas as pd
+
+from . import expressions
+
+IMPUTE_METHODS = ('mean', 'median', 'mode', 'constant')
+OUTLIER_METHODS = ('remove', 'cap')
+MODEL_IMPUTE_METHODS = ('knn', 'iterative')
+MODEL_IMPUTE_SAMPLE_ROWS = 50_000  # rows the imputer is fitted on
+MODEL_IMPUTE_CHUNK_ROWS = 10_000  # rows imputed between progress reports
+# Operations run only by a background job (they take the job handle)
+BACKGROUND_OPERATIONS = ('model_impute',)
+
+
+class CleaningError(ValueError):
+    """A step that cannot be applied; status_code is the HTTP status to answer with."""
+
+    def __init__(self, message, status_code=400, step_index=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.step_index = step_index
+
+
+def _require(step, *fields):
+    missing = [field for field in fields if step.get(field) in (None, '')]
+    if missing:
+        raise CleaningError(f"Missing {', '.join(missing)}.")
+
+
+def _validate_impute(step):
+    _require(step, 'column_name', 'method')
+    if step['method'] not in IMPUTE_METHODS:
+        raise CleaningError(f"Invalid imputation method: {step['method']}.")
+
+
+def _validate_remove_column(step):
+    _require(step, 'column_name')
+
+
+def _validate_treat_outliers(step):
+    _require(step, 'column_name', 'method')
+    if step['method'] not in OUTLIER_METHODS:
+        raise CleaningError(f"Invalid outlier treatment method: {step['method']}. Must be one of: {', '.join(OUTLIER_METHODS)}.")
+
+
+def _validate_recode(step):
+    _require(step, 'column_name', 'recode_map')
+    if not isinstance(step['recode_map'], dict):
+        raise CleaningError("Recode map format is incorrect.")
+
+
+def _validate_model_impute(step):
+    _require(step, 'columns', 'method')
+    if not isinstance(step['columns'], list) or not step['columns'] or not all(isinstance(name, str) for name in step['columns']):
+        raise CleaningError("columns must be a non-empty list of column names.")
+    if step['method'] not in MODEL_IMPUTE_METHODS:
+        raise CleaningError(f"Invalid imputation method: {step['method']}. Must be one of: {', '.join(MODEL_IMPUTE_METHODS)}.")
+    for field in ('n_neighbors', 'max_iter', 'sample_rows', 'seed'):
+        value = step.get(field)
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < (0 if field == 'seed' else 1)):
+            raise CleaningError(f"{field} must be a positive integer.")
+
+
+def _validate_derive_column(step):
+    _require(step, 'column_name', 'expression')
+    if not isinstance(step['column_name'], str):
+        raise CleaningError("column_name must be a string.")
+    try:
+        expressions.syntax_check(step['expression'])
+    except expressions.ExpressionError as e:
+        raise CleaningError(str(e))
+
+
+def _column(df, column_name):
+    if column_name not in df.columns:
+        raise CleaningError(f"Column '{column_name}' not found.", status_code=404)
+    return df[column_name]
+
+
+def impute(df, column_name, method, constant_value=None):
+    """Fills missing values of one column with its mean, median, mode or a constant."""
+    column = _column(df, column_name)
+    is_numeric = pd.api.types.is_numeric_dtype(column.dtype)
+    if method in ('mean', 'median') and not is_numeric:
+        raise CleaningError(f"Method '{method}' is only valid for numerical columns.")
+
+    if method == 'mean':
+        value = column.mean()
+    elif method == 'median':
+        value = column.median()
+    elif method == 'mode':
+        modes = column.mode()
+        if modes.empty:
+            raise CleaningError(f"Column '{column_name}' has no values to compute a mode from.")
+        value = modes[0]
+    elif method == 'constant':
+        # Attempt to convert constant value to the column type for consistency
+        if is_numeric:
+            try:
+                value = pd.to_numeric(constant_value)
+            except (ValueError, TypeError):
+                raise CleaningError("Constant value must be numeric for this column.")
+        else:
+            value = constant_value
+    else:
+        raise CleaningError(f"Invalid imputation method: {method}.")
+    df[column_name] = column.fillna(value)
+    return df
+
+
+def _imputer(method, n_neighbors, max_iter, seed):
+    if method == 'knn':
+        from sklearn.impute import KNNImputer
+        return KNNImputer(n_neighbors=n_neighbors)
+    from sklearn.experimental import enable_iterative_imputer  # noqa: F401 (registers IterativeImputer)
+    from sklearn.impute import IterativeImputer
+    return IterativeImputer(max_iter=max_iter, random_state=seed)
+
+
+def model_impute(df, columns, method, n_neighbors=5, max_iter=10, sample_rows=MODEL_IMPUTE_SAMPLE_ROWS, seed=0, handle=None):
+    """
+    Fills missing values of several numerical columns from each other with
+    scikit-learn's KNNImputer ('knn') or IterativeImputer ('iterative'). The
+    imputer is fitted on a seeded sample of sample_rows rows, so a replay of
+    the step gives the same result, then applied in chunks to the rows with
+    missing values. `handle` (a jobs.JobHandle) receives the progress and may
+    cancel between chunks.
+    """
+    for column_name in columns:
+        column = _column(df, column_name)
+        if not pd.api.types.is_numeric_dtype(column.dtype) or pd.api.types.is_bool_dtype(column.dtype):
+            raise CleaningError(f"Method '{method}' is only valid for numerical columns; '{column_name}' is '{column.dtype}'.")
+    columns = list(dict.fromkeys(columns))
+    values = df[columns].to_numpy(dtype='float64', na_value=np.nan, copy=True)
+    missing_rows = np.flatnonzero(np.isnan(values).any(axis=1))
+    if not len(missing_rows):
+        return df
+
+    fit_rows = values
+    if len(values) > sample_rows:
+        rng = np.random.default_rng(seed)
+        fit_rows = values[np.sort(rng.choice(len(values), sample_rows, replace=False))]
+    empty = [name for name, has_values in zip(columns, (~np.isnan(fit_rows)).any(axis=0)) if not has_values]
+    if empty:
+        raise CleaningError(f"No values to impute from in: {', '.join(empty)}.")
+    imputer = _imputer(method, n_neighbors, max_iter, seed).fit(fit_rows)
+    if handle is not None:
+        handle.set_progress(0.0, f"Fitted on {len(fit_rows)} rows; imputing {len(missing_rows)} rows")
+
+    for start in range(0, len(missing_rows), MODEL_IMPUTE_CHUNK_ROWS):
+        if handle is not None:
+            handle.check_cancelled()
+        chunk = missing_rows[start:start + MODEL_IMPUTE_CHUNK_ROWS]
+        values[chunk] = imputer.transform(values[chunk])
+        if handle is not None:
+            handle.set_progress((start + len(chunk)) / len(missing_rows))
+
+    for position, column_name in enumerate(columns):
+        if df[column_name].isnull().any():
+            df[column_name] = pd.Series(values[:, position], index=df.index, name=column_name)
+    return df
+
+
+def derive_column(df, column_name, expression):
+    """
+    Adds (or replaces) a column computed from an expression over other
+    columns (api/expressions.py), evaluated on whole columns at once.
+    """
+    try:
+        compiled = expressions.for_frame(expression, df)
+        values = compiled.evaluate(df)
+    except expressions.ExpressionError as e:
+        raise CleaningError(str(e))
+    df[column_name] = values.rename(column_name)
+    return df
+
+
+def remove_column(df, column_name):
+    _column(df, column_name)
+    return df.drop(columns=[column_name])
+
+
+def outlier_bounds(column):
+    """IQR fences (Q1 - 1.5 IQR, Q3 + 1.5 IQR) of a numerical column."""
+    values = column.dropna()
+    q1 = values.quantile(0.25); q3 = values.quantile(0.75); iqr = q3 - q1
+    return q1 - 1.5 * iqr, q3 + 1.5 * iqr
+
+
+def treat_outliers(df, column_name, method):
+    """Removes rows outside the IQR fences ('remove') or clips values to them ('cap')."""
+    column = _column(df, column_name)
+    if not pd.api.types.is_numeric_dtype(column.dtype):
+        raise CleaningError(f"Outlier treatment requires a numerical column, not '{column.dtype}'.")
+    lower, upper = outlier_bounds(column)
+    if method == 'remove':
+        return df[column.between(lower, upper, inclusive='both') | column.isnull()]
+    if method == 'cap':
+        df[column_name] = column.clip(lower=lower, upper=upper)
+        return df
+    raise CleaningError(f"Invalid outlier treatment method: {method}. Must be one of: {', '.join(OUTLIER_METHODS)}.")
+
+
+def _distinct(column):
+    """(codes, distinct values) of a column; code -1 marks a missing value."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy(), column.cat.categories
+    return pd.factorize(column)
+
+
+def recode(df, column_name, recode_map):
+    """
+    Replaces values of one column according to recode_map, whose keys are
+    the values as strings (as listed by the unique-values view). Only the
+    distinct values are converted and mapped; the rows are then re-pointed
+    at the mapped values through their codes. Missing values stay missing,
+    values mapped to None become missing, values mapped to the same
+    replacement merge, and a categorical column stays categorical.
+    """
+    column = _column(df, column_name)
+    if not isinstance(recode_map, dict):
+        raise CleaningError("Recode map format is incorrect.")
+    codes, categories = _distinct(column)
+    if not len(categories):
+        return df
+    keys = pd.Index(categories).astype(str)
+    if not keys.isin(list(recode_map)).any():
+        return df
+    mapped = pd.Index([recode_map.get(key, value) for key, value in zip(keys, categories)], dtype=object)
+    new_codes, new_categories = pd.factorize(mapped)
+    codes = np.where(codes >= 0, new_codes[codes], -1)
+    values = pd.Categorical.from_codes(codes, categories=new_categories)
+    recoded = pd.Series(values, index=df.index, name=column_name)
+    if not isinstance(column.dtype, pd.CategoricalDtype):
+        recoded = recoded.astype(object).infer_objects()
+    df[column_name] = recoded
+    return df
+
+
+def _rows_or_column(step):
+    # Removing outlier rows changes every column; capping changes only this one
+    return None if step['method'] == 'remove' else {step['column_name']}
+
+
+# operation name -> (validator, apply function taking (df, step) or, for BACKGROUND_OPERATIONS, (df, step, handle),
+#                    columns written: a function of the step returning a set of labels, or None when rows change)
+OPERATIONS = {
+    'impute': (_validate_impute, lambda df, step: impute(df, step['column_name'], step['method'], step.get('constant_value')),
+               lambda step: {step['column_name']}),
+    'remove_column': (_validate_remove_column, lambda df, step: remove_column(df, step['column_name']),
+                      lambda step: set()),
+    'treat_outliers': (_validate_treat_outliers, lambda df, step: treat_outliers(df, step['column_name'], step['method']),
+                       _rows_or_column),
+    'recode': (_validate_recode, lambda df, step: recode(df, step['column_name'], step['recode_map']),
+               lambda step: {step['column_name']}),
+    'model_impute': (_validate_model_impute,
+                     lambda df, step, handle: model_impute(df, step['columns'], step['method'], step.get('n_neighbors', 5),
+                                                           step.get('max_iter', 10), step.get('sample_rows', MODEL_IMPUTE_SAMPLE_ROWS),
+                                                           step.get('seed', 0), handle),
+                     lambda step: set(step['columns'])),
+    'derive_column': (_validate_derive_column, lambda df, step: derive_column(df, step['column_name'], step['expression']),
+                      lambda step: {step['column_name']}),
+}
+
+
+def written_columns(steps):
+    """
+    Labels of the columns whose values the steps may change, or None when a
+    step may add or remove rows (then every column changes). Dropped columns
+    are not included: they are simply absent from the result.
+    """
+    written = set()
+    for step in steps:
+        columns = OPERATIONS[step['operation']][2](step)
+        if columns is None:
+            return None
+        written |= columns
+    return written
+
+
+def _step_message(steps, index, prefix, error):
+    # A single step is what the single-operation views send: keep their plain messages
+    return f"{prefix}: {error}" if len(steps) > 1 else str(error)
+
+
+def validate_steps(steps, background=False):
+    """
+    Checks that steps is a non-empty list of well-formed step dicts; raises
+    CleaningError naming the step. BACKGROUND_OPERATIONS are accepted only
+    with background=True.
+    """
+    if not isinstance(steps, list) or not steps:
+        raise CleaningError("steps must be a non-empty list of cleaning operations.")
+    for index, step in enumerate(steps):
+        try:
+            if not isinstance(step, dict):
+                raise CleaningError("Each step must be an object.")
+            operation = step.get('operation')
+            if operation not in OPERATIONS:
+                raise CleaningError(f"Unknown operation '{operation}'. Must be one of: {', '.join(OPERATIONS)}.")
+            if operation in BACKGROUND_OPERATIONS and not background:
+                raise CleaningError(f"Operation '{operation}' runs as a background job (POST /api/projects/model-impute/).")
+            OPERATIONS[operation][0](step)
+        except CleaningError as e:
+            raise CleaningError(_step_message(steps, index, f"Step {index + 1}", e), e.status_code, index)
+
+
+def apply_steps(df, steps, handle=None):
+    """
+    Applies validated steps in order and returns the resulting DataFrame.
+    `handle` is the job handle passed to BACKGROUND_OPERATIONS (None outside a job).
+    """
+    for index, step in enumerate(steps):
+        try:
+            operation = OPERATIONS[step['operation']][1]
+            df = operation(df, step, handle) if step['operation'] in BACKGROUND_OPERATIONS else operation(df, step)
+        except CleaningError as e:
+            prefix = f"Step {index + 1} ({step['operation']} '{step.get('column_name') or ', '.join(step.get('columns', []))}')"
+            raise CleaningError(_step_message(steps, index, prefix, e), e.status_code, index)
+    return df
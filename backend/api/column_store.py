@@ -0,0 +1,168 @@
+# api/column_store.py
+
+"""
+Column-granular, copy-on-write project storage.
+
+A project's data lives in a directory derived from its data path
+(user_1/sales.pkl -> user_1/sales.columns/):
+
+    manifest-000003.pkl          one per stored version
+    manifest-000003.sample.pkl   that version's stored sample (api/sampling.py)
+    v000000-index.pkl            the row index
+    v000000-c0000.pkl, ...       one pickled Series per column
+    v000003-c0002.pkl            a column rewritten at version 3
+
+A manifest holds the column labels, the file of each column and the index
+file. Files are never modified once written: a new version writes files only
+for the columns it changed (and the index when rows changed) and points at
+the previous version's files for the rest, so dropping a column is just a
+manifest without it.
+
+Retained versions are what undo can return to instantly. prune() keeps the
+current version plus the newest others, up to COLUMN_STORE_RETAINED_VERSIONS
+versions and COLUMN_STORE_RETENTION_BYTES bytes of files (a file shared by
+several versions counts once), and deletes files no kept manifest references.
+"""
+
+import os
+import pickle
+import re
+import shutil
+
+import pandas as pd
+from django.conf import settings
+
+from . import metrics
+from . import sampling
+from . import timing
+
+_MANIFEST_NAME = re.compile(r'^manifest-(\d+)\.pkl$')
+_DATA_FILE_NAME = re.compile(r'^v(\d+)-(index|c\d+)\.pkl$')
+
+
+def store_dir(data_path):
+    return os.path.splitext(data_path)[0] + '.columns'
+
+
+def manifest_path(data_path, version):
+    return os.path.join(store_dir(data_path), f"manifest-{version:06d}.pkl")
+
+
+def has_version(data_path, version):
+    return os.path.exists(manifest_path(data_path, version))
+
+
+def load_manifest(data_path, version):
+    return pd.read_pickle(manifest_path(data_path, version))
+
+
+def _dump(obj, path):
+    """Pickles obj to path atomically; returns the bytes written."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as fh:
+        pickle.dump(obj, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def write_version(data_path, df, version, base_version=None, changed=None, metadata=None):
+    """
+    Stores df as `version`. With a base_version, columns not in `changed`
+    (a set of labels) reuse the base version's files and the index is reused;
+    changed=None means rows may have changed, so everything is written.
+    `metadata` (the column metadata of df) is kept in the manifest.
+    Returns the number of bytes written.
+    """
+    directory = store_dir(data_path)
+    os.makedirs(directory, exist_ok=True)
+    base_files, index_file = {}, None
+    if base_version is not None and changed is not None and df.columns.is_unique and has_version(data_path, base_version):
+        base = load_manifest(data_path, base_version)
+        base_files = dict(zip(base['labels'], base['files']))
+        index_file = base['index']
+
+    prefix = f"v{version:06d}"
+    with timing.span('save') as stage:
+        written = 0
+        if index_file is None:
+            index_file = f"{prefix}-index.pkl"
+            written += _dump(df.index, os.path.join(directory, index_file))
+        files = []
+        for position, label in enumerate(df.columns):
+            file_name = base_files.get(label) if changed is not None and label not in changed else None
+            if file_name is None:
+                file_name = f"{prefix}-c{position:04d}.pkl"
+                written += _dump(df.iloc[:, position].reset_index(drop=True), os.path.join(directory, file_name))
+            files.append(file_name)
+        manifest = {'version': version, 'rows': len(df), 'labels': df.columns, 'files': files, 'index': index_file,
+                    'metadata': metadata}
+        # Written last: a version exists only once all of its files do
+        written += _dump(manifest, manifest_path(data_path, version))
+        stage.bytes = written
+    return written
+
+
+def read_version(data_path, version):
+    """Loads a stored version as a DataFrame (timed as the 'load' stage)."""
+    directory = store_dir(data_path)
+    manifest = load_manifest(data_path, version)
+    paths = [os.path.join(directory, name) for name in manifest['files']]
+    with timing.span('load') as stage:
+        index_path = os.path.join(directory, manifest['index'])
+        stage.bytes = sum(os.path.getsize(path) for path in paths) + os.path.getsize(index_path)
+        metrics.MEDIA_BYTES_READ.inc(stage.bytes)
+        index = pd.read_pickle(index_path)
+        if not paths:
+            return pd.DataFrame(index=index, columns=manifest['labels'])
+        df = pd.concat([pd.read_pickle(path) for path in paths], axis=1)
+        df.columns = manifest['labels']
+        df.index = index
+        return df
+
+
+def stored_versions(data_path):
+    directory = store_dir(data_path)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(int(match.group(1)) for match in map(_MANIFEST_NAME.match, os.listdir(directory)) if match)
+
+
+def _manifest_files(manifest):
+    return set(manifest['files']) | {manifest['index']}
+
+
+def prune(data_path, current_version):
+    """
+    Keeps current_version and the newest other versions within
+    COLUMN_STORE_RETAINED_VERSIONS and COLUMN_STORE_RETENTION_BYTES; deletes
+    the other manifests, their samples and files no kept manifest references.
+    """
+    max_versions = getattr(settings, 'COLUMN_STORE_RETAINED_VERSIONS', 20)
+    budget = getattr(settings, 'COLUMN_STORE_RETENTION_BYTES', 2 * 1024 ** 3)
+    versions = stored_versions(data_path)
+    directory = store_dir(data_path)
+
+    kept, kept_files, kept_bytes = [], set(), 0
+    for version in sorted(versions, key=lambda v: (v != current_version, -v)):
+        files = _manifest_files(load_manifest(data_path, version))
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in files - kept_files)
+        if version != current_version and (len(kept) >= max_versions or kept_bytes + size > budget):
+            break
+        kept.append(version)
+        kept_files |= files
+        kept_bytes += size
+
+    for version in set(versions) - set(kept):
+        path = manifest_path(data_path, version)
+        os.remove(path)
+        sampling.remove_stored_sample(path)
+    newest = max(versions, default=0)
+    for name in os.listdir(directory):
+        match = _DATA_FILE_NAME.match(name)
+        # Files of a version newer than every manifest belong to a write in progress
+        if match and name not in kept_files and int(match.group(1)) < newest:
+            os.remove(os.path.join(directory, name))
+
+
+def remove(data_path):
+    shutil.rmtree(store_dir(data_path), ignore_errors=True)
@@ -0,0 +1,106 @@
+# api/column_types.py
+
+"""
+Column type registry.
+
+Semantic column types (numerical / temporal / categorical) are resolved once,
+when a project's data is written (upload, SQL export, every cleaning step),
+and stored in DataProject.metadata_json together with the physical dtype,
+cardinality, missing count and min/max. ColumnTypes is the in-memory lookup
+the chart generators use instead of re-sniffing the data on every request.
+"""
+
+import warnings
+
+import pandas as pd
+
+from . import sampling
+
+# Non-null values tried with pd.to_datetime when deciding whether an object column is temporal.
+TEMPORAL_SNIFF_ROWS = 100
+
+
+def infer_type(series):
+    """Semantic type of a column: 'numerical', 'temporal' or 'categorical'."""
+    dtype = series.dtype
+    if pd.api.types.is_numeric_dtype(dtype): return 'numerical'
+    if pd.api.types.is_datetime64_any_dtype(dtype): return 'temporal'
+    if dtype == 'object':
+        non_null = series.dropna()
+        if non_null.empty:
+            return 'categorical'
+        try:
+            # Seeded sample, so the same data always resolves to the same type
+            probe = non_null.sample(min(TEMPORAL_SNIFF_ROWS, len(non_null)), random_state=sampling.derive_seed('column_type', series.name))
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', UserWarning)
+                pd.to_datetime(probe, errors='raise')
+            return 'temporal'
+        except (ValueError, TypeError, OverflowError):
+            return 'categorical'
+    return 'categorical'
+
+
+def _json_scalar(value):
+    if value is None or pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value.item() if hasattr(value, 'item') else value
+
+
+def column_info(series):
+    """Registry entry for one column."""
+    col_type = infer_type(series)
+    info = {
+        'name': series.name, 'type': col_type, 'dtype': str(series.dtype),
+        'unique_values': int(series.nunique()), 'missing_count': int(series.isnull().sum()),
+        'min': None, 'max': None,
+    }
+    values = series
+    if col_type == 'temporal' and not pd.api.types.is_datetime64_any_dtype(series.dtype):
+        values = pd.to_datetime(series, errors='coerce')
+    if col_type in ('numerical', 'temporal') and not pd.api.types.is_bool_dtype(series.dtype):
+        info['min'] = _json_scalar(values.min())
+        info['max'] = _json_scalar(values.max())
+    return info
+
+
+def build_metadata(df):
+    """The metadata_json payload for a DataFrame (summary counts, column registry and preview rows)."""
+    return {
+        'rows': len(df), 'cols': len(df.columns),
+        'metadata': [column_info(df[col]) for col in df.columns],
+        'first_n_rows': df.head(5).to_json(orient='records', date_format='iso'),
+    }
+
+
+class ColumnTypes:
+    """Read-only lookup over the column registry stored in metadata_json."""
+
+    def __init__(self, entries=None):
+        # Entries written before the registry (name, type, unique_values and
+        # missing_count only) have no dtype; they are kept for name lookups
+        self._entries = {entry['name']: entry for entry in (entries or []) if 'name' in entry and 'type' in entry}
+
+    @classmethod
+    def from_metadata(cls, metadata_json):
+        return cls((metadata_json or {}).get('metadata'))
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def info(self, name):
+        return self._entries.get(name)
+
+    def type_of(self, name, dtype=None):
+        """
+        Registered semantic type of a column, or None when unknown. Passing the
+        column's current dtype guards against stale entries: a mismatch (e.g. a
+        column converted after the registry was written), or an older entry
+        without a stored dtype, returns None.
+        """
+        entry = self._entries.get(name)
+        if entry is None or (dtype is not None and entry.get('dtype') != str(dtype)):
+            return None
+        return entry['type']
@@ -0,0 +1,161 @@
+# api/correlation.py
+
+"""
+Correlation service shared by the chart generators.
+
+Pearson and Spearman matrices (and their p-values) are computed for a set of
+numerical columns in one vectorized pass and cached per
+(project, project version, filter fingerprint), so generators that need the
+same pairs (heatmap, pair plot, scatter, bubble, ...) never recompute them.
+"""
+
+import hashlib
+import json
+import warnings
+
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+
+from . import metrics
+
+CACHE_PREFIX = 'corr'
+CACHE_TIMEOUT = 60 * 60  # seconds
+
+
+def filter_fingerprint(filters):
+    """Stable short hash of a filters dict (order independent)."""
+    if not filters:
+        return 'nofilter'
+    payload = json.dumps(filters, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class CorrelationMatrices:
+    """Pearson/Spearman coefficient and p-value matrices for a set of columns."""
+
+    def __init__(self, pearson, pearson_p, spearman, spearman_p, counts):
+        self.pearson = pearson
+        self.pearson_p = pearson_p
+        self.spearman = spearman
+        self.spearman_p = spearman_p
+        self.counts = counts
+
+    @property
+    def columns(self):
+        return list(self.pearson.columns)
+
+    def covers(self, columns):
+        return set(columns).issubset(self.pearson.columns)
+
+    def pair(self, x_col, y_col, method='pearson'):
+        """Returns (r, p_value, n) for one pair; r is NaN when undefined (e.g. constant data)."""
+        matrix, p_matrix = (self.spearman, self.spearman_p) if method == 'spearman' else (self.pearson, self.pearson_p)
+        return float(matrix.at[x_col, y_col]), float(p_matrix.at[x_col, y_col]), int(self.counts.at[x_col, y_col])
+
+    def estimate(self, x_col, y_col):
+        """Pearson r for one pair (approximate results attach a confidence interval)."""
+        return float(self.pearson.at[x_col, y_col])
+
+    def matrix(self, columns, method='pearson'):
+        source = self.spearman if method == 'spearman' else self.pearson
+        return source.loc[columns, columns]
+
+
+# --- Vectorized computation ---
+
+def _pairwise_pearson(values):
+    """
+    Pairwise-complete Pearson r and observation counts for every column pair
+    of a 2-D float array (NaN marks missing values).
+    """
+    mask = ~np.isnan(values)
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        if mask.all():
+            n_rows = values.shape[0]
+            counts = np.full((values.shape[1], values.shape[1]), float(n_rows))
+            centered = values - values.mean(axis=0)
+            cov = centered.T @ centered
+            var = np.diag(cov)
+            r = cov / np.sqrt(np.outer(var, var))
+        else:
+            weights = mask.astype(float)
+            # Centering on the column mean keeps the sums well conditioned.
+            centered = np.where(mask, values - np.nanmean(values, axis=0), 0.0)
+            counts = weights.T @ weights
+            sum_x = centered.T @ weights            # sum of x_i over rows where i and j are present
+            sum_xx = (centered ** 2).T @ weights
+            sum_xy = centered.T @ centered
+            cov = sum_xy - sum_x * sum_x.T / counts
+            var_x = sum_xx - sum_x ** 2 / counts
+            r = cov / np.sqrt(var_x * var_x.T)
+    return np.clip(r, -1.0, 1.0), counts
+
+
+def _p_values(r, counts):
+    """Two-sided p-values for H0: r == 0 (same t-test scipy.stats.pearsonr uses)."""
+    from scipy import stats
+    dof = counts - 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_abs = np.sqrt(r ** 2 * dof / (1.0 - r ** 2))
+        p = 2 * stats.t.sf(t_abs, dof)
+    p[dof <= 0] = np.nan
+    return p
+
+
+def compute_correlations(df, columns):
+    """
+    Computes Pearson and Spearman matrices with p-values for the given numerical
+    columns. Spearman ranks each column once (NaNs left unranked) and correlates
+    the ranks pairwise, which is exact when the columns have no missing values.
+    """
+    columns = list(dict.fromkeys(columns))
+    numeric = df[columns].apply(pd.to_numeric, errors='coerce')
+    values = numeric.to_numpy(dtype='float64', na_value=np.nan)
+    ranks = numeric.rank(method='average').to_numpy(dtype='float64', na_value=np.nan)
+
+    pearson, counts = _pairwise_pearson(values)
+    spearman, _ = _pairwise_pearson(ranks)
+
+    def frame(matrix):
+        return pd.DataFrame(matrix, index=columns, columns=columns)
+
+    return CorrelationMatrices(
+        pearson=frame(pearson), pearson_p=frame(_p_values(pearson, counts)),
+        spearman=frame(spearman), spearman_p=frame(_p_values(spearman, counts)),
+        counts=frame(counts),
+    )
+
+
+def get_correlations(df, columns, cache_key=None):
+    """
+    Returns CorrelationMatrices covering `columns`, served from the cache when a
+    previous request with the same cache_key already computed them. A cached
+    entry missing some columns is recomputed for the union so it keeps growing.
+    """
+    if not cache_key:
+        return compute_correlations(df, columns)
+
+    key = f"{CACHE_PREFIX}:{':'.join(str(part) for part in cache_key)}"
+    cached = cache.get(key)
+    hit = cached is not None and cached.covers(columns)
+    metrics.record_cache('correlation', hit)
+    if hit:
+        return cached
+
+    wanted = list(columns)
+    if cached is not None:
+        wanted = cached.columns + [c for c in columns if c not in cached.columns]
+    result = compute_correlations(df, wanted)
+    cache.set(key, result, CACHE_TIMEOUT)
+    return result
+
+
+def ranked_pairs(matrix):
+    """Splits the upper triangle of a correlation matrix into (positive, negative) pairs, strongest first."""
+    cols = list(matrix.columns)
+    rows_idx, cols_idx = np.triu_indices(len(cols), k=1)
+    values = matrix.to_numpy()[rows_idx, cols_idx]
+    pairs = pd.Series(values, index=pd.MultiIndex.from_arrays([[cols[i] for i in rows_idx], [cols[j] for j in cols_idx]])).dropna()
+    return pairs[pairs > 0].sort_values(ascending=False), pairs[pairs < 0].sort_values(ascending=True)
@@ -0,0 +1,145 @@
+# api/dry_run.py
+
+"""
+Dry-run previews of cleaning steps.
+
+Every cleaning endpoint accepts "dry_run": true. preview() then runs the
+steps on the project's stored sample (api/sampling.py; the whole data when
+it is small) instead of the full data, writes nothing, and compares the
+result with the sample before the change using vectorized masks:
+
+  - rows_affected: rows removed plus rows with at least one changed (or,
+    in an added column, non-missing) value,
+    and estimated_rows_affected scaled to the full data (exact=True when the
+    sample is the whole data),
+  - cells_changed per column, columns removed/added,
+  - before/after summaries (the column registry entry plus mean/std) of the
+    columns the steps touch,
+  - a few example rows before and after.
+
+Statistics the steps compute (outlier fences, means, ...) come from the
+sample too, so for sampled data the preview is an estimate. Model-based
+imputation (cleaning.BACKGROUND_OPERATIONS) grows faster than linearly with
+the rows, so a preview containing it runs on a seeded subsample of at most
+DRY_RUN_MODEL_ROWS rows of the stored sample.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from . import cleaning
+from . import column_types
+from . import sampling
+from . import timing
+from . import transformations
+
+EXAMPLE_ROWS = 5
+
+
+def requested(request):
+    """Whether a cleaning request asks for a dry run ("dry_run": true in the body, or ?dry_run=1)."""
+    value = request.data.get('dry_run', request.query_params.get('dry_run'))
+    return str(value).lower() in ('1', 'true')
+
+
+def _number(value):
+    return float(value) if pd.notna(value) else None
+
+
+def _summary(series):
+    info = column_types.column_info(series)
+    if info['type'] == 'numerical' and not pd.api.types.is_bool_dtype(series.dtype):
+        info['mean'] = _number(series.mean())
+        info['std'] = _number(series.std())
+    return info
+
+
+def _records(df):
+    return json.loads(df.to_json(orient='records', date_format='iso'))
+
+
+def _changed(before, after):
+    """Per-row mask of values that differ (missing on both sides counts as equal)."""
+    if isinstance(before.dtype, pd.CategoricalDtype) or isinstance(after.dtype, pd.CategoricalDtype):
+        # Categoricals with different categories cannot be compared directly
+        before, after = before.astype(object), after.astype(object)
+    same = before.eq(after) | (before.isna() & after.isna())
+    return ~same.to_numpy(dtype=bool)
+
+
+def _touched_columns(steps):
+    columns = []
+    for step in steps:
+        columns.extend([step['column_name']] if step.get('column_name') else step.get('columns') or [])
+    return list(dict.fromkeys(columns))
+
+
+def compare(before, after, steps, examples=EXAMPLE_ROWS):
+    """The dry-run report for steps that turned `before` into `after` (both in the same row index)."""
+    aligned = before.index.is_unique and after.index.is_unique
+    if aligned:
+        removed_rows = before.index.difference(after.index, sort=False)
+        kept = before if len(removed_rows) == 0 else before.loc[after.index]
+    else:
+        removed_rows, kept = pd.Index([]), None
+    common = [label for label in before.columns if label in after.columns]
+
+    cells_changed, changed_rows = {}, np.zeros(len(after), dtype=bool)
+    if kept is not None:
+        for label in common:
+            mask = _changed(kept[label], after[label])
+            if mask.any():
+                cells_changed[label] = int(mask.sum())
+                changed_rows |= mask
+
+    removed_columns = [label for label in before.columns if label not in after.columns]
+    added_columns = [label for label in after.columns if label not in before.columns]
+    for label in added_columns:
+        # A new column affects the rows it gives a value
+        changed_rows |= after[label].notna().to_numpy(dtype=bool)
+    summarized = list(dict.fromkeys([label for label in _touched_columns(steps) if label in before.columns or label in after.columns]
+                                    + list(cells_changed) + added_columns))
+    summaries = [{
+        'column_name': label,
+        'before': _summary(before[label]) if label in before.columns else None,
+        'after': _summary(after[label]) if label in after.columns else None,
+    } for label in summarized]
+
+    example_rows = []
+    if kept is not None:
+        # Removed rows first, then changed ones
+        for label in removed_rows[:examples]:
+            example_rows.append({'before': _records(before.loc[[label]])[0], 'after': None})
+        changed_index = after.index[changed_rows][:examples - len(example_rows)]
+        if len(changed_index):
+            for old, new in zip(_records(before.loc[changed_index]), _records(after.loc[changed_index])):
+                example_rows.append({'before': old, 'after': new})
+
+    rows_removed = len(removed_rows) if aligned else max(len(before) - len(after), 0)
+    return {
+        'rows_affected': rows_removed + int(changed_rows.sum()), 'rows_removed': rows_removed,
+        'cells_changed': cells_changed, 'columns_removed': removed_columns, 'columns_added': added_columns,
+        'columns': summaries, 'examples': example_rows,
+    }
+
+
+def preview(project, steps):
+    """Runs steps on the project's stored sample without logging or writing them; returns the dry-run report."""
+    cleaning.validate_steps(steps, background=True)
+    before = transformations.load_frame(project, resolution='sample')
+    if any(step['operation'] in cleaning.BACKGROUND_OPERATIONS for step in steps):
+        before = sampling.uniform_sample(before, getattr(settings, 'DRY_RUN_MODEL_ROWS', 2000), sampling.DEFAULT_SEED)
+    with timing.span('clean'):
+        after = cleaning.apply_steps(before.copy(deep=False), steps)
+    with timing.span('stats'):
+        report = compare(before, after, steps)
+    total_rows = (project.metadata_json or {}).get('rows', len(before))
+    scale = total_rows / len(before) if len(before) else 0
+    report.update(
+        dry_run=True, data_version=project.data_version, sample_rows=len(before), total_rows=total_rows,
+        exact=len(before) == total_rows, estimated_rows_affected=int(round(report['rows_affected'] * scale)),
+    )
+    return report
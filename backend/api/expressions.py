@@ -0,0 +1,430 @@
+# api/expressions.py
+
+"""
+Expression language of the derive_column cleaning operation.
+
+An expression is parsed with Python's `ast` (eval mode) and only the
+constructs below are accepted; everything else (attributes, subscripts,
+lambdas, comprehensions, unknown functions) is rejected before any data is
+touched:
+
+    price / quantity                      arithmetic: + - * / // % **
+    age >= 18 and country == "DE"         comparisons, and / or / not
+    where(total > 0, paid / total, None)  also: x if condition else y
+    bucket(age, [0, 18, 65, 120], ["child", "adult", "senior"])
+    lower(city), contains(name, "Ltd"), concat(first, " ", last)
+    year(order_date), days_between(ordered, shipped)
+
+Names are columns; names that are not identifiers are written in
+backticks, e.g. `unit price` * 2. The functions are listed in FUNCTIONS.
+
+compile_expression() type-checks the expression against the semantic
+column types (api/column_types.py: numerical / temporal / categorical) and
+returns a Compiled expression whose evaluate(df) runs it as whole-column
+pandas/NumPy operations, without Python loops over rows. The views check
+an expression against the registry in metadata_json first, so type errors
+are reported before the data is loaded.
+"""
+
+import ast
+import operator
+import re
+
+import numpy as np
+import pandas as pd
+
+from . import column_types
+
+MAX_EXPRESSION_LENGTH = 2000
+MAX_EXPRESSION_DEPTH = 64  # nesting levels of the syntax tree; compiling and evaluating recurse per level
+
+NUMERICAL, CATEGORICAL, TEMPORAL, BOOLEAN, NULL = 'numerical', 'categorical', 'temporal', 'boolean', 'null'
+
+_BACKTICK_NAME = re.compile(r'`([^`]*)`')
+
+
+class ExpressionError(ValueError):
+    """An expression that is not valid, or not valid for the columns' types."""
+
+
+class UnknownColumnError(ExpressionError):
+    """An expression naming a column the type lookup does not know."""
+
+
+# --- Values: a pd.Series aligned with the frame, or a scalar ---
+
+def _series(value, index):
+    return value if isinstance(value, pd.Series) else pd.Series(value, index=index)
+
+
+def _strings(value, index):
+    series = _series(value, index)
+    return series.astype(str).where(series.notna())
+
+
+def _dates(value, index):
+    series = _series(value, index)
+    return series if pd.api.types.is_datetime64_any_dtype(series.dtype) else pd.to_datetime(series, errors='coerce')
+
+
+def _bucket(index, values, edges, labels=None):
+    if labels is None:
+        labels = [f"{low:g}-{high:g}" for low, high in zip(edges, edges[1:])]
+    if len(labels) != len(edges) - 1:
+        raise ExpressionError("bucket() needs one label per interval (len(edges) - 1).")
+    return pd.cut(_series(values, index), bins=edges, labels=labels, include_lowest=True, ordered=False)
+
+
+def _where(index, condition, if_true, if_false):
+    if not any(isinstance(value, pd.Series) for value in (condition, if_true, if_false)):
+        return if_true if condition else if_false
+    return _series(if_true, index).where(_series(condition, index).fillna(False).astype(bool), if_false)
+
+
+def _round(index, values, digits=0):
+    return np.round(values, int(digits))
+
+
+# --- Type rules ---
+
+def _is(kind, *allowed):
+    return kind == NULL or kind in allowed
+
+
+def _expect(name, position, kind, *allowed):
+    if not _is(kind, *allowed):
+        raise ExpressionError(f"Argument {position} of {name}() must be {' or '.join(allowed)}, not {kind}.")
+
+
+def _unify(kinds, what):
+    """The common type of branches/values (null mixes with anything; boolean mixes with numerical)."""
+    kinds = set(kinds) - {NULL}
+    if kinds == {NUMERICAL, BOOLEAN}:
+        kinds = {NUMERICAL}
+    if len(kinds) > 1:
+        raise ExpressionError(f"{what} mixes {' and '.join(sorted(kinds))} values.")
+    return kinds.pop() if kinds else NULL
+
+
+def _unary(result, *allowed):
+    """Type rule of a one-argument function on `allowed` types returning `result`."""
+    def check(name, kinds):
+        _expect(name, 1, kinds[0], *allowed)
+        return result
+    return check
+
+
+def _rule_round(name, kinds):
+    _expect(name, 1, kinds[0], NUMERICAL, BOOLEAN)
+    return NUMERICAL
+
+
+def _rule_clip(name, kinds):
+    for position, kind in enumerate(kinds, start=1):
+        _expect(name, position, kind, NUMERICAL, BOOLEAN)
+    return NUMERICAL
+
+
+def _rule_fillna(name, kinds):
+    return _unify(kinds, f"{name}()")
+
+
+def _rule_where(name, kinds):
+    _expect(name, 1, kinds[0], BOOLEAN)
+    return _unify(kinds[1:], f"{name}()")
+
+
+def _rule_bucket(name, kinds):
+    _expect(name, 1, kinds[0], NUMERICAL, BOOLEAN)
+    return CATEGORICAL
+
+
+def _rule_string_test(name, kinds):
+    _expect(name, 1, kinds[0], CATEGORICAL)
+    _expect(name, 2, kinds[1], CATEGORICAL)
+    return BOOLEAN
+
+
+def _rule_replace(name, kinds):
+    _expect(name, 1, kinds[0], CATEGORICAL)
+    return CATEGORICAL
+
+
+def _rule_days_between(name, kinds):
+    _expect(name, 1, kinds[0], TEMPORAL)
+    _expect(name, 2, kinds[1], TEMPORAL)
+    return NUMERICAL
+
+
+def _rule_any(result):
+    return lambda name, kinds: result
+
+
+# name -> (min args, max args (None: any), indexes of args that must be constants, type rule, implementation(index, *values))
+FUNCTIONS = {
+    # Numbers
+    'abs': (1, 1, (), _unary(NUMERICAL, NUMERICAL, BOOLEAN), lambda index, x: np.abs(x)),
+    'sqrt': (1, 1, (), _unary(NUMERICAL, NUMERICAL, BOOLEAN), lambda index, x: np.sqrt(x)),
+    'log': (1, 1, (), _unary(NUMERICAL, NUMERICAL, BOOLEAN), lambda index, x: np.log(x)),
+    'log10': (1, 1, (), _unary(NUMERICAL, NUMERICAL, BOOLEAN), lambda index, x: np.log10(x)),
+    'exp': (1, 1, (), _unary(NUMERICAL, NUMERICAL, BOOLEAN), lambda index, x: np.exp(x)),
+    'floor': (1, 1, (), _unary(NUMERICAL, NUMERICAL, BOOLEAN), lambda index, x: np.floor(x)),
+    'ceil': (1, 1, (), _unary(NUMERICAL, NUMERICAL, BOOLEAN), lambda index, x: np.ceil(x)),
+    'round': (1, 2, (1,), _rule_round, _round),
+    'clip': (3, 3, (), _rule_clip, lambda index, x, low, high: np.clip(x, low, high)),
+    'to_number': (1, 1, (), _rule_any(NUMERICAL), lambda index, x: pd.to_numeric(_series(x, index), errors='coerce')),
+    'bucket': (2, 3, (1, 2), _rule_bucket, _bucket),
+    # Missing values and conditions
+    'isnull': (1, 1, (), _rule_any(BOOLEAN), lambda index, x: _series(x, index).isna()),
+    'notnull': (1, 1, (), _rule_any(BOOLEAN), lambda index, x: _series(x, index).notna()),
+    'fillna': (2, 2, (), _rule_fillna, lambda index, x, value: _series(x, index).fillna(value)),
+    'where': (3, 3, (), _rule_where, _where),
+    # Strings
+    'str': (1, 1, (), _rule_any(CATEGORICAL), lambda index, x: _strings(x, index)),
+    'lower': (1, 1, (), _unary(CATEGORICAL, CATEGORICAL), lambda index, x: _strings(x, index).str.lower()),
+    'upper': (1, 1, (), _unary(CATEGORICAL, CATEGORICAL), lambda index, x: _strings(x, index).str.upper()),
+    'strip': (1, 1, (), _unary(CATEGORICAL, CATEGORICAL), lambda index, x: _strings(x, index).str.strip()),
+    'len': (1, 1, (), _unary(NUMERICAL, CATEGORICAL), lambda index, x: _strings(x, index).str.len()),
+    'contains': (2, 2, (1,), _rule_string_test, lambda index, x, text: _strings(x, index).str.contains(text, regex=False)),
+    'startswith': (2, 2, (1,), _rule_string_test, lambda index, x, text: _strings(x, index).str.startswith(text)),
+    'endswith': (2, 2, (1,), _rule_string_test, lambda index, x, text: _strings(x, index).str.endswith(text)),
+    'replace': (3, 3, (1, 2), _rule_replace, lambda index, x, old, new: _strings(x, index).str.replace(old, new, regex=False)),
+    'substr': (2, 3, (1, 2), _rule_replace, lambda index, x, start, stop=None: _strings(x, index).str.slice(int(start), None if stop is None else int(stop))),
+    'concat': (1, None, (), _rule_any(CATEGORICAL),
+               lambda index, *parts: _strings(parts[0], index).str.cat([_strings(part, index) for part in parts[1:]])),
+    # Dates
+    'to_date': (1, 1, (), _rule_any(TEMPORAL), lambda index, x: _dates(x, index)),
+    'date': (1, 1, (), _unary(TEMPORAL, TEMPORAL), lambda index, x: _dates(x, index).dt.normalize()),
+    'year': (1, 1, (), _unary(NUMERICAL, TEMPORAL), lambda index, x: _dates(x, index).dt.year),
+    'quarter': (1, 1, (), _unary(NUMERICAL, TEMPORAL), lambda index, x: _dates(x, index).dt.quarter),
+    'month': (1, 1, (), _unary(NUMERICAL, TEMPORAL), lambda index, x: _dates(x, index).dt.month),
+    'day': (1, 1, (), _unary(NUMERICAL, TEMPORAL), lambda index, x: _dates(x, index).dt.day),
+    'weekday': (1, 1, (), _unary(NUMERICAL, TEMPORAL), lambda index, x: _dates(x, index).dt.weekday),
+    'hour': (1, 1, (), _unary(NUMERICAL, TEMPORAL), lambda index, x: _dates(x, index).dt.hour),
+    'days_between': (2, 2, (), _rule_days_between,
+                     lambda index, start, end: (_dates(end, index) - _dates(start, index)).dt.total_seconds() / 86400),
+}
+
+_ARITHMETIC = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: operator.pow,
+}
+_COMPARISONS = {
+    ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt,
+    ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+}
+
+
+# --- Compilation: each node becomes (type, function of the frame) ---
+
+class Compiled:
+    """A type-checked expression: `type` is the result's semantic type, evaluate(df) its values."""
+
+    def __init__(self, kind, columns, evaluate):
+        self.type = kind
+        self.columns = columns
+        self._evaluate = evaluate
+
+    def evaluate(self, df):
+        """The expression's values as a Series aligned with df (scalars are broadcast)."""
+        with np.errstate(all='ignore'):
+            try:
+                return _series(self._evaluate(df), df.index)
+            except (TypeError, ValueError, OverflowError) as e:
+                raise ExpressionError(f"Could not evaluate the expression: {e}")
+
+
+class _Compiler:
+    def __init__(self, column_type, names):
+        self.column_type = column_type  # column name -> semantic type (None when unknown)
+        self.names = names  # placeholder identifier -> backticked column name
+        self.columns = []
+
+    def compile(self, node):
+        method = getattr(self, f"_{type(node).__name__}", None)
+        if method is None:
+            raise ExpressionError(f"Unsupported syntax: {type(node).__name__}.")
+        return method(node)
+
+    def _Expression(self, node):
+        return self.compile(node.body)
+
+    def _Constant(self, node):
+        value = node.value
+        if isinstance(value, bool):
+            return BOOLEAN, lambda df: value
+        if isinstance(value, int):
+            value = np.int64(value)  # fixed width: no unbounded Python integer arithmetic
+            return NUMERICAL, lambda df: value
+        if isinstance(value, float):
+            return NUMERICAL, lambda df: value
+        if isinstance(value, str):
+            return CATEGORICAL, lambda df: value
+        if value is None:
+            return NULL, lambda df: np.nan
+        raise ExpressionError(f"Unsupported constant: {value!r}.")
+
+    def _Name(self, node):
+        name = self.names.get(node.id, node.id)
+        kind = self.column_type(name)
+        if kind is None:
+            raise UnknownColumnError(f"Unknown column '{name}'.")
+        self.columns.append(name)
+        if kind == TEMPORAL:
+            return kind, lambda df: _dates(df[name], df.index)
+        return kind, lambda df: df[name]
+
+    def _UnaryOp(self, node):
+        kind, operand = self.compile(node.operand)
+        if isinstance(node.op, ast.Not):
+            _expect('not', 1, kind, BOOLEAN)
+            return BOOLEAN, lambda df: np.logical_not(operand(df))
+        if isinstance(node.op, (ast.USub, ast.UAdd)):
+            _expect(type(node.op).__name__, 1, kind, NUMERICAL, BOOLEAN)
+            sign = -1 if isinstance(node.op, ast.USub) else 1
+            return NUMERICAL, lambda df: sign * operand(df)
+        raise ExpressionError(f"Unsupported operator: {type(node.op).__name__}.")
+
+    def _BinOp(self, node):
+        function = _ARITHMETIC.get(type(node.op))
+        if function is None:
+            raise ExpressionError(f"Unsupported operator: {type(node.op).__name__}.")
+        (left_kind, left), (right_kind, right) = self.compile(node.left), self.compile(node.right)
+        if isinstance(node.op, ast.Add) and CATEGORICAL in (left_kind, right_kind):
+            if not (_is(left_kind, CATEGORICAL) and _is(right_kind, CATEGORICAL)):
+                raise ExpressionError("+ joins text only with text; use concat() or str() for other values.")
+            return CATEGORICAL, lambda df: function(left(df), right(df))
+        for kind in (left_kind, right_kind):
+            if not _is(kind, NUMERICAL, BOOLEAN):
+                raise ExpressionError(f"Arithmetic needs numerical values, not {kind}.")
+        return NUMERICAL, lambda df: function(left(df), right(df))
+
+    def _BoolOp(self, node):
+        parts = [self.compile(value) for value in node.values]
+        for position, (kind, _) in enumerate(parts, start=1):
+            _expect('and' if isinstance(node.op, ast.And) else 'or', position, kind, BOOLEAN)
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        functions = [function for _, function in parts]
+
+        def evaluate(df):
+            result = functions[0](df)
+            for function in functions[1:]:
+                result = combine(result, function(df))
+            return result
+        return BOOLEAN, evaluate
+
+    def _Compare(self, node):
+        operands = [self.compile(node.left)] + [self.compile(comparator) for comparator in node.comparators]
+        checks = []
+        for op, (left_kind, left), (right_kind, right) in zip(node.ops, operands, operands[1:]):
+            function = _COMPARISONS.get(type(op))
+            if function is None:
+                raise ExpressionError(f"Unsupported comparison: {type(op).__name__}.")
+            kinds = {left_kind, right_kind} - {NULL}
+            # Dates compare with date strings ("2024-01-01"); booleans with numbers
+            if len(kinds) > 1 and kinds not in ({TEMPORAL, CATEGORICAL}, {NUMERICAL, BOOLEAN}):
+                raise ExpressionError(f"Cannot compare {left_kind} with {right_kind} values.")
+            checks.append((function, left, right))
+
+        def evaluate(df):
+            result = None
+            for function, left, right in checks:
+                outcome = function(left(df), right(df))
+                result = outcome if result is None else np.logical_and(result, outcome)
+            return result
+        return BOOLEAN, evaluate
+
+    def _IfExp(self, node):
+        return self._call('where', [node.test, node.body, node.orelse])
+
+    def _Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.keywords:
+            raise ExpressionError("Only calls of the listed functions with positional arguments are allowed.")
+        return self._call(node.func.id, node.args)
+
+    def _call(self, name, args):
+        if name not in FUNCTIONS:
+            raise ExpressionError(f"Unknown function '{name}'. Must be one of: {', '.join(sorted(FUNCTIONS))}.")
+        min_args, max_args, constant_args, rule, implementation = FUNCTIONS[name]
+        if len(args) < min_args or (max_args is not None and len(args) > max_args):
+            expected = min_args if min_args == max_args else f"at least {min_args}" if max_args is None else f"{min_args} to {max_args}"
+            raise ExpressionError(f"{name}() takes {expected} arguments, not {len(args)}.")
+        kinds, functions = [], []
+        for position, arg in enumerate(args):
+            if position in constant_args:
+                value = self._literal(name, position, arg)
+                kinds.append(NUMERICAL if isinstance(value, (int, float, list)) else CATEGORICAL)
+                functions.append(lambda df, value=value: value)
+            else:
+                kind, function = self.compile(arg)
+                kinds.append(kind)
+                functions.append(function)
+        kind = rule(name, kinds)
+        return kind, lambda df: implementation(df.index, *[function(df) for function in functions])
+
+    def _literal(self, name, position, node):
+        """A constant argument (number, text, or list of them, e.g. bucket edges)."""
+        try:
+            value = ast.literal_eval(node)
+        except ValueError:
+            raise ExpressionError(f"Argument {position + 1} of {name}() must be a constant.")
+        items = value if isinstance(value, list) else [value]
+        if isinstance(value, (tuple, set, dict)) or not all(isinstance(item, (int, float, str)) and not isinstance(item, bool) for item in items):
+            raise ExpressionError(f"Argument {position + 1} of {name}() must be a number, text, or a list of them.")
+        return value
+
+
+def _depth(tree):
+    """Nesting depth of a syntax tree, walked without recursion."""
+    deepest, pending = 0, [(tree, 1)]
+    while pending:
+        node, depth = pending.pop()
+        deepest = max(deepest, depth)
+        if depth <= MAX_EXPRESSION_DEPTH:
+            pending.extend((child, depth + 1) for child in ast.iter_child_nodes(node))
+    return deepest
+
+
+def compile_expression(expression, column_type):
+    """
+    Parses and type-checks an expression. column_type(name) returns the
+    semantic type of a column, or None when there is no such column.
+    Raises ExpressionError; returns a Compiled expression.
+    """
+    if not isinstance(expression, str) or not expression.strip():
+        raise ExpressionError("expression must be a non-empty string.")
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ExpressionError(f"expression is longer than {MAX_EXPRESSION_LENGTH} characters.")
+    names = {}
+
+    def placeholder(match):
+        identifier = f"__column_{len(names)}__"
+        names[identifier] = match.group(1)
+        return identifier
+    try:
+        tree = ast.parse(_BACKTICK_NAME.sub(placeholder, expression).strip(), mode='eval')
+    except SyntaxError as e:
+        raise ExpressionError(f"Invalid expression: {e.msg}.")
+    except (RecursionError, MemoryError):
+        # The parser itself gives up on very deep nesting
+        raise ExpressionError(f"expression is nested more than {MAX_EXPRESSION_DEPTH} levels deep.")
+    if _depth(tree) > MAX_EXPRESSION_DEPTH:
+        raise ExpressionError(f"expression is nested more than {MAX_EXPRESSION_DEPTH} levels deep.")
+    compiler = _Compiler(column_type, names)
+    kind, evaluate = compiler.compile(tree)
+    return Compiled(kind, list(dict.fromkeys(compiler.columns)), evaluate)
+
+
+def check(expression, registry):
+    """Type-checks an expression against a column_types.ColumnTypes registry (no data needed)."""
+    return compile_expression(expression, lambda name: registry.type_of(name) if name in registry else None)
+
+
+def for_frame(expression, df):
+    """Compiles an expression against the columns of df (types inferred from the data)."""
+    return compile_expression(expression, lambda name: column_types.infer_type(df[name]) if name in df.columns else None)
+
+
+def syntax_check(expression):
+    """Checks an expression's syntax and functions without knowing the columns (any name is accepted)."""
+    return compile_expression(expression, lambda name: NULL)
@@ -0,0 +1,109 @@
+# api/figure_serialization.py
+
+"""
+Figure serialization for Plotly charts.
+
+Replaces the `json.loads(fig.to_json())` round trip: the figure dict is taken
+directly from Plotly and numeric trace arrays are encoded as base64 typed
+arrays (Plotly.js `{"dtype", "bdata", "shape"}` objects). The response body is
+then written once by api.renderers.FastJSONRenderer.
+"""
+
+import base64
+
+import numpy as np
+from django.conf import settings
+
+from . import timing
+
+# numpy dtype -> Plotly.js typed-array dtype (Plotly.js has no 64-bit integer arrays)
+PLOTLY_TYPED_ARRAY_DTYPES = {
+    'int8': 'i1', 'uint8': 'u1', 'int16': 'i2', 'uint16': 'u2',
+    'int32': 'i4', 'uint32': 'u4', 'float32': 'f4', 'float64': 'f8',
+}
+FLOAT_PRECISIONS = ('double', 'single')
+# Python lists shorter than this are left as plain JSON lists.
+MIN_LIST_LENGTH_TO_ENCODE = 64
+
+_INT32 = np.iinfo(np.int32)
+_UINT32 = np.iinfo(np.uint32)
+
+
+def _narrow_dtype(arr, float_precision):
+    """Casts an array to the closest dtype Plotly.js can decode."""
+    kind = arr.dtype.kind
+    if kind == 'f':
+        if float_precision == 'single' or arr.dtype == np.float16:
+            return arr.astype(np.float32, copy=False)
+        return arr.astype(np.float64, copy=False)
+    if arr.size == 0:
+        return arr.astype(np.int32 if kind == 'i' else np.uint32, copy=False)
+    if kind == 'i' and arr.dtype.itemsize > 4:
+        if _INT32.min <= arr.min() and arr.max() <= _INT32.max:
+            return arr.astype(np.int32)
+        return arr.astype(np.float64)
+    if kind == 'u' and arr.dtype.itemsize > 4:
+        if arr.max() <= _UINT32.max:
+            return arr.astype(np.uint32)
+        return arr.astype(np.float64)
+    return arr
+
+
+def encode_typed_array(arr, float_precision='double'):
+    """
+    Encodes a numeric numpy array as a Plotly typed-array object.
+    Returns None for arrays that cannot be represented (non-numeric, booleans).
+    """
+    if arr.ndim == 0 or arr.dtype.kind not in 'iuf':
+        return None
+    arr = _narrow_dtype(arr, float_precision)
+    plotly_dtype = PLOTLY_TYPED_ARRAY_DTYPES.get(arr.dtype.name)
+    if plotly_dtype is None:
+        return None
+    # Plotly.js reads typed arrays as little-endian, C-ordered buffers.
+    arr = np.ascontiguousarray(arr, dtype=arr.dtype.newbyteorder('<'))
+    encoded = {'dtype': plotly_dtype, 'bdata': base64.b64encode(arr.tobytes()).decode('ascii')}
+    if arr.ndim > 1:
+        encoded['shape'] = ', '.join(str(dim) for dim in arr.shape)
+    return encoded
+
+
+def _is_numeric_list(values):
+    return all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values)
+
+
+def _encode_node(node, float_precision):
+    """Recursively replaces numeric arrays (and long numeric lists) with typed-array objects."""
+    if isinstance(node, np.ndarray):
+        encoded = encode_typed_array(node, float_precision)
+        return encoded if encoded is not None else node
+    if isinstance(node, dict):
+        return {key: _encode_node(value, float_precision) for key, value in node.items()}
+    if isinstance(node, (list, tuple)):
+        if len(node) >= MIN_LIST_LENGTH_TO_ENCODE and _is_numeric_list(node):
+            return encode_typed_array(np.asarray(node), float_precision)
+        return [_encode_node(value, float_precision) for value in node]
+    return node
+
+
+def get_float_precision(hypertune_params):
+    precision = (hypertune_params or {}).get('float_precision') or getattr(settings, 'PLOTLY_FLOAT_PRECISION', 'double')
+    if precision not in FLOAT_PRECISIONS:
+        raise ValueError(f"Invalid float_precision '{precision}'. Must be one of: {', '.join(FLOAT_PRECISIONS)}.")
+    return precision
+
+
+def figure_to_payload(fig, hypertune_params=None):
+    """
+    Converts a Plotly figure to the `chart_data` payload returned by the API.
+
+    hypertune_params may set:
+      - 'plotly_encoding': 'binary' (default, typed arrays) or 'json' (plain arrays)
+      - 'float_precision': 'double' (default, float64) or 'single' (float32, half the bytes)
+    """
+    hypertune_params = hypertune_params or {}
+    with timing.span('encode'):
+        figure_dict = fig.to_plotly_json()
+        if hypertune_params.get('plotly_encoding', 'binary') == 'json':
+            return figure_dict
+        return _encode_node(figure_dict, get_float_precision(hypertune_params))
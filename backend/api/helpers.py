@@ -11,6 +11,11 @@ from rest_framework import generics, status, serializers
 from rest_framework.permissions import IsAuthenticated
 from .serializers import DataProjectSerializer
 from rest_framework.parsers import MultiPartParser
+from . import sampling
+from . import column_store
+from . import column_types
+from . import metrics
+from . import timing
 
 # --- Helper Functions (Retained from original views.py) ---
 
@@ -33,44 +38,27 @@ def process_file(file_path, file_type):
             return None, "Unsupported file type.", None
         if df is None:
             raise ValueError("File could not be processed.")
+        processed_data = column_types.build_metadata(df)
+        # Stored as version 0 of a column store; pickle_path is the project's data path, not a file
         pickle_path = os.path.splitext(file_path)[0] + '.pkl'
-        df.to_pickle(pickle_path)
-        column_metadata = []
-        for col in df.columns:
-            dtype = str(df[col].dtype)
-            col_type = 'categorical'
-            if pd.api.types.is_numeric_dtype(df[col]):
-                col_type = 'numerical'
-            elif pd.api.types.is_datetime64_any_dtype(df[col]):
-                col_type = 'temporal'
-            elif dtype == 'object':
-                try:
-                    if not df[col].isnull().all():
-                        pd.to_datetime(df[col], errors='raise', infer_datetime_format=True)
-                        col_type = 'temporal'
-                except (ValueError, TypeError):
-                    col_type = 'categorical'
-            column_metadata.append({'name': col, 'type': col_type, 'unique_values': int(df[col].nunique()), 'missing_count': int(df[col].isnull().sum())})
-        processed_data = {'rows': len(df), 'cols': len(df.columns), 'metadata': column_metadata, 'first_n_rows': df.head(5).to_json(orient='records', date_format='iso')}
+        column_store.write_version(pickle_path, df, 0, metadata=processed_data)
+        sampling.write_stored_sample(df, column_store.manifest_path(pickle_path, 0))
         return processed_data, None, pickle_path
     except Exception as e:
         return None, str(e), None
 
-def update_project_metadata(project, df):
-    # ... existing update_project_metadata logic
-    column_metadata = []
-    for col in df.columns:
-        dtype = str(df[col].dtype)
-        col_type = 'categorical'
-        if pd.api.types.is_numeric_dtype(df[col]):
-            col_type = 'numerical'
-        elif pd.api.types.is_datetime64_any_dtype(df[col]):
-            col_type = 'temporal'
-        column_metadata.append({'name': col, 'type': col_type, 'unique_values': int(df[col].nunique()), 'missing_count': int(df[col].isnull().sum())})
-    updated_metadata = {'rows': len(df), 'cols': len(df.columns), 'metadata': column_metadata, 'first_n_rows': df.head(5).to_json(orient='records', date_format='iso')}
-    project.metadata_json = updated_metadata
-    project.save()
-    return updated_metadata
+def read_project_df(file_path):
+    """Loads a project's data pickle (timed as the 'load' stage); newer projects use api/column_store.py."""
+    with timing.span('load') as stage:
+        stage.bytes = os.path.getsize(file_path)
+        metrics.MEDIA_BYTES_READ.inc(stage.bytes)
+        return pd.read_pickle(file_path)
+
+def get_project_version(project):
+    """Identifies the current state of a project's data: the head of its transformation log."""
+    if project is None:
+        return 0
+    return project.data_version
 
 def get_db_url(db_type, host, port, database, username, password):
     """Helper function to construct the SQLAlchemy URL."""
@@ -87,23 +75,7 @@ def get_db_url(db_type, host, port, database, username, password):
 
 def extract_metadata_from_df(df):
     """Generates metadata JSON from a Pandas DataFrame acquired via SQL."""
-    column_metadata = []
-    for col in df.columns:
-        dtype = str(df[col].dtype)
-        col_type = 'categorical'
-
-        if pd.api.types.is_numeric_dtype(df[col]): col_type = 'numerical'
-        elif pd.api.types.is_datetime64_any_dtype(df[col]): col_type = 'temporal'
-        elif dtype == 'object':
-            try:
-                if not df[col].isnull().all():
-                    pd.to_datetime(df[col], errors='raise', infer_datetime_format=True)
-                    col_type = 'temporal'
-            except (ValueError, TypeError): col_type = 'categorical'
-
-        column_metadata.append({'name': col, 'type': col_type, 'unique_values': int(df[col].nunique()), 'missing_count': int(df[col].isnull().sum())})
-
-    return {'rows': len(df), 'cols': len(df.columns), 'metadata': column_metadata, 'first_n_rows': df.head(5).to_json(orient='records', date_format='iso') }
+    return column_types.build_metadata(df)
 
 class CreateProjectView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated]
@@ -144,6 +116,8 @@ class DeleteProjectView(generics.DestroyAPIView):
             # Check if the file exists before attempting to remove it
             if os.path.exists(file_path):
                 os.remove(file_path)
+            sampling.remove_stored_sample(file_path)
+            column_store.remove(file_path)
             
             # 2. Proceed with database deletion
             instance.delete()
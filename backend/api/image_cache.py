@@ -0,0 +1,219 @@
+# api/image_cache.py
+
+"""
+Rendering and delivery of matplotlib chart images.
+
+Images are either embedded in the JSON body as a data URI ('inline', the
+historical behaviour) or stored in a content-addressed cache on disk and
+returned as a short URL + ETag ('url'). Cached images are kept per project
+(<cache dir>/<project id>/...) and served raw by ChartImageView. The SHA-256
+file name doubles as the access token, so <img> tags can load them without
+a JWT header. Deleting a project removes its images; images older than
+CHART_IMAGE_MAX_AGE are evicted, and the oldest ones when the cache grows
+beyond CHART_IMAGE_CACHE_MAX_BYTES.
+
+hypertune_params options:
+  - 'image_delivery': 'inline' | 'url' (default from CHART_IMAGE_DELIVERY)
+  - 'image_format': 'png' | 'webp' | 'svg' (default 'png')
+  - 'dpi': output resolution, 50-600 (default: the figure's own dpi)
+"""
+
+import base64
+import hashlib
+import io
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.urls import reverse
+
+from . import timing
+
+IMAGE_CONTENT_TYPES = {
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'svg': 'image/svg+xml',
+}
+DELIVERY_MODES = ('inline', 'url')
+MIN_DPI, MAX_DPI = 50, 600
+PRUNE_INTERVAL = 10 * 60  # seconds between eviction passes per process
+
+# pyplot's current-figure state is global; hold this while drawing with plt.*
+render_lock = threading.RLock()
+_render_waiting = 0
+_render_waiting_lock = threading.Lock()
+
+_last_prune = 0.0
+_prune_lock = threading.Lock()
+
+
+@contextmanager
+def render_slot():
+    """Holds render_lock, counting the callers waiting for it (api_render_queue_depth)."""
+    global _render_waiting
+    with _render_waiting_lock:
+        _render_waiting += 1
+    try:
+        render_lock.acquire()
+    finally:
+        with _render_waiting_lock:
+            _render_waiting -= 1
+    try:
+        yield
+    finally:
+        render_lock.release()
+
+
+def render_waiting():
+    """Number of renders currently waiting for render_lock in this process."""
+    return _render_waiting
+
+
+def get_cache_dir():
+    return getattr(settings, 'CHART_IMAGE_CACHE_DIR', os.path.join(settings.MEDIA_ROOT, 'chart_images'))
+
+
+def get_image_options(hypertune_params):
+    """Validates and returns (image_format, dpi, delivery) from hypertune_params."""
+    hypertune_params = hypertune_params or {}
+    image_format = str(hypertune_params.get('image_format') or 'png').lower()
+    if image_format not in IMAGE_CONTENT_TYPES:
+        raise ValueError(f"Invalid image_format '{image_format}'. Must be one of: {', '.join(IMAGE_CONTENT_TYPES)}.")
+
+    dpi = hypertune_params.get('dpi')
+    if dpi not in (None, ''):
+        try:
+            dpi = int(dpi)
+        except (TypeError, ValueError):
+            raise ValueError("dpi must be an integer.")
+        if not MIN_DPI <= dpi <= MAX_DPI:
+            raise ValueError(f"dpi must be between {MIN_DPI} and {MAX_DPI}.")
+    else:
+        dpi = None
+
+    delivery = hypertune_params.get('image_delivery') or getattr(settings, 'CHART_IMAGE_DELIVERY', 'inline')
+    if delivery not in DELIVERY_MODES:
+        raise ValueError(f"Invalid image_delivery '{delivery}'. Must be one of: {', '.join(DELIVERY_MODES)}.")
+    return image_format, dpi, delivery
+
+
+def get_max_age():
+    return getattr(settings, 'CHART_IMAGE_MAX_AGE', 7 * 24 * 60 * 60)
+
+
+def image_path(project_id, digest, image_format):
+    return os.path.join(get_cache_dir(), str(int(project_id)), digest[:2], f"{digest}.{image_format}")
+
+
+def is_expired(path):
+    return time.time() - os.path.getmtime(path) > get_max_age()
+
+
+def store_image(data, image_format, project_id):
+    """Writes image bytes to the project's content-addressed cache (no-op if already present) and returns the digest."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = image_path(project_id, digest, image_format)
+    if os.path.exists(path):
+        os.utime(path)  # rendered again: restart its age
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp_path, path)  # atomic: readers never see a partial file
+    _maybe_prune()
+    return digest
+
+
+def remove_project_images(project_id):
+    """Deletes every cached image of a project (called when the project is deleted)."""
+    shutil.rmtree(os.path.join(get_cache_dir(), str(int(project_id))), ignore_errors=True)
+
+
+def prune():
+    """
+    Evicts images older than CHART_IMAGE_MAX_AGE, then the least recently
+    rendered ones until the cache fits CHART_IMAGE_CACHE_MAX_BYTES.
+    """
+    directory = get_cache_dir()
+    if not os.path.isdir(directory):
+        return
+    max_bytes = getattr(settings, 'CHART_IMAGE_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+    images = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            images.append((stat.st_mtime, stat.st_size, path))
+    images.sort(reverse=True)  # newest first
+    oldest_allowed, total = time.time() - get_max_age(), 0
+    for mtime, size, path in images:
+        total += size
+        if mtime < oldest_allowed or total > max_bytes:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _maybe_prune():
+    """Runs prune() at most once per PRUNE_INTERVAL in this process."""
+    global _last_prune
+    now = time.monotonic()
+    if now - _last_prune < PRUNE_INTERVAL or not _prune_lock.acquire(blocking=False):
+        return
+    try:
+        _last_prune = now
+        prune()
+    finally:
+        _prune_lock.release()
+
+
+def render_figure(fig, hypertune_params, **savefig_kwargs):
+    """Renders a matplotlib figure and returns (bytes, image_format, dpi)."""
+    image_format, dpi, _ = get_image_options(hypertune_params)
+    if dpi is not None:
+        savefig_kwargs['dpi'] = dpi
+    buf = io.BytesIO()
+    fig.savefig(buf, format=image_format, **savefig_kwargs)
+    return buf.getvalue(), image_format, dpi
+
+
+def image_payload(data, image_format, delivery, dpi=None, project_id=None):
+    """
+    Builds the response fields for a rendered image: a data URI for 'inline'
+    delivery, or a cache URL plus metadata ('chart_image') for 'url' delivery.
+    Images are cached per project, so without a project_id they are inlined.
+    """
+    if delivery == 'inline' or project_id is None:
+        encoded = base64.b64encode(data).decode('utf-8')
+        return {"chart_data": f"data:{IMAGE_CONTENT_TYPES[image_format]};base64,{encoded}"}
+
+    digest = store_image(data, image_format, project_id)
+    url = reverse('chart-image', kwargs={'project_id': project_id, 'digest': digest, 'image_format': image_format})
+    return {
+        "chart_data": url,
+        "chart_image": {
+            "url": url, "etag": f'"{digest}"', "content_type": IMAGE_CONTENT_TYPES[image_format],
+            "format": image_format, "dpi": dpi, "bytes": len(data),
+        },
+    }
+
+
+def figure_to_image_payload(fig, hypertune_params, project_id=None, **savefig_kwargs):
+    """Renders, closes and packages a matplotlib figure for the chart API response of a project."""
+    import matplotlib.pyplot as plt
+    try:
+        with timing.span('render_image') as stage:
+            data, image_format, dpi = render_figure(fig, hypertune_params, **savefig_kwargs)
+            stage.bytes = len(data)
+    finally:
+        plt.close(fig)
+    _, _, delivery = get_image_options(hypertune_params)
+    return image_payload(data, image_format, delivery, dpi, project_id)
@@ -0,0 +1,165 @@
+# api/jobs.py
+
+"""
+Background job runner.
+
+Long computations (exact chart results, model-based imputation, ...) run on
+an in-process thread pool and are tracked through a job handle that clients
+poll via /api/jobs/<job_id>/. Job state lives in the Django cache, so status,
+progress and cancellation work across workers when CACHES points at a shared
+backend (the default local-memory cache is per process).
+"""
+
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import timezone
+
+from . import structured_logging
+
+logger = logging.getLogger(__name__)
+
+PENDING, RUNNING, DONE, FAILED, CANCELLED = 'pending', 'running', 'done', 'failed', 'cancelled'
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+_executor = None
+_executor_lock = threading.Lock()
+_in_flight = set()
+_queued = set()
+_in_flight_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when the client cancelled it."""
+
+
+def _state_key(job_id):
+    return f"job:{job_id}"
+
+
+def _cancel_key(job_id):
+    return f"job:{job_id}:cancel"
+
+
+def _ttl():
+    return getattr(settings, 'JOB_RESULT_TTL', 60 * 60)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'JOB_WORKERS', 2), thread_name_prefix='api-job')
+        return _executor
+
+
+def get_job(job_id):
+    return cache.get(_state_key(job_id))
+
+
+def _save(state):
+    cache.set(_state_key(state['id']), state, _ttl())
+
+
+class JobHandle:
+    """Passed to the job function for progress reporting and cooperative cancellation."""
+
+    def __init__(self, job_id):
+        self.id = job_id
+
+    def set_progress(self, fraction, message=None):
+        state = get_job(self.id)
+        if state is None:
+            return
+        state['progress'] = round(max(0.0, min(1.0, float(fraction))), 4)
+        if message is not None:
+            state['message'] = message
+        _save(state)
+
+    def is_cancelled(self):
+        return bool(cache.get(_cancel_key(self.id)))
+
+    def check_cancelled(self):
+        if self.is_cancelled():
+            raise JobCancelled()
+
+
+def _run(job_id, fn, request_id=None):
+    # Log records from the job carry the id of the request that submitted it
+    log_token = structured_logging.set_request_id(request_id)
+    with _in_flight_lock:
+        _queued.discard(job_id)
+        _in_flight.add(job_id)
+    handle = JobHandle(job_id)
+    try:
+        state = get_job(job_id) or {}
+        if handle.is_cancelled():
+            raise JobCancelled()
+        state.update(status=RUNNING, started_at=timezone.now().isoformat())
+        _save(state)
+
+        result = fn(handle)
+
+        state = get_job(job_id) or state
+        state.update(status=DONE, progress=1.0, result=result, finished_at=timezone.now().isoformat())
+        _save(state)
+    except JobCancelled:
+        state = get_job(job_id) or {'id': job_id}
+        state.update(status=CANCELLED, finished_at=timezone.now().isoformat())
+        _save(state)
+    except Exception as e:
+        state = get_job(job_id) or {'id': job_id}
+        state.update(status=FAILED, error=str(e), finished_at=timezone.now().isoformat())
+        _save(state)
+        logger.exception("Background job %s failed", job_id, extra={'job_id': job_id, 'job_kind': state.get('kind')})
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard(job_id)
+        close_old_connections()
+        structured_logging.reset_request_id(log_token)
+
+
+def submit(owner, kind, fn, meta=None):
+    """
+    Queues fn(job_handle) on the job pool and returns the initial job state.
+    The function's return value (JSON-serializable) becomes the job result.
+    """
+    job_id = uuid.uuid4().hex
+    state = {
+        'id': job_id, 'kind': kind, 'owner_id': owner.id if owner is not None else None,
+        'status': PENDING, 'progress': 0.0, 'message': None, 'meta': meta or {},
+        'result': None, 'error': None, 'created_at': timezone.now().isoformat(),
+        'started_at': None, 'finished_at': None,
+    }
+    _save(state)
+    with _in_flight_lock:
+        _queued.add(job_id)
+    _get_executor().submit(_run, job_id, fn, structured_logging.get_request_id())
+    return state
+
+
+def cancel(job_id):
+    """Requests cancellation; the job stops at its next check_cancelled() call."""
+    cache.set(_cancel_key(job_id), True, _ttl())
+    state = get_job(job_id)
+    if state and state['status'] == PENDING:
+        state.update(status=CANCELLED, finished_at=timezone.now().isoformat())
+        _save(state)
+    return get_job(job_id)
+
+
+def in_flight_count():
+    """Number of jobs currently executing in this process."""
+    with _in_flight_lock:
+        return len(_in_flight)
+
+
+def queued_count():
+    """Number of jobs submitted in this process that are waiting for a free worker."""
+    with _in_flight_lock:
+        return len(_queued)
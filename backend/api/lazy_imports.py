@@ -0,0 +1,111 @@
+# api/lazy_imports.py
+
+"""
+Deferred imports for heavy third-party libraries.
+
+matplotlib, seaborn, plotly, scipy and the database drivers add seconds to
+every worker boot and `manage.py` command, even for auth-only traffic. The
+views import the proxies defined here instead; each proxy imports its module
+on first attribute access and records how long the import took.
+
+`preload()` imports everything up front. Call it before forking workers
+(PRELOAD_HEAVY_MODULES = True with gunicorn --preload, or from a server hook)
+so the modules are loaded once and shared copy-on-write.
+"""
+
+import importlib
+import threading
+import time
+import types
+
+_lock = threading.RLock()
+_registry = {}
+_load_timings = {}
+
+
+def _use_agg_backend():
+    """Matplotlib must be switched to the non-interactive backend before pyplot is imported."""
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+class LazyModule(types.ModuleType):
+    """Module proxy that performs the real import on first attribute access."""
+
+    def __init__(self, name, before_import=None):
+        super().__init__(name)
+        self._lazy_name = name
+        self._lazy_before_import = before_import
+        self._lazy_module = None
+        _registry[name] = self
+
+    def _load(self):
+        module = self._lazy_module
+        if module is None:
+            with _lock:
+                if self._lazy_module is None:
+                    start = time.perf_counter()
+                    if self._lazy_before_import:
+                        self._lazy_before_import()
+                    self._lazy_module = importlib.import_module(self._lazy_name)
+                    _load_timings[self._lazy_name] = time.perf_counter() - start
+                module = self._lazy_module
+        return module
+
+    def __getattr__(self, attr):
+        if attr.startswith('_lazy_'):
+            raise AttributeError(attr)
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    @property
+    def is_loaded(self):
+        return self._lazy_module is not None
+
+    def __repr__(self):
+        state = 'loaded' if self._lazy_module is not None else 'not loaded'
+        return f"<lazy module '{self._lazy_name}' ({state})>"
+
+
+# --- Heavy modules used by the views ---
+plt = LazyModule('matplotlib.pyplot', before_import=_use_agg_backend)
+sns = LazyModule('seaborn', before_import=_use_agg_backend)
+px = LazyModule('plotly.express')
+go = LazyModule('plotly.graph_objects')
+stats = LazyModule('scipy.stats')
+
+# --- Database drivers (only needed when a DbConnection is used) ---
+pymysql = LazyModule('pymysql')
+psycopg2 = LazyModule('psycopg2')
+pymssql = LazyModule('pymssql')
+
+
+def preload(names=None, ignore_missing=True):
+    """
+    Imports the registered modules now (all of them, or only `names`) and
+    returns {module name: seconds}. Missing optional drivers are skipped
+    unless ignore_missing is False.
+    """
+    timings = {}
+    for name, proxy in list(_registry.items()):
+        if names is not None and name not in names:
+            continue
+        try:
+            proxy._load()
+        except ImportError:
+            if not ignore_missing:
+                raise
+            continue
+        timings[name] = _load_timings.get(name, 0.0)
+    return timings
+
+
+def load_timings():
+    """Seconds spent importing each lazily loaded module so far in this process."""
+    return dict(_load_timings)
+
+
+def registered_modules():
+    return list(_registry)
@@ -0,0 +1,321 @@
+# api/management/commands/benchmark.py
+
+"""
+Benchmarks every chart type and data endpoint against a synthetic project.
+
+A project of --rows x --columns numeric columns (plus categorical columns of
+--cardinality levels and a timestamp column) is uploaded into a throwaway
+test database and media directory, then each case is requested through the
+Django test client: every entry in chart_generator_map, each cleaning view,
+RawDataView and FetchUniqueValuesView. Cleaning cases restore the original
+data before every iteration, and caches are cleared so each request does the
+full work.
+
+For each case the report records latency percentiles, peak RSS and response
+payload bytes. Save it with --output and compare a later run against it with
+--compare to spot regressions between commits:
+
+    python manage.py benchmark --rows 200000 --output base.json
+    python manage.py benchmark --rows 200000 --compare base.json
+"""
+
+import json
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.urls import reverse
+
+from ... import transformations
+from ...models import DataProject
+
+
+def _synthetic_frame(rows, numeric_columns, categorical_columns, cardinality, seed):
+    """
+    Normal, exponential and integer numeric columns, categoricals and hourly
+    timestamps. Only the last numeric column has missing values (5%), since
+    several chart types reject columns with gaps.
+    """
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i in range(numeric_columns):
+        kind = i % 3
+        if kind == 0:
+            values = rng.normal(loc=i, scale=1 + i, size=rows)
+        elif kind == 1:
+            values = rng.exponential(scale=1 + i, size=rows)
+        else:
+            values = rng.integers(0, 1000, size=rows).astype(float)
+        if i == numeric_columns - 1:
+            values[rng.random(rows) < 0.05] = np.nan
+        data[f'num_{i}'] = values
+    for i in range(categorical_columns):
+        levels = np.array([f'c{i}_{level}' for level in range(cardinality)])
+        data[f'cat_{i}'] = levels[rng.integers(0, cardinality, size=rows)]
+    data['when'] = pd.date_range('2020-01-01', periods=rows, freq='h').astype(str)
+    return pd.DataFrame(data)
+
+
+def _chart_columns(numeric, categorical):
+    """Column mapping for every chart type, built from the synthetic column names."""
+    x, y, z, w = numeric[:4]
+    cat, cat2 = categorical[:2]
+    return {
+        'histogram': {'x_axis': x}, 'kde_plot': {'x_axis': x}, 'rug_plot': {'x_axis': x},
+        'count_plot': {'x_axis': cat}, 'pie_chart': {'names': cat}, 'pie_chart_3d': {'names': cat},
+        'scatter': {'x_axis': x, 'y_axis': y}, 'density_plot': {'x_axis': x, 'y_axis': y}, 'hexbin_plot': {'x_axis': x, 'y_axis': y},
+        'line_chart': {'time_axis': 'when', 'y_axis': y}, 'area_chart': {'time_axis': 'when', 'y_axis': y, 'color': cat},
+        'bar_chart': {'x_axis': cat, 'y_axis': y}, 'violin_plot': {'x_axis': cat, 'y_axis': y},
+        'stacked_bar_chart': {'x_axis': cat, 'y_axis': y, 'color': cat2},
+        'heatmap': {'columns': numeric}, 'pair_plot': {'columns': [x, y, z]}, 'parallel_coordinates': {'columns': [x, y, z, w]},
+        'bubble_chart': {'x_axis': x, 'y_axis': y, 'size': z}, 'scatter_3d': {'x_axis': x, 'y_axis': y, 'z_axis': z},
+        'sunburst_chart': {'path': [cat, cat2], 'values': z}, 'treemap': {'path': [cat, cat2], 'values': z},
+    }
+
+
+def _reset_peak_rss():
+    """Resets the kernel's peak-RSS counter for this process (Linux); returns False where unsupported."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as fh:
+            fh.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_bytes():
+    try:
+        with open('/proc/self/status') as fh:
+            for line in fh:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=str(settings.BASE_DIR),
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Benchmarks every chart type, cleaning view and data endpoint on a synthetic project."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50_000, help="Rows in the synthetic dataset.")
+        parser.add_argument('--columns', type=int, default=6, help="Numeric columns (at least 4).")
+        parser.add_argument('--categorical-columns', type=int, default=2, help="Categorical columns (at least 2).")
+        parser.add_argument('--cardinality', type=int, default=10, help="Distinct values per categorical column.")
+        parser.add_argument('--iterations', type=int, default=5, help="Timed requests per case.")
+        parser.add_argument('--warmup', type=int, default=1, help="Untimed requests per case before measuring.")
+        parser.add_argument('--seed', type=int, default=0, help="Seed for the synthetic data.")
+        parser.add_argument('--only', help="Comma-separated substrings; run only cases whose name contains one of them.")
+        parser.add_argument('--output', help="Write the JSON report to this file.")
+        parser.add_argument('--compare', help="Baseline JSON report to compare p50 latency against.")
+        parser.add_argument('--threshold', type=float, default=0.10, help="Relative p50 slowdown reported as a regression (default 0.10).")
+        parser.add_argument('--fail-on-regression', action='store_true', help="Exit with an error when a case regressed.")
+
+    def handle(self, *args, **options):
+        if options['columns'] < 4 or options['categorical_columns'] < 2:
+            raise CommandError("--columns must be at least 4 and --categorical-columns at least 2.")
+        if options['rows'] < 10 or options['cardinality'] < 1 or options['iterations'] < 1:
+            raise CommandError("--rows must be at least 10, --cardinality and --iterations at least 1.")
+
+        media_root = tempfile.mkdtemp(prefix='benchmark-media-')
+        isolated = override_settings(
+            MEDIA_ROOT=media_root,
+            TRANSFORMATION_MATERIALIZE='lazy',
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'}},
+        )
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        isolated.enable()
+        try:
+            report = self._run(options)
+        finally:
+            isolated.disable()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(media_root, ignore_errors=True)
+
+        self._print_report(report)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+        if options['compare']:
+            self._compare(report, options)
+
+    # --- Running ---
+
+    def _run(self, options):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+        from ...views.visualization_views import chart_generator_map
+
+        user = User.objects.create_user('benchmark', 'benchmark@example.com', None)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        df = _synthetic_frame(options['rows'], options['columns'], options['categorical_columns'], options['cardinality'], options['seed'])
+        numeric = [c for c in df.columns if c.startswith('num_')]
+        categorical = [c for c in df.columns if c.startswith('cat_')]
+        self.stdout.write(f"Dataset: {len(df):,} rows x {len(df.columns)} columns (cardinality {options['cardinality']})")
+
+        upload = SimpleUploadedFile('benchmark.csv', df.to_csv(index=False).encode(), content_type='text/csv')
+        started = time.perf_counter()
+        response = client.post(reverse('upload_project'), {'data_file': upload, 'title': 'Benchmark'}, format='multipart')
+        upload_ms = (time.perf_counter() - started) * 1000
+        if response.status_code != 201:
+            raise CommandError(f"Uploading the synthetic project failed ({response.status_code}): {response.content[:500]!r}")
+        project = DataProject.objects.get(id=response.json()['id'])
+        original_metadata = project.metadata_json
+
+        def restore():
+            # Cleaning cases only append to the transformation log (TRANSFORMATION_MATERIALIZE
+            # is 'lazy' here), so the stored data is still the upload
+            project.transformations.all().delete()
+            DataProject.objects.filter(id=project.id).update(metadata_json=original_metadata, data_version=0, materialized_version=0)
+            transformations.forget(project.id)
+
+        cases = []
+        chart_columns = _chart_columns(numeric, categorical)
+        for chart_type in chart_generator_map:
+            body = {'project_id': project.id, 'chart_type': chart_type, 'columns': chart_columns.get(chart_type),
+                    'hypertune_params': {}, 'filters': {}}
+            cases.append((f'chart:{chart_type}', 'chart', 'post', reverse('generate_chart'), body, None))
+
+        y, gaps = numeric[1], numeric[-1]
+        cat = categorical[0]
+        cases += [
+            ('read:raw_data', 'read', 'get', reverse('raw-data-view', args=[project.id]), None, None),
+            ('read:raw_data_sorted', 'read', 'get', reverse('raw-data-view', args=[project.id]), {'sort_key': y, 'sort_direction': 'desc'}, None),
+            ('read:raw_data_sample', 'read', 'get', reverse('raw-data-view', args=[project.id]), {'resolution': 'sample'}, None),
+            ('read:unique_values', 'read', 'get', reverse('fetch-unique-values', args=[project.id, cat]), None, None),
+            ('clean:detect_outliers', 'cleaning', 'post', reverse('detect-outliers'), {'project_id': project.id, 'column_name': y}, None),
+            ('clean:impute_mean', 'cleaning', 'post', reverse('impute-missing-values'), {'project_id': project.id, 'column_name': gaps, 'method': 'mean'}, restore),
+            ('clean:impute_median', 'cleaning', 'post', reverse('impute-missing-values'), {'project_id': project.id, 'column_name': gaps, 'method': 'median'}, restore),
+            ('clean:impute_mode', 'cleaning', 'post', reverse('impute-missing-values'), {'project_id': project.id, 'column_name': gaps, 'method': 'mode'}, restore),
+            ('clean:impute_constant', 'cleaning', 'post', reverse('impute-missing-values'),
+             {'project_id': project.id, 'column_name': gaps, 'method': 'constant', 'constant_value': 0}, restore),
+            ('clean:remove_column', 'cleaning', 'post', reverse('remove-column'), {'project_id': project.id, 'column_name': numeric[-1]}, restore),
+            ('clean:treat_outliers_cap', 'cleaning', 'post', reverse('treat-outliers'), {'project_id': project.id, 'column_name': y, 'method': 'cap'}, restore),
+            ('clean:treat_outliers_remove', 'cleaning', 'post', reverse('treat-outliers'), {'project_id': project.id, 'column_name': y, 'method': 'remove'}, restore),
+            ('clean:recode', 'cleaning', 'post', reverse('recode-column'),
+             {'project_id': project.id, 'column_name': cat, 'recode_map': {f'c0_{level}': 'grouped' for level in range(0, options['cardinality'], 2)}}, restore),
+            ('clean:pipeline_impute_all', 'cleaning', 'post', reverse('cleaning-pipeline'),
+             {'project_id': project.id, 'steps': [{'operation': 'impute', 'column_name': column, 'method': 'median'} for column in numeric]}, restore),
+        ]
+        if options['only']:
+            wanted = [part.strip() for part in options['only'].split(',') if part.strip()]
+            cases = [case for case in cases if any(part in case[0] for part in wanted)]
+
+        results = [self._measure(client, case, options) for case in cases]
+        return {
+            'meta': {
+                'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'commit': _git_commit(),
+                'python': sys.version.split()[0], 'pandas': pd.__version__, 'numpy': np.__version__,
+                'rows': options['rows'], 'numeric_columns': options['columns'],
+                'categorical_columns': options['categorical_columns'], 'cardinality': options['cardinality'],
+                'iterations': options['iterations'], 'warmup': options['warmup'], 'seed': options['seed'],
+                'upload_ms': round(upload_ms, 1),
+            },
+            'cases': results,
+        }
+
+    def _request(self, client, method, url, body):
+        if method == 'get':
+            return client.get(url, body or {})
+        return client.post(url, body, format='json')
+
+    def _measure(self, client, case, options):
+        name, kind, method, url, body, before_each = case
+        self.stdout.write(f"  {name} ...", ending='')
+        self.stdout.flush()
+        for _ in range(options['warmup']):
+            if before_each: before_each()
+            cache.clear()
+            self._request(client, method, url, body)
+
+        latencies, statuses, payloads = [], [], []
+        rss_reset = _reset_peak_rss()
+        for _ in range(options['iterations']):
+            if before_each: before_each()
+            cache.clear()
+            started = time.perf_counter()
+            response = self._request(client, method, url, body)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses.append(response.status_code)
+            payloads.append(len(response.content))
+        if before_each: before_each()
+
+        latencies = np.array(latencies)
+        result = {
+            'name': name, 'kind': kind, 'status_codes': sorted(set(statuses)),
+            'ok': all(200 <= code < 300 for code in statuses),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 2), 'p90_ms': round(float(np.percentile(latencies, 90)), 2),
+            'p99_ms': round(float(np.percentile(latencies, 99)), 2), 'mean_ms': round(float(latencies.mean()), 2),
+            'min_ms': round(float(latencies.min()), 2), 'max_ms': round(float(latencies.max()), 2),
+            'payload_bytes': int(np.median(payloads)),
+            # Process-wide high-water mark; only per-case when the counter could be reset.
+            'peak_rss_mb': round(_peak_rss_bytes() / 2 ** 20, 1), 'peak_rss_per_case': rss_reset,
+        }
+        self.stdout.write(f" p50 {result['p50_ms']:.1f} ms" + ('' if result['ok'] else f"  (status {result['status_codes']})"))
+        return result
+
+    # --- Reporting ---
+
+    def _print_report(self, report):
+        self.stdout.write("")
+        self.stdout.write(f"{'case':<34} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'payload':>11} {'peak RSS':>10}  status")
+        for row in report['cases']:
+            self.stdout.write(
+                f"{row['name']:<34} {row['p50_ms']:>9.1f} {row['p90_ms']:>9.1f} {row['p99_ms']:>9.1f} "
+                f"{row['payload_bytes']:>11,} {row['peak_rss_mb']:>7.1f} MB  {','.join(map(str, row['status_codes']))}")
+        failed = [row['name'] for row in report['cases'] if not row['ok']]
+        if failed:
+            self.stdout.write(self.style.WARNING(f"Non-2xx responses: {', '.join(failed)}"))
+
+    def _compare(self, report, options):
+        try:
+            with open(options['compare']) as fh:
+                baseline = json.load(fh)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read baseline report: {e}")
+        if baseline.get('meta', {}).get('rows') != report['meta']['rows']:
+            self.stdout.write(self.style.WARNING("Baseline was run with a different --rows; deltas are not comparable."))
+
+        previous = {row['name']: row for row in baseline.get('cases', [])}
+        regressions = []
+        self.stdout.write("")
+        self.stdout.write(f"Compared with {options['compare']} (commit {baseline.get('meta', {}).get('commit') or 'unknown'}):")
+        for row in report['cases']:
+            old = previous.get(row['name'])
+            if old is None or not old['p50_ms']:
+                self.stdout.write(f"  {row['name']:<34} new case")
+                continue
+            change = row['p50_ms'] / old['p50_ms'] - 1
+            line = f"  {row['name']:<34} {old['p50_ms']:>9.1f} -> {row['p50_ms']:>9.1f} ms  ({change:+.1%})"
+            if change > options['threshold']:
+                regressions.append(row['name'])
+                self.stdout.write(self.style.ERROR(line + "  REGRESSION"))
+            else:
+                self.stdout.write(line)
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f"{len(regressions)} case(s) regressed by more than {options['threshold']:.0%}: {', '.join(regressions)}")
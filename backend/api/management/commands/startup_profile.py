@@ -0,0 +1,87 @@
+# api/management/commands/startup_profile.py
+
+"""
+Reports a cold-start time breakdown for a worker process.
+
+Each run starts a fresh interpreter and measures, in order: Django setup,
+importing the URL configuration (all API views), and importing each of the
+lazily loaded heavy modules. Use --json to record results and compare them
+between commits.
+
+    python manage.py startup_profile --runs 5
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+RESULT_MARKER = 'STARTUP_PROFILE_RESULT:'
+
+PROBE_SCRIPT = f"""
+import importlib, json, time
+stages = []
+start = time.perf_counter()
+import django
+django.setup()
+stages.append(['django.setup', time.perf_counter() - start])
+
+from django.conf import settings
+mark = time.perf_counter()
+importlib.import_module(settings.ROOT_URLCONF)
+stages.append(['url configuration (views)', time.perf_counter() - mark])
+
+from api import lazy_imports
+for name, seconds in lazy_imports.preload().items():
+    stages.append(['lazy: ' + name, seconds])
+print({RESULT_MARKER!r} + json.dumps(stages))
+"""
+
+
+class Command(BaseCommand):
+    help = "Measures worker cold-start time: Django setup, URL/view imports and each heavy module."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help="Number of fresh interpreters to measure (median is reported).")
+        parser.add_argument('--json', action='store_true', help="Print the breakdown as JSON.")
+
+    def _probe(self):
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', os.environ.get('DJANGO_SETTINGS_MODULE', 'backend.settings'))
+        env['PRELOAD_HEAVY_MODULES'] = '0'  # measure the lazy path; preload is timed separately
+        proc = subprocess.run([sys.executable, '-c', PROBE_SCRIPT], cwd=str(settings.BASE_DIR), env=env, capture_output=True, text=True)
+        for line in proc.stdout.splitlines():
+            if line.startswith(RESULT_MARKER):
+                return json.loads(line[len(RESULT_MARKER):])
+        raise CommandError(f"Startup probe failed:\n{proc.stderr[-2000:]}")
+
+    def handle(self, *args, **options):
+        runs = max(1, options['runs'])
+        samples = {}
+        order = []
+        for _ in range(runs):
+            for stage, seconds in self._probe():
+                if stage not in samples:
+                    samples[stage] = []; order.append(stage)
+                samples[stage].append(seconds)
+
+        breakdown = [{'stage': stage, 'median_ms': round(statistics.median(samples[stage]) * 1000, 1),
+                      'max_ms': round(max(samples[stage]) * 1000, 1)} for stage in order]
+        boot_ms = sum(row['median_ms'] for row in breakdown if not row['stage'].startswith('lazy: '))
+        lazy_ms = sum(row['median_ms'] for row in breakdown if row['stage'].startswith('lazy: '))
+        report = {'runs': runs, 'python': sys.version.split()[0], 'boot_ms': round(boot_ms, 1),
+                  'deferred_ms': round(lazy_ms, 1), 'stages': breakdown}
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"Startup breakdown (median of {runs} run(s)):")
+        for row in breakdown:
+            self.stdout.write(f"  {row['stage']:<40} {row['median_ms']:>9.1f} ms   (max {row['max_ms']:.1f} ms)")
+        self.stdout.write(f"  {'worker boot (setup + views)':<40} {boot_ms:>9.1f} ms")
+        self.stdout.write(f"  {'deferred to first use':<40} {lazy_ms:>9.1f} ms")
@@ -0,0 +1,231 @@
+# api/metrics.py
+
+"""
+In-process metrics registry with a Prometheus text exposition.
+
+Counters, gauges and histograms live in this process's memory (each worker
+process has its own registry; scrape every worker, or run one). They are
+exposed at /api/metrics/ in the Prometheus text format by MetricsView, with
+no external service or client library involved.
+
+    metrics.CACHE_REQUESTS.inc(cache='chart', result='hit')
+    metrics.MEDIA_BYTES_READ.inc(size)
+
+Request latency is observed by MetricsMiddleware per (endpoint route, method,
+status, chart_type); views add labels with annotate_request().
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+
+_request_labels = contextvars.ContextVar('api_metrics_labels', default=None)
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, '')) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = [(name, value) for name, value in zip(labelnames, key)] + list(extra)
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def collect(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(Counter):
+    """Gauge set/incremented by the code, or computed at scrape time from `callback`."""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(self.labelnames, labels)] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def collect(self):
+        if self.callback is not None:
+            return self.header() + [f"{self.name} {_format_value(self.callback())}"]
+        return super().collect()
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def collect(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = self.header()
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', _format_value(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def exposition(self):
+        """All metrics in the Prometheus text format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def _jobs_in_flight():
+    from . import jobs
+    return jobs.in_flight_count()
+
+
+def _jobs_queued():
+    from . import jobs
+    return jobs.queued_count()
+
+
+def _render_waiting():
+    from . import image_cache
+    return image_cache.render_waiting()
+
+
+# --- Metric definitions ---
+
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    'api_request_duration_seconds', 'API request latency by endpoint route and chart type.',
+    ('endpoint', 'method', 'status', 'chart_type')))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    'api_cache_requests_total', 'Cache lookups by cache (chart, correlation, stored_sample) and result (hit, miss).',
+    ('cache', 'result')))
+MEDIA_BYTES_READ = REGISTRY.register(Counter(
+    'api_media_bytes_read_total', 'Bytes of project data read from MEDIA_ROOT.'))
+RENDER_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'api_render_queue_depth', 'Chart renders waiting for the matplotlib render lock.', callback=_render_waiting))
+JOBS_QUEUED = REGISTRY.register(Gauge(
+    'api_jobs_queued', 'Background jobs submitted but not yet started.', callback=_jobs_queued))
+JOBS_IN_FLIGHT = REGISTRY.register(Gauge(
+    'api_jobs_in_flight', 'Background jobs currently executing.', callback=_jobs_in_flight))
+DB_POOL_CHECKOUTS = REGISTRY.register(Counter(
+    'api_db_pool_checkouts_total', 'SQLAlchemy pool connection checkouts per DbConnection.', ('connection',)))
+DB_POOL_CHECKED_OUT = REGISTRY.register(Gauge(
+    'api_db_pool_checked_out', 'SQLAlchemy pool connections currently checked out per DbConnection.', ('connection',)))
+
+
+# --- Instrumentation helpers ---
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def instrument_engine(engine, connection_id):
+    """Counts pool checkouts/checkins of a SQLAlchemy engine under the given DbConnection id."""
+    from sqlalchemy import event
+    label = str(connection_id)
+
+    @event.listens_for(engine, 'checkout')
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKOUTS.inc(connection=label)
+        DB_POOL_CHECKED_OUT.inc(connection=label)
+
+    @event.listens_for(engine, 'checkin')
+    def _checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.dec(connection=label)
+
+    return engine
+
+
+def annotate_request(**labels):
+    """Adds labels (e.g. chart_type) to the current request's latency observation."""
+    current = _request_labels.get()
+    if current is not None:
+        current.update(labels)
+
+
+class MetricsMiddleware:
+    """Observes every request's latency into REQUEST_LATENCY."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        labels = {}
+        token = _request_labels.set(labels)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_labels.reset(token)
+        match = getattr(request, 'resolver_match', None)
+        endpoint = match.route if match is not None else 'unmatched'
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - start, endpoint=endpoint, method=request.method,
+            status=response.status_code, chart_type=labels.get('chart_type', ''))
+        return response
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.6 on 2026-10-19 19:38
+
+from django.db import migrations, models
+
+
+def link_linear_log(apps, schema_editor):
+    # Logs written before undo existed are linear: each step applies to the previous one
+    TransformationStep = apps.get_model("api", "TransformationStep")
+    TransformationStep.objects.update(parent=models.F("sequence") - 1)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0005_transformation_log"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="transformationstep",
+            name="metadata_json",
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="transformationstep",
+            name="parent",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(link_linear_log, migrations.RunPython.noop),
+    ]
@@ -73,6 +73,11 @@ class DataProject(models.Model):
     
     is_processed = models.BooleanField(default=False)
     is_cleaned = models.BooleanField(default=False)
+
+    # Transformation log (api/transformations.py): data_version is the current version
+    # (a log sequence; 0 is the data as ingested), materialized_version the last one stored.
+    data_version = models.PositiveIntegerField(default=0)
+    materialized_version = models.PositiveIntegerField(default=0)
     
     class Meta:
         db_table = 'api_dataproject' 
@@ -81,6 +86,30 @@ class DataProject(models.Model):
         return f'Project {self.project_id} by {self.owner.username}'
 
 
+class TransformationStep(models.Model):
+    """
+    One cleaning step in a project's append-only transformation log.
+    `step` is the operation dict understood by api/cleaning.py, applied to
+    version `parent` to produce version `sequence`; after an undo, new steps
+    branch off an earlier version, so the log is a tree.
+    """
+    project = models.ForeignKey(DataProject, on_delete=models.CASCADE, related_name='transformations')
+    sequence = models.PositiveIntegerField()
+    parent = models.PositiveIntegerField(default=0)
+    step = models.JSONField()
+    # Column metadata of the data after this step (DataProject.metadata_json once it is the head)
+    metadata_json = models.JSONField(null=True, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('project', 'sequence')
+        ordering = ['sequence']
+
+    def __str__(self):
+        return f"Step {self.sequence} of project {self.project_id}: {self.step.get('operation')}"
+
+
 # ----------------------------------------------------------------------
 # Db Connection Model
 # ----------------------------------------------------------------------
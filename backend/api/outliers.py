@@ -0,0 +1,120 @@
+# api/outliers.py
+
+"""
+Whole-table outlier scan.
+
+scan() computes box-plot statistics and outlier counts for every numerical
+column of a DataFrame in one vectorized pass over a 2-D float array: one
+nanquantile call for the quartiles of all columns, then array masks for
+
+  - IQR fences (Q1 - 1.5 IQR, Q3 + 1.5 IQR, as cleaning.outlier_bounds),
+  - z-scores |x - mean| / std above z_threshold,
+  - modified z-scores 0.6745 |x - median| / MAD above mad_threshold.
+
+The result is JSON-ready (NaN -> None) so the client draws the box plots
+itself instead of requesting one rendered image per column. Results are
+cached per (project, project version, parameters) like api/correlation.py.
+"""
+
+import hashlib
+import json
+import warnings
+
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+
+from . import metrics
+
+CACHE_PREFIX = 'outliers'
+CACHE_TIMEOUT = 60 * 60  # seconds
+Z_THRESHOLD = 3.0
+MAD_THRESHOLD = 3.5
+MAX_FLIERS = 20  # most extreme IQR outliers returned per column for drawing
+
+
+def _number(value):
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def _fliers(values, mask, limit):
+    """Up to `limit` of the flagged values, split between the lowest and the highest."""
+    flagged = np.sort(values[mask])
+    if len(flagged) <= limit:
+        return flagged.tolist()
+    low = (limit + 1) // 2
+    return np.concatenate([flagged[:low], flagged[len(flagged) - (limit - low):]]).tolist()
+
+
+def numeric_columns(df):
+    return [label for label in df.columns
+            if pd.api.types.is_numeric_dtype(df[label].dtype) and not pd.api.types.is_bool_dtype(df[label].dtype)]
+
+
+def scan(df, columns=None, z_threshold=Z_THRESHOLD, mad_threshold=MAD_THRESHOLD, max_fliers=MAX_FLIERS):
+    """
+    Box-plot statistics and outlier counts for `columns` (default: every
+    numerical column), one dict per column in column order.
+    """
+    columns = numeric_columns(df) if columns is None else list(dict.fromkeys(columns))
+    if not columns:
+        return []
+    values = df[columns].to_numpy(dtype='float64', na_value=np.nan)
+    present = ~np.isnan(values)
+    counts = present.sum(axis=0)
+
+    # nan-reductions warn for all-NaN columns; those columns simply get None statistics
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        q1, median, q3 = np.nanquantile(values, [0.25, 0.5, 0.75], axis=0)
+        iqr = q3 - q1
+        lower, upper = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+        iqr_mask = (values < lower) | (values > upper)
+        inside = np.where(iqr_mask, np.nan, values)
+        whisker_low, whisker_high = np.nanmin(inside, axis=0), np.nanmax(inside, axis=0)
+
+        mean = np.nanmean(values, axis=0)
+        std = np.nanstd(values, axis=0, ddof=1)
+        z_mask = np.abs(values - mean) / std > z_threshold
+
+        deviation = np.abs(values - median)
+        mad = np.nanmedian(deviation, axis=0)
+        # A zero MAD (over half the values equal) makes every other value infinitely far: flag none
+        mad_mask = (0.6745 * deviation / mad > mad_threshold) & (mad > 0)
+
+        minimum, maximum = np.nanmin(values, axis=0), np.nanmax(values, axis=0)
+
+    iqr_counts, z_counts, mad_counts = iqr_mask.sum(axis=0), z_mask.sum(axis=0), mad_mask.sum(axis=0)
+    results = []
+    for j, label in enumerate(columns):
+        results.append({
+            'column_name': label, 'count': int(counts[j]), 'missing': int(len(values) - counts[j]),
+            'mean': _number(mean[j]), 'std': _number(std[j]), 'min': _number(minimum[j]), 'max': _number(maximum[j]),
+            'q1': _number(q1[j]), 'median': _number(median[j]), 'q3': _number(q3[j]), 'iqr': _number(iqr[j]),
+            'lower_bound': _number(lower[j]), 'upper_bound': _number(upper[j]),
+            'whisker_low': _number(whisker_low[j]), 'whisker_high': _number(whisker_high[j]),
+            'mad': _number(mad[j]),
+            'outlier_count': int(iqr_counts[j]), 'z_outlier_count': int(z_counts[j]), 'mad_outlier_count': int(mad_counts[j]),
+            'fliers': _fliers(values[:, j], iqr_mask[:, j], max_fliers) if iqr_counts[j] else [],
+        })
+    return results
+
+
+def get_scan(load, cache_key=None, **params):
+    """
+    scan() of the DataFrame returned by load(), served from the cache (without
+    calling load) when the same project version was scanned with the same
+    parameters.
+    """
+    if not cache_key:
+        return scan(load(), **params)
+    fingerprint = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+    key = f"{CACHE_PREFIX}:{':'.join(str(part) for part in cache_key)}:{fingerprint}"
+    cached = cache.get(key)
+    metrics.record_cache('outlier_scan', cached is not None)
+    if cached is not None:
+        return cached
+    result = scan(load(), **params)
+    cache.set(key, result, CACHE_TIMEOUT)
+    return result
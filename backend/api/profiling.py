@@ -0,0 +1,209 @@
+# api/profiling.py
+
+"""
+Opt-in profiling of a single API request.
+
+A staff user adds `X-Profile: 1` (or `?profile=1`) to any API request and
+ProfilingMiddleware runs that request under cProfile with tracemalloc
+allocation tracking. The result is stored under PROFILE_DIR as:
+
+  - <id>.prof: raw pstats data (python -m pstats, snakeviz, ...)
+  - <id>.json: summary with the request, the hottest functions by
+    cumulative and own time, and the top allocation sites
+
+The id is returned in the X-Profile-Id response header and the profile is
+read back with GET /api/profiles/<id>/ (staff only), optionally narrowed to
+frames from one module, e.g. ?filter=visualization_views.
+
+Only one request is profiled at a time in a process (tracemalloc is global);
+a second profiled request runs normally with `X-Profile-Status: busy`.
+Requests without the flag pay one header lookup.
+"""
+
+import cProfile
+import json
+import logging
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+
+from django.conf import settings
+from django.utils import timezone
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+PROFILE_STATUS_HEADER = 'X-Profile-Status'
+TRACEMALLOC_FRAMES = 25
+SUMMARY_FUNCTIONS = 40
+SUMMARY_ALLOCATIONS = 30
+SORT_KEYS = ('cumulative', 'tottime', 'calls')
+_VALID_PROFILE_ID = re.compile(r'^[0-9a-f]{32}$')
+
+logger = logging.getLogger(__name__)
+
+_profile_lock = threading.Lock()
+
+
+def get_profile_dir():
+    return str(getattr(settings, 'PROFILE_DIR', os.path.join(settings.BASE_DIR, 'profiles')))
+
+
+def profile_path(profile_id, extension):
+    if not _VALID_PROFILE_ID.match(profile_id or ''):
+        raise ValueError("Invalid profile id.")
+    return os.path.join(get_profile_dir(), f"{profile_id}.{extension}")
+
+
+def _requested(request):
+    return request.headers.get(PROFILE_HEADER) in ('1', 'true') or request.GET.get('profile') in ('1', 'true')
+
+
+def _is_staff(request):
+    """Staff check before the view runs: session user, or the JWT in the Authorization header."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    from rest_framework.request import Request
+    from rest_framework.settings import api_settings
+    try:
+        drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+        return bool(drf_request.user and drf_request.user.is_staff)
+    except Exception:
+        return False
+
+
+def function_rows(stats, sort='cumulative', limit=SUMMARY_FUNCTIONS, filter_text=None):
+    """Rows of a pstats.Stats as dicts, sorted and optionally limited to frames whose file contains filter_text."""
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Invalid sort '{sort}'. Must be one of: {', '.join(SORT_KEYS)}.")
+    rows = []
+    for (filename, line, function), (primitive_calls, calls, own, cumulative, _callers) in stats.stats.items():
+        if filter_text and filter_text not in filename:
+            continue
+        rows.append({
+            'function': function, 'file': filename, 'line': line, 'calls': calls, 'primitive_calls': primitive_calls,
+            'tottime_ms': round(own * 1000, 3), 'cumtime_ms': round(cumulative * 1000, 3),
+        })
+    key = {'cumulative': 'cumtime_ms', 'tottime': 'tottime_ms', 'calls': 'calls'}[sort]
+    rows.sort(key=lambda row: row[key], reverse=True)
+    return rows[:limit] if limit else rows
+
+
+def _allocation_rows(snapshot, limit=SUMMARY_ALLOCATIONS):
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, cProfile.__file__),
+    ))
+    return [{
+        'file': stat.traceback[0].filename, 'line': stat.traceback[0].lineno,
+        'size_kb': round(stat.size / 1024, 1), 'count': stat.count,
+    } for stat in snapshot.statistics('lineno')[:limit]]
+
+
+def _prune():
+    """Keeps the newest PROFILE_RETENTION profiles."""
+    keep = getattr(settings, 'PROFILE_RETENTION', 50)
+    directory = get_profile_dir()
+    summaries = sorted((name for name in os.listdir(directory) if name.endswith('.json')),
+                       key=lambda name: os.path.getmtime(os.path.join(directory, name)), reverse=True)
+    for name in summaries[keep:]:
+        for extension in ('json', 'prof'):
+            path = os.path.join(directory, f"{name[:-5]}.{extension}")
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def list_profiles():
+    directory = get_profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in os.listdir(directory):
+        if name.endswith('.json'):
+            with open(os.path.join(directory, name)) as fh:
+                summary = json.load(fh)
+            profiles.append({key: summary[key] for key in ('id', 'created_at', 'method', 'path', 'status', 'duration_ms', 'user_id')})
+    return sorted(profiles, key=lambda p: p['created_at'], reverse=True)
+
+
+def load_summary(profile_id):
+    with open(profile_path(profile_id, 'json')) as fh:
+        return json.load(fh)
+
+
+def load_stats(profile_id):
+    return pstats.Stats(profile_path(profile_id, 'prof'))
+
+
+def _store(profile_id, profiler, snapshot, peak_bytes, request, response, duration):
+    os.makedirs(get_profile_dir(), exist_ok=True)
+    profiler.dump_stats(profile_path(profile_id, 'prof'))
+    stats = pstats.Stats(profiler)
+    user = getattr(request, 'user', None)
+    summary = {
+        'id': profile_id, 'created_at': timezone.now().isoformat(),
+        'method': request.method, 'path': request.get_full_path(), 'status': response.status_code,
+        'user_id': user.id if user is not None and user.is_authenticated else None,
+        'request_id': getattr(request, 'request_id', None),
+        'duration_ms': round(duration * 1000, 1), 'total_calls': stats.total_calls,
+        'peak_traced_memory_kb': round(peak_bytes / 1024, 1),
+        'by_cumulative': function_rows(stats, 'cumulative'),
+        'by_tottime': function_rows(stats, 'tottime'),
+        'allocations': _allocation_rows(snapshot),
+    }
+    with open(profile_path(profile_id, 'json'), 'w') as fh:
+        json.dump(summary, fh)
+    _prune()
+
+
+class ProfilingMiddleware:
+    """Profiles requests flagged with X-Profile: 1 / ?profile=1 from staff users."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'PROFILING_ENABLED', True) or not _requested(request):
+            return self.get_response(request)
+        if not _is_staff(request):
+            response = self.get_response(request)
+            response[PROFILE_STATUS_HEADER] = 'forbidden'
+            return response
+        if not _profile_lock.acquire(blocking=False):
+            response = self.get_response(request)
+            response[PROFILE_STATUS_HEADER] = 'busy'
+            return response
+
+        try:
+            profile_id = uuid.uuid4().hex
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            tracemalloc.reset_peak()
+            profiler = cProfile.Profile()
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+                duration = time.perf_counter() - start
+                snapshot = tracemalloc.take_snapshot()
+                peak_bytes = tracemalloc.get_traced_memory()[1]
+                if started_tracing:
+                    tracemalloc.stop()
+            try:
+                _store(profile_id, profiler, snapshot, peak_bytes, request, response, duration)
+            except OSError:
+                logger.exception("Could not store profile %s", profile_id)
+                response[PROFILE_STATUS_HEADER] = 'failed'
+                return response
+        finally:
+            _profile_lock.release()
+        response[PROFILE_ID_HEADER] = profile_id
+        response[PROFILE_STATUS_HEADER] = 'stored'
+        return response
@@ -0,0 +1,64 @@
+# api/renderers.py
+
+"""
+Response renderers for the API.
+
+FastJSONRenderer writes the response body with orjson when it is installed
+(numpy arrays and scalars are serialized natively), and falls back to DRF's
+standard JSONRenderer otherwise.
+"""
+
+import numpy as np
+import pandas as pd
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import timing
+
+try:
+    import orjson
+except ImportError:  # Optional dependency: fall back to the stdlib encoder
+    orjson = None
+
+
+_drf_encoder = JSONEncoder()
+
+
+def _default(obj):
+    """Fallback for objects orjson cannot serialize natively."""
+    if obj is pd.NaT:
+        return None
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind == 'M':
+            return [None if pd.isna(value) else value.isoformat() for value in pd.DatetimeIndex(obj.ravel())]
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return _drf_encoder.default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that serializes in a single pass with orjson when available."""
+
+    orjson_options = (
+        (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+        if orjson else 0
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timing.span('serialize') as stage:
+            body = self._render(data, accepted_media_type, renderer_context)
+            stage.bytes = len(body)
+        return body
+
+    def _render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        # Honour explicit indentation requests (e.g. `Accept: application/json; indent=2`).
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(data, default=_default, option=self.orjson_options)
@@ -0,0 +1,187 @@
+# api/sampling.py
+
+"""
+Row sampling helpers and the stored sample tier.
+
+All sampling functions are vectorized (no per-group Python loops) and keep
+the original row order of the DataFrame, so time-ordered data stays ordered.
+
+Every project whose data exceeds STORED_SAMPLE_ROWS also keeps a persisted
+stratified sample next to its data (<name>.sample.pkl, where <name> is the
+version manifest for column-store projects, see api/column_store.py). It is
+written on ingest and whenever a cleaned version is materialized, and is
+rebuilt on read if it is older than the data. Views read it through
+transformations.load_frame(project, 'sample').
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from . import metrics
+from . import timing
+
+# Strata with more distinct values than this are not used for stratification.
+MAX_STRATA = 1000
+
+RESOLUTIONS = ('full', 'sample')
+# Used when no request-derived seed is available.
+DEFAULT_SEED = 0
+# Fixed seed so the stored sample only changes when the data does.
+STORED_SAMPLE_SEED = DEFAULT_SEED
+
+
+# --- Seeds ---
+
+def request_fingerprint(*parts):
+    """Stable short hash of JSON-like request parts (dict key order independent)."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def derive_seed(*parts):
+    """Deterministic 32-bit seed from arbitrary parts, e.g. (project id, project version, request fingerprint)."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return int.from_bytes(hashlib.sha256(payload.encode('utf-8')).digest()[:4], 'big')
+
+
+# --- Sampling ---
+
+def uniform_sample(df, n, random_state=None):
+    """Simple random sample of n rows without replacement (reservoir-equivalent)."""
+    if n >= len(df):
+        return df
+    rng = np.random.default_rng(random_state)
+    positions = np.sort(rng.choice(len(df), size=n, replace=False))
+    return df.iloc[positions]
+
+
+def stratified_sample(df, n, strata_cols=None, random_state=None, min_per_stratum=1):
+    """
+    Proportional stratified sample of about n rows.
+
+    Every stratum (combination of strata_cols values, NaN included) keeps
+    floor(n * share) rows and at least `min_per_stratum` rows, so rare
+    categories stay represented; the result can therefore be slightly larger
+    than n. Falls back to a uniform sample without usable strata.
+    """
+    if n >= len(df):
+        return df
+    strata_cols = [c for c in (strata_cols or []) if c in df.columns]
+    if not strata_cols:
+        return uniform_sample(df, n, random_state)
+
+    group_ids = df.groupby(strata_cols, dropna=False, observed=True, sort=False).ngroup().to_numpy()
+    counts = np.bincount(group_ids)
+    if len(counts) > MAX_STRATA:
+        return uniform_sample(df, n, random_state)
+
+    quota = np.floor(counts * (n / len(df))).astype(np.int64)
+    quota = np.minimum(counts, np.maximum(quota, min_per_stratum))
+
+    # Random order inside each stratum, then keep the first `quota` rows of each.
+    rng = np.random.default_rng(random_state)
+    order = np.lexsort((rng.random(len(df)), group_ids))
+    sorted_groups = group_ids[order]
+    group_starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    position_in_group = np.arange(len(order)) - group_starts[sorted_groups]
+    keep = order[position_in_group < quota[sorted_groups]]
+    return df.iloc[np.sort(keep)]
+
+
+def low_cardinality_columns(df, columns=None, max_unique=50):
+    """Non-numerical columns (from `columns`, default all) with at most max_unique distinct values."""
+    candidates = columns if columns is not None else df.columns
+    result = []
+    for col in candidates:
+        if col not in df.columns or pd.api.types.is_numeric_dtype(df[col]) or pd.api.types.is_datetime64_any_dtype(df[col]):
+            continue
+        if df[col].nunique(dropna=False) <= max_unique:
+            result.append(col)
+    return result
+
+
+# --- Stored sample tier ---
+
+def get_stored_sample_rows():
+    return getattr(settings, 'STORED_SAMPLE_ROWS', 100_000)
+
+
+def get_resolution(value):
+    """Validates a 'resolution' request parameter ('full' by default)."""
+    resolution = str(value or 'full').lower()
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Invalid resolution '{value}'. Must be one of: {', '.join(RESOLUTIONS)}.")
+    return resolution
+
+
+def sample_path(data_path):
+    return os.path.splitext(data_path)[0] + '.sample.pkl'
+
+
+def _stored_sample_strata(df):
+    """Lowest-cardinality categorical columns whose combined strata stay within MAX_STRATA."""
+    candidates = sorted(low_cardinality_columns(df), key=lambda col: df[col].nunique(dropna=False))
+    strata, combinations = [], 1
+    for col in candidates:
+        combinations *= max(1, df[col].nunique(dropna=False))
+        if combinations > MAX_STRATA:
+            break
+        strata.append(col)
+    return strata
+
+
+def stored_sample(df):
+    """The stored-sample tier's sample of df, or df itself when it has no more than STORED_SAMPLE_ROWS rows."""
+    n = get_stored_sample_rows()
+    if len(df) <= n:
+        return df
+    return stratified_sample(df, n, _stored_sample_strata(df), random_state=STORED_SAMPLE_SEED)
+
+
+def write_stored_sample(df, data_path):
+    """
+    (Re)writes the persisted sample for the data at data_path. Small data
+    (no more than STORED_SAMPLE_ROWS rows) is used directly, so any old
+    sample file is removed instead. Returns the sample size.
+    """
+    path = sample_path(data_path)
+    sample = stored_sample(df)
+    if sample is df:
+        if os.path.exists(path):
+            os.remove(path)
+        return len(df)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    sample.to_pickle(tmp_path)
+    os.replace(tmp_path, path)  # atomic: readers never see a partial file
+    return len(sample)
+
+
+def remove_stored_sample(data_path):
+    path = sample_path(data_path)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def load_sample(data_path, read_full):
+    """
+    Loads the stored sample of the data at data_path, rebuilding it from
+    read_full() (which loads the full data) when it is missing or older than
+    the data. Data small enough to have no sample is returned whole.
+    """
+    path = sample_path(data_path)
+    fresh = os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(data_path)
+    metrics.record_cache('stored_sample', fresh)
+    if not fresh:
+        df = read_full()
+        if len(df) <= get_stored_sample_rows():
+            return df
+        write_stored_sample(df, data_path)
+    with timing.span('load') as stage:
+        stage.bytes = os.path.getsize(path)
+        metrics.MEDIA_BYTES_READ.inc(stage.bytes)
+        return pd.read_pickle(path)
@@ -1,14 +1,17 @@
 from django.contrib.auth.models import User
 from rest_framework import serializers
-from .models import Profile, DataProject, DbConnection, Report,SharedReport# ADDED: Report Model
+from .models import Profile, DataProject, DbConnection, Report,SharedReport, TransformationStep # ADDED: Report Model
 from django.db.models import Q
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.core.exceptions import ObjectDoesNotExist
 from django.utils import timezone
+import logging
 import re
 # Assuming the necessary utility functions are available via the import below
 # from .utils import send_otp_via_sms, send_otp_via_email, send_otp_multi_channel, generate_otp
 
+logger = logging.getLogger(__name__)
+
 
 # --- CORE USER REGISTRATION SERIALIZER ---
 class UserSerializer(serializers.ModelSerializer):
@@ -158,7 +161,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
                 send_otp_multi_channel(mobile_number=profile.mobile_number, email=user_query.email, otp_code=otp_code, username=user_query.username)
                 # For safety, we skip the actual send call in the serializer for now, 
                 # but raise the required exception.
-                print(f"\n--- 2FA OTP for {user_query.username}: (OTP sent to {otp_destination}) ---")
+                logger.info("2FA OTP for %s sent to %s", user_query.username, otp_destination)
 
                 from rest_framework.exceptions import ValidationError
                 error = ValidationError({
@@ -180,11 +183,26 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
 class DataProjectSerializer(serializers.ModelSerializer):
     class Meta:
         model = DataProject
-        fields = ["id", "project_id", "title", "data_file", "created_at", "metadata_json"]
+        fields = ["id", "project_id", "title", "data_file", "created_at", "metadata_json", "data_version"]
+        read_only_fields = ["data_version"]
         # Set 'data_file' to be write-only for the upload endpoint
         extra_kwargs = {'data_file': {'write_only': True}}
 
 
+# --- Transformation Log Serializer (lineage of a project's data) ---
+class TransformationStepSerializer(serializers.ModelSerializer):
+    created_by = serializers.CharField(source='created_by.username', read_only=True, default=None)
+    # False for undone steps; context['active'] holds the sequences leading to the current version
+    active = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TransformationStep
+        fields = ["sequence", "parent", "step", "active", "created_by", "created_at"]
+
+    def get_active(self, obj):
+        return obj.sequence in self.context.get('active', ())
+
+
 # --- Db Connection Serializer (for CRU operations) ---
 class DbConnectionSerializer(serializers.ModelSerializer):
     class Meta:
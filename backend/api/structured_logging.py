@@ -0,0 +1,138 @@
+# api/structured_logging.py
+
+"""
+Structured, non-blocking logging.
+
+Application code logs through the standard library (`logging.getLogger(__name__)`).
+The LOGGING setting routes 'api.*' records to AsyncQueueHandler, which only
+puts the record on an in-memory queue; a QueueListener thread formats it as
+one JSON line and writes it to the stream, so request threads never block on
+console writes and lines from concurrent requests do not interleave.
+
+Every record carries the id of the request that emitted it. RequestIdMiddleware
+takes it from the X-Request-ID header (or generates one), echoes it on the
+response, and background jobs inherit the id of the request that submitted
+them. Levels are set per module in LOGGING['loggers'] (API_LOG_LEVEL,
+API_CHART_LOG_LEVEL, ... environment variables).
+"""
+
+import contextvars
+import json
+import logging
+import queue
+import re
+import sys
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+_VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+_request_id = contextvars.ContextVar('api_request_id', default=None)
+
+# LogRecord attributes that are not user-supplied `extra` fields.
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+
+def get_request_id():
+    return _request_id.get()
+
+
+def set_request_id(request_id):
+    """Makes request_id current for this context; returns a token for reset_request_id()."""
+    return _request_id.set(request_id)
+
+
+def reset_request_id(token):
+    _request_id.reset(token)
+
+
+class RequestIdFilter(logging.Filter):
+    """Attaches the current request id to every record (runs in the emitting thread)."""
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = _request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, request_id, message, extra fields, exception."""
+
+    def format(self, record):
+        payload = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', None),
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload['exception'] = record.exc_text
+        return json.dumps(payload, default=str)
+
+
+class AsyncQueueHandler(QueueHandler):
+    """
+    QueueHandler that owns its QueueListener. The listener thread writes JSON
+    lines to `stream`; the handler itself only enqueues. When the queue is
+    full, records are dropped rather than blocking the request.
+    """
+
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.addFilter(RequestIdFilter())
+        target = logging.StreamHandler(stream or sys.stderr)
+        target.setFormatter(JsonFormatter())
+        self.listener = QueueListener(self.queue, target, respect_handler_level=False)
+        self.listener.start()
+        self._stopped = False
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Resolve the message and traceback now (arguments may change after the
+        # call returns) but keep the extra fields, unlike QueueHandler.prepare().
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        # Called by logging.shutdown() at exit: flushes the queue and stops the listener thread.
+        if not self._stopped:
+            self._stopped = True
+            self.listener.stop()
+        super().close()
+
+
+class RequestIdMiddleware:
+    """Assigns each request an id (X-Request-ID in, X-Request-ID out) used by every log record."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = request.headers.get(REQUEST_ID_HEADER, '')
+        if not _VALID_REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        request.request_id = request_id
+        token = _request_id.set(request_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_id.reset(token)
+        response[REQUEST_ID_HEADER] = request_id
+        return response
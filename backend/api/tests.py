@@ -1,3 +1,333 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import threading
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from . import cleaning
+from . import column_store
+from . import column_types
+from . import expressions
+from . import transformations
+from .models import DataProject
+
+
+class ExpressionTests(SimpleTestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'price': [10.0, None, 30.0],
+            'unit price': [2.0, 4.0, None],
+            'city': ['Berlin', None, 'Paris'],
+            'ordered': pd.to_datetime(['2024-01-01', None, '2024-03-01']),
+        })
+
+    def evaluate(self, expression):
+        return expressions.for_frame(expression, self.df).evaluate(self.df).tolist()
+
+    def test_types_are_inferred(self):
+        self.assertEqual(expressions.for_frame('price * 2', self.df).type, expressions.NUMERICAL)
+        self.assertEqual(expressions.for_frame('price > 15 and city == "Paris"', self.df).type, expressions.BOOLEAN)
+        self.assertEqual(expressions.for_frame('upper(city)', self.df).type, expressions.CATEGORICAL)
+        self.assertEqual(expressions.for_frame('year(ordered)', self.df).type, expressions.NUMERICAL)
+
+    def test_type_errors(self):
+        for expression in ('price + city', 'not price', 'year(price)', 'where(price, 1, 2)', 'lower(price)'):
+            with self.subTest(expression=expression):
+                with self.assertRaises(expressions.ExpressionError):
+                    expressions.for_frame(expression, self.df)
+
+    def test_rejected_syntax(self):
+        for expression in ('price.real', '(lambda: 1)()', 'round(price, digits=1)', 'price[0]',
+                           '[x for x in price]', 'foo(price)', '__import__("os")'):
+            with self.subTest(expression=expression):
+                with self.assertRaises(expressions.ExpressionError):
+                    expressions.syntax_check(expression)
+
+    def test_unknown_column(self):
+        with self.assertRaises(expressions.UnknownColumnError):
+            expressions.for_frame('quantity * 2', self.df)
+
+    def test_backticked_names(self):
+        compiled = expressions.for_frame('`unit price` * 2', self.df)
+        self.assertEqual(compiled.columns, ['unit price'])
+        self.assertEqual(compiled.evaluate(self.df).tolist()[:2], [4.0, 8.0])
+        with self.assertRaises(expressions.UnknownColumnError):
+            expressions.for_frame('`unit  price` * 2', self.df)
+
+    def test_where_propagates_missing_values(self):
+        result = self.evaluate('where(price > 15, price, None)')
+        self.assertTrue(np.isnan(result[0]) and np.isnan(result[1]))
+        self.assertEqual(result[2], 30.0)
+        # A missing condition takes the false branch
+        self.assertEqual(self.evaluate('where(price > 15, "high", "low")'), ['low', 'low', 'high'])
+
+    def test_bucket_keeps_missing_values(self):
+        result = self.evaluate('bucket(price, [0, 20, 40], ["low", "high"])')
+        self.assertEqual(result[0], 'low')
+        self.assertTrue(pd.isna(result[1]))
+        self.assertEqual(result[2], 'high')
+
+    def test_depth_limit(self):
+        self.assertEqual(expressions.for_frame('-' * 40 + 'price', self.df).type, expressions.NUMERICAL)
+        for expression in ('-' * 900 + 'a', 'not ' * 450 + 'a', '1 + ' * 400 + '1'):
+            with self.subTest(expression=expression[:10]):
+                with self.assertRaises(expressions.ExpressionError):
+                    expressions.syntax_check(expression)
+
+    def test_pipeline_validator_rejects_deep_nesting(self):
+        with self.assertRaises(cleaning.CleaningError) as raised:
+            cleaning.validate_steps([{'operation': 'derive_column', 'column_name': 'x', 'expression': '-' * 900 + 'a'}])
+        self.assertEqual(raised.exception.status_code, 400)
+
+    def test_check_accepts_legacy_metadata(self):
+        registry = column_types.ColumnTypes.from_metadata({'metadata': [
+            {'name': 'price', 'type': 'numerical', 'unique_values': 2, 'missing_count': 1},
+        ]})
+        self.assertEqual(expressions.check('price / 2', registry).type, expressions.NUMERICAL)
+        self.assertIsNone(registry.type_of('price', np.dtype('float64')))
+
+
+class ProjectDataTestCase(TestCase):
+    """A project stored as version 0 of a column store (as uploads are) under a temporary MEDIA_ROOT."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, TRANSFORMATION_MATERIALIZE='lazy')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user('owner', password='secret')
+        self.df = pd.DataFrame({
+            'price': [10.0, np.nan, 30.0, 40.0],
+            'quantity': [1, 2, 3, 4],
+            'city': ['Berlin', 'Paris', 'Berlin', 'Rome'],
+        })
+        self.project = self.create_project()
+
+    def create_project(self, legacy=False):
+        metadata = column_types.build_metadata(self.df)
+        project = DataProject.objects.create(owner=self.user, title='Sales', metadata_json=metadata,
+                                             data_file=f"user_1/sales{'_legacy' if legacy else ''}.pkl")
+        path = transformations.data_path(project)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if legacy:
+            self.df.to_pickle(path)  # a single pickle, stored before the column store
+        else:
+            column_store.write_version(path, self.df, 0, metadata=metadata)
+        self.addCleanup(transformations.forget, project.id)
+        return project
+
+    def assertFrame(self, expected, project=None):
+        project = project or self.project
+        pd.testing.assert_frame_equal(transformations.load_frame(project), expected, check_like=False)
+
+    def stored_versions(self, project=None):
+        return column_store.stored_versions(transformations.data_path(project or self.project))
+
+
+IMPUTE_PRICE = {'operation': 'impute', 'column_name': 'price', 'method': 'mean'}
+REMOVE_CITY = {'operation': 'remove_column', 'column_name': 'city'}
+RECODE_CITY = {'operation': 'recode', 'column_name': 'city', 'recode_map': {'Berlin': 'BER'}}
+
+
+class TransformationLogTests(ProjectDataTestCase):
+    def test_apply_logs_steps_and_materializes_when_read(self):
+        transformations.apply(self.project, [IMPUTE_PRICE, REMOVE_CITY], self.user)
+        self.assertEqual(self.project.data_version, 2)
+        self.assertEqual(list(self.project.transformations.values_list('sequence', 'parent')), [(1, 0), (2, 1)])
+        self.assertEqual(self.stored_versions(), [0])  # nothing written until the data is read
+
+        expected = cleaning.apply_steps(self.df.copy(), [IMPUTE_PRICE, REMOVE_CITY])
+        self.assertFrame(expected)  # served from the cached head frame
+        transformations.forget(self.project.id)
+        self.assertFrame(expected)  # built from the log, then stored
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.materialized_version, 2)
+        self.assertIn(2, self.stored_versions())
+        self.assertEqual([entry['name'] for entry in self.project.metadata_json['metadata']], ['price', 'quantity'])
+
+    def test_head_is_rebuilt_from_the_log(self):
+        transformations.apply(self.project, [IMPUTE_PRICE], self.user)
+        transformations.apply(self.project, [RECODE_CITY], self.user)
+        transformations.forget(self.project.id)  # a fresh worker: no cached frame, nothing materialized
+        project = DataProject.objects.get(id=self.project.id)
+        self.assertFrame(cleaning.apply_steps(self.df.copy(), [IMPUTE_PRICE, RECODE_CITY]), project)
+
+    def test_replay_on_reingested_data(self):
+        transformations.apply(self.project, [IMPUTE_PRICE, RECODE_CITY], self.user)
+        replayed = transformations.replay(self.df.copy(), self.project)
+        pd.testing.assert_frame_equal(replayed, transformations.load_frame(self.project))
+
+    def test_failed_step_logs_nothing(self):
+        with self.assertRaises(cleaning.CleaningError):
+            transformations.apply(self.project, [IMPUTE_PRICE, {'operation': 'remove_column', 'column_name': 'missing'}], self.user)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.data_version, 0)
+        self.assertFalse(self.project.transformations.exists())
+
+    def test_readers_cannot_change_the_cached_frame(self):
+        transformations.apply(self.project, [IMPUTE_PRICE], self.user)
+        df = transformations.load_frame(self.project)
+        df['price'] = 0.0
+        df['extra'] = 1
+        self.assertFrame(cleaning.apply_steps(self.df.copy(), [IMPUTE_PRICE]))
+
+
+class ColumnStoreTests(ProjectDataTestCase):
+    def test_versions_share_unchanged_column_files(self):
+        transformations.apply(self.project, [RECODE_CITY], self.user)
+        transformations.forget(self.project.id)
+        transformations.load_frame(self.project)
+        path = transformations.data_path(self.project)
+        base, changed = column_store.load_manifest(path, 0), column_store.load_manifest(path, 1)
+        files = dict(zip(changed['labels'], changed['files']))
+        self.assertEqual(files['price'], dict(zip(base['labels'], base['files']))['price'])
+        self.assertNotEqual(files['city'], dict(zip(base['labels'], base['files']))['city'])
+        self.assertEqual(changed['index'], base['index'])
+
+    def test_removing_a_column_writes_only_a_manifest(self):
+        path = transformations.data_path(self.project)
+        written = column_store.write_version(path, self.df.drop(columns='city'), 1, base_version=0, changed=set())
+        self.assertEqual(written, os.path.getsize(column_store.manifest_path(path, 1)))
+        pd.testing.assert_frame_equal(column_store.read_version(path, 1), self.df.drop(columns='city'))
+
+    def test_legacy_pickle_is_read_and_converted(self):
+        project = self.create_project(legacy=True)
+        path = transformations.data_path(project)
+        self.assertFrame(self.df, project)
+        transformations.apply(project, [IMPUTE_PRICE], self.user)
+        transformations.forget(project.id)
+        self.assertFrame(cleaning.apply_steps(self.df.copy(), [IMPUTE_PRICE]), project)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(column_store.stored_versions(path), [1])
+
+
+class ConcurrencyTests(ProjectDataTestCase):
+    def test_stale_expected_version_conflicts(self):
+        transformations.apply(self.project, [IMPUTE_PRICE], self.user, expected_version=0)
+        with self.assertRaises(transformations.VersionConflict) as raised:
+            transformations.apply(self.project, [RECODE_CITY], self.user, expected_version=0)
+        self.assertEqual(raised.exception.status_code, 409)
+        self.assertEqual((raised.exception.expected_version, raised.exception.current_version), (0, 1))
+        self.assertEqual(self.project.transformations.count(), 1)
+
+    def test_change_without_expected_version_builds_on_the_latest(self):
+        stale = DataProject.objects.get(id=self.project.id)
+        transformations.apply(self.project, [IMPUTE_PRICE], self.user)
+        transformations.apply(stale, [RECODE_CITY], self.user)  # another worker, loaded before the first change
+        self.assertEqual(stale.data_version, 2)
+        self.assertEqual(stale.transformations.get(sequence=2).parent, 1)
+        self.assertFrame(cleaning.apply_steps(self.df.copy(), [IMPUTE_PRICE, RECODE_CITY]), stale)
+
+    def test_compare_and_swap_rejects_a_moved_version(self):
+        stale = DataProject.objects.get(id=self.project.id)
+        transformations._commit(self.project, [IMPUTE_PRICE], self.project.metadata_json, self.user)
+        self.assertFalse(transformations._commit(stale, [RECODE_CITY], stale.metadata_json, self.user))
+        self.assertEqual(self.project.transformations.count(), 1)
+
+    def test_readers_do_not_wait_for_a_change_in_progress(self):
+        transformations.apply(self.project, [IMPUTE_PRICE], self.user)
+        transformations.forget(self.project.id)
+        held, release = threading.Event(), threading.Event()
+
+        def writer():
+            with transformations._project_lock(self.project.id):
+                held.set()
+                release.wait(10)
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            held.wait(10)
+            self.assertFrame(cleaning.apply_steps(self.df.copy(), [IMPUTE_PRICE]))
+            self.assertEqual(self.stored_versions(), [0])  # served from memory, not materialized under the writer
+        finally:
+            release.set()
+            thread.join()
+
+    def test_view_answers_409_for_a_stale_version(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        transformations.apply(self.project, [IMPUTE_PRICE], self.user)
+        response = client.post('/api/projects/remove-column/', {'project_id': self.project.id, 'column_name': 'city',
+                                                                 'expected_version': 0}, format='json')
+        self.assertEqual(response.status_code, 409)
+        response = client.post('/api/projects/remove-column/', {'project_id': self.project.id, 'column_name': 'city',
+                                                                 'expected_version': 1}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data_version'], 2)
+
+
+class UndoRedoTests(ProjectDataTestCase):
+    def expected(self, *steps):
+        return cleaning.apply_steps(self.df.copy(), list(steps))
+
+    def test_undo_redo_and_branching(self):
+        transformations.apply(self.project, [IMPUTE_PRICE], self.user)
+        transformations.apply(self.project, [RECODE_CITY], self.user)
+        transformations.undo(self.project, self.user)
+        self.assertFrame(self.expected(IMPUTE_PRICE))
+        transformations.undo(self.project, self.user)
+        self.assertEqual(self.project.data_version, 0)
+        self.assertFrame(self.df)
+        with self.assertRaises(cleaning.CleaningError) as raised:
+            transformations.undo(self.project, self.user)
+        self.assertEqual(raised.exception.status_code, 409)
+
+        transformations.redo(self.project, self.user)
+        self.assertFrame(self.expected(IMPUTE_PRICE))
+        # A new step after an undo starts a branch; redo then follows the newest one
+        transformations.apply(self.project, [REMOVE_CITY], self.user)
+        self.assertEqual(self.project.transformations.get(sequence=self.project.data_version).parent, 1)
+        with self.assertRaises(cleaning.CleaningError):
+            transformations.redo(self.project, self.user)
+        transformations.undo(self.project, self.user)
+        transformations.redo(self.project, self.user)
+        self.assertEqual(self.project.data_version, 3)
+
+        transformations.forget(self.project.id)
+        project = DataProject.objects.get(id=self.project.id)
+        self.assertFrame(self.expected(IMPUTE_PRICE, REMOVE_CITY), project)
+        self.assertEqual([entry['name'] for entry in project.metadata_json['metadata']], ['price', 'quantity'])
+
+    def test_undo_checks_the_expected_version(self):
+        transformations.apply(self.project, [IMPUTE_PRICE], self.user)
+        with self.assertRaises(transformations.VersionConflict):
+            transformations.undo(self.project, self.user, expected_version=0)
+        self.assertEqual(self.project.data_version, 1)
+
+    @override_settings(COLUMN_STORE_RETAINED_VERSIONS=2)
+    def test_prune_keeps_the_newest_versions(self):
+        for value in range(1, 5):
+            transformations.apply(self.project, [{'operation': 'recode', 'column_name': 'city', 'recode_map': {'Rome': f'R{value}'}}], self.user)
+            transformations.forget(self.project.id)
+            transformations.load_frame(self.project)
+        self.assertEqual(self.stored_versions(), [3, 4])
+        path = transformations.data_path(self.project)
+        kept = set()
+        for version in (3, 4):
+            manifest = column_store.load_manifest(path, version)
+            kept |= set(manifest['files']) | {manifest['index']}
+        data_files = {name for name in os.listdir(column_store.store_dir(path)) if name.startswith('v')}
+        self.assertEqual(data_files, kept)  # files of dropped versions are deleted unless still shared
+
+        transformations.undo(self.project, self.user)  # retained: a pointer change
+        self.assertEqual(self.project.data_version, 3)
+        with self.assertRaises(transformations.VersionUnavailable):
+            transformations.undo(self.project, self.user)  # version 2 and its ancestors are gone
+        self.assertEqual(self.project.data_version, 3)
+
+    @override_settings(COLUMN_STORE_RETENTION_BYTES=1)
+    def test_prune_respects_the_byte_budget(self):
+        transformations.apply(self.project, [RECODE_CITY], self.user)
+        transformations.forget(self.project.id)
+        transformations.load_frame(self.project)
+        self.assertEqual(self.stored_versions(), [1])  # the current version is always kept
+        history = transformations.history(self.project)
+        self.assertFalse(history['can_undo'])
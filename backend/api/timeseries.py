@@ -0,0 +1,99 @@
+# api/timeseries.py
+
+"""
+Time-series resampling for charts with a temporal x-axis.
+
+Plotting raw timestamps at second-level granularity sends millions of points
+to the browser. resample() aggregates y into calendar buckets instead, with
+one vectorized groupby over (bucket, color group). The bucket is either
+requested explicitly or picked from the time span and a point budget.
+
+hypertune_params options:
+  - 'time_bucket': 'auto' | 'raw' | 'minute' | 'hour' | 'day' | 'week' | 'month' | 'quarter' | 'year' (default 'auto')
+  - 'time_aggregation': 'mean' | 'sum' | 'min' | 'max' | 'median' | 'count' | 'first' | 'last' (default 'mean')
+  - 'max_points': point budget per series for 'auto' (default TIME_SERIES_MAX_POINTS)
+"""
+
+import pandas as pd
+from django.conf import settings
+
+# Smallest to largest; offsets are used instead of alias strings so week and
+# month buckets start on calendar boundaries (Monday, 1st of the month).
+BUCKETS = {
+    'minute': (pd.offsets.Minute(), 60),
+    'hour': (pd.offsets.Hour(), 60 * 60),
+    'day': (pd.offsets.Day(), 24 * 60 * 60),
+    'week': (pd.offsets.Week(weekday=0), 7 * 24 * 60 * 60),
+    'month': (pd.offsets.MonthBegin(), 30.436875 * 24 * 60 * 60),
+    'quarter': (pd.offsets.QuarterBegin(startingMonth=1), 91.310625 * 24 * 60 * 60),
+    'year': (pd.offsets.YearBegin(), 365.2425 * 24 * 60 * 60),
+}
+AGGREGATIONS = ('mean', 'sum', 'min', 'max', 'median', 'count', 'first', 'last')
+
+
+def get_resample_options(hypertune_params):
+    """Validates and returns (bucket, aggregation, max_points) from hypertune_params."""
+    hypertune_params = hypertune_params or {}
+    bucket = str(hypertune_params.get('time_bucket') or 'auto').lower()
+    if bucket not in ('auto', 'raw') and bucket not in BUCKETS:
+        raise ValueError(f"Invalid time_bucket '{bucket}'. Must be one of: auto, raw, {', '.join(BUCKETS)}.")
+    aggregation = str(hypertune_params.get('time_aggregation') or 'mean').lower()
+    if aggregation not in AGGREGATIONS:
+        raise ValueError(f"Invalid time_aggregation '{aggregation}'. Must be one of: {', '.join(AGGREGATIONS)}.")
+    try:
+        max_points = int(hypertune_params.get('max_points') or getattr(settings, 'TIME_SERIES_MAX_POINTS', 2000))
+    except (TypeError, ValueError):
+        raise ValueError("max_points must be an integer.")
+    if max_points < 10:
+        raise ValueError("max_points must be at least 10.")
+    return bucket, aggregation, max_points
+
+
+def choose_bucket(start, end, max_points):
+    """Finest calendar bucket that covers [start, end] in at most max_points buckets."""
+    span = (pd.Timestamp(end) - pd.Timestamp(start)).total_seconds()
+    for name, (_, seconds) in BUCKETS.items():
+        if span / seconds <= max_points:
+            return name
+    return 'year'
+
+
+def resample(df, time_col, y_col, hypertune_params, color_col=None):
+    """
+    Aggregates y_col per time bucket (and per color_col group) and returns
+    (plot_df, info). plot_df keeps the time_col/y_col/color_col names so it can
+    be passed straight to plotly express. With 'auto', series that already fit
+    the point budget are returned unchanged (bucket 'raw').
+    """
+    bucket, aggregation, max_points = get_resample_options(hypertune_params)
+    columns = [time_col, y_col] + ([color_col] if color_col else [])
+    data = df[columns].dropna(subset=[time_col])
+    info = {'bucket': bucket, 'aggregation': None, 'auto': bucket == 'auto', 'source_rows': len(data), 'points': len(data)}
+
+    if bucket == 'auto':
+        largest_series = data[color_col].value_counts().max() if color_col and not data.empty else len(data)
+        if data.empty or largest_series <= max_points:
+            bucket = 'raw'
+        else:
+            bucket = choose_bucket(data[time_col].min(), data[time_col].max(), max_points)
+    info['bucket'] = bucket
+    if bucket == 'raw':
+        return data, info
+
+    offset, _ = BUCKETS[bucket]
+    keys = [pd.Grouper(key=time_col, freq=offset)] + ([color_col] if color_col else [])
+    grouped = data.groupby(keys, observed=True, sort=True)[y_col]
+    plot_df = grouped.agg(aggregation).to_frame(y_col)
+    # Buckets without observations become gaps instead of zeros/NaN points.
+    plot_df = plot_df[grouped.count() > 0].reset_index()
+    info.update(aggregation=aggregation, points=len(plot_df))
+    return plot_df, info
+
+
+def describe(info):
+    """Sentence for analysis_text describing the resampling (None when plotting raw points)."""
+    if info['bucket'] == 'raw':
+        return None
+    how = "automatically chosen" if info['auto'] else "requested"
+    return (f"- Plotted as the {info['aggregation']} per {info['bucket']} ({how} bucket): "
+            f"{info['points']:,} points from {info['source_rows']:,} rows.")
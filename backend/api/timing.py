@@ -0,0 +1,122 @@
+# api/timing.py
+
+"""
+Per-request stage timing.
+
+ServerTimingMiddleware starts a RequestTimer for every request and makes it
+the current timer (a context variable), so any code on the request path can
+record a stage without being handed the request:
+
+    with timing.span('load') as stage:
+        df = pd.read_pickle(path)
+        stage.bytes = os.path.getsize(path)
+
+When the response is done, the middleware adds a Server-Timing header
+(`load;dur=41.2;desc="bytes=1048576", filter;dur=3.0, ...`) and logs one
+record on the 'api.timing' logger. Outside a request (management commands,
+background jobs) span() is a no-op. The cost per span is two perf_counter()
+calls and a list append.
+"""
+
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger('api.timing')
+
+_current_timer = contextvars.ContextVar('api_request_timer', default=None)
+
+
+class Stage:
+    __slots__ = ('name', 'duration', 'bytes')
+
+    def __init__(self, name):
+        self.name = name
+        self.duration = 0.0
+        self.bytes = None
+
+
+class RequestTimer:
+    """Collects the stages of one request; stages with the same name are summed."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = []
+
+    def add(self, stage):
+        self.stages.append(stage)
+
+    def summary(self):
+        """[(name, total_ms, total_bytes or None)] in first-seen order."""
+        totals = {}
+        for stage in self.stages:
+            duration, size = totals.get(stage.name, (0.0, None))
+            if stage.bytes is not None:
+                size = (size or 0) + stage.bytes
+            totals[stage.name] = (duration + stage.duration, size)
+        return [(name, duration * 1000, size) for name, (duration, size) in totals.items()]
+
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def header_value(self):
+        parts = []
+        for name, ms, size in self.summary():
+            part = f"{name};dur={ms:.1f}"
+            if size is not None:
+                part += f';desc="bytes={size}"'
+            parts.append(part)
+        parts.append(f"total;dur={self.total_ms():.1f}")
+        return ", ".join(parts)
+
+
+def current_timer():
+    return _current_timer.get()
+
+
+@contextmanager
+def span(name):
+    """Times the enclosed block as stage `name` of the current request (no-op without one)."""
+    timer = _current_timer.get()
+    stage = Stage(name)
+    if timer is None:
+        yield stage
+        return
+    start = time.perf_counter()
+    try:
+        yield stage
+    finally:
+        stage.duration = time.perf_counter() - start
+        timer.add(stage)
+
+
+class ServerTimingMiddleware:
+    """Adds a Server-Timing header and a structured timing log record to every API response."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'SERVER_TIMING_ENABLED', True):
+            return self.get_response(request)
+
+        timer = RequestTimer()
+        token = _current_timer.set(timer)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_timer.reset(token)
+
+        response['Server-Timing'] = timer.header_value()
+        logger.info(
+            "%s %s %s %.1fms", request.method, request.path, response.status_code, timer.total_ms(),
+            extra={
+                'method': request.method, 'path': request.path, 'status': response.status_code,
+                'duration_ms': round(timer.total_ms(), 1),
+                'stages': [{'name': name, 'duration_ms': round(ms, 1), 'bytes': size} for name, ms, size in timer.summary()],
+            },
+        )
+        return response
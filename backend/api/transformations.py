@@ -0,0 +1,490 @@
+# api/transformations.py
+
+"""
+Transformation log with lazy materialization, undo and redo.
+
+Cleaning views do not rewrite the project's data. apply() runs the steps
+(api/cleaning.py) on the current frame, appends them to the project's
+TransformationStep log, moves DataProject.data_version to the new version
+and refreshes the column metadata; the resulting frame stays in an
+in-process cache. The data is only stored ("materialized") when something
+reads it: every data reader goes through load_frame(), which calls
+ensure_materialized() first. With TRANSFORMATION_MATERIALIZE = 'background'
+a job materializes right after each change instead. A run of cleaning steps
+that is not read in between therefore pays one write instead of one per
+step, and that write goes to the column store (api/column_store.py), which
+only writes the columns the logged steps changed.
+
+Versions are log sequences (0 is the data as ingested) and each step records
+the version it was applied to, so the log is a tree: undo() moves the current
+version to its parent and redo() to its newest child, without touching the
+log. Any version is built from its nearest stored ancestor plus the steps in
+between; the column store keeps a byte-bounded set of recent versions, so
+undoing to one of them is a pointer change. The log, not the cache, is the
+source of truth across workers.
+
+Concurrency: data_version is moved with a compare-and-swap UPDATE in the
+same transaction that appends the steps, so of two concurrent changes to the
+same version one commits and the other is recomputed on top of it, or
+rejected with VersionConflict (409) when the client sent the expected_version
+it was looking at. Model-based imputation is computed by a background job
+(apply_in_background) outside the lock and committed the same way. Readers
+never wait for a writer: while a change holds the project lock, load_frame()
+serves the current version built in memory instead of materializing it.
+
+replay() applies the steps leading to a version to any frame, e.g. to
+re-ingested source data, and GET /api/projects/<id>/transformations/ returns
+the log as the project's lineage.
+"""
+
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import cleaning
+from . import column_store
+from . import column_types
+from . import helpers
+from . import jobs
+from . import metrics
+from . import sampling
+from . import timing
+from .models import DataProject, TransformationStep
+
+logger = logging.getLogger(__name__)
+
+# Attempts to commit a change without expected_version before giving up with a conflict
+COMMIT_ATTEMPTS = 3
+
+
+class VersionConflict(cleaning.CleaningError):
+    """The project's data changed since the version the change was based on."""
+
+    def __init__(self, expected_version, current_version):
+        super().__init__(
+            f"The project's data has changed (expected version {expected_version}, current version {current_version}). "
+            "Reload the project and try again.", status_code=409)
+        self.expected_version = expected_version
+        self.current_version = current_version
+
+
+class VersionUnavailable(cleaning.CleaningError):
+    """A version can no longer be built: no stored ancestor of it is retained."""
+
+    def __init__(self, version):
+        super().__init__(f"Version {version} is no longer retained.", status_code=409)
+        self.version = version
+
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _project_lock(project_id):
+    """Serializes changes and materialization of one project within this process."""
+    with _locks_guard:
+        return _locks.setdefault(project_id, threading.RLock())
+
+
+def _frame_bytes(df):
+    # Shallow: object columns count their pointers only, which is enough for a cache budget
+    return int(df.memory_usage(index=True, deep=False).sum())
+
+
+class _FrameCache:
+    """Head frame per project, keyed by version, evicted least recently used beyond a byte budget."""
+
+    def __init__(self):
+        self._frames = {}  # project_id -> (version, df, nbytes), in use order
+        self._lock = threading.Lock()
+
+    def _budget(self):
+        return getattr(settings, 'TRANSFORMATION_CACHE_BYTES', 512 * 1024 * 1024)
+
+    def get(self, project_id, version):
+        with self._lock:
+            entry = self._frames.pop(project_id, None)
+            if entry is None or entry[0] != version:
+                return None
+            self._frames[project_id] = entry
+            return entry[1]
+
+    def put(self, project_id, version, df):
+        nbytes = _frame_bytes(df)
+        with self._lock:
+            self._frames.pop(project_id, None)
+            if nbytes > self._budget():
+                return
+            self._frames[project_id] = (version, df, nbytes)
+            total = sum(entry[2] for entry in self._frames.values())
+            for key in list(self._frames):
+                if total <= self._budget():
+                    break
+                total -= self._frames.pop(key)[2]
+
+    def discard(self, project_id):
+        with self._lock:
+            self._frames.pop(project_id, None)
+
+
+_frames = _FrameCache()
+
+
+def data_path(project):
+    return os.path.join(settings.MEDIA_ROOT, project.data_file.name)
+
+
+# --- Stored versions ---
+
+def _is_legacy(project, version):
+    # Projects stored as a single pickle before the column store hold only materialized_version
+    return version == project.materialized_version and os.path.exists(data_path(project))
+
+
+def _is_stored(project, version):
+    return column_store.has_version(data_path(project), version) or _is_legacy(project, version)
+
+
+def _read_stored(project, version):
+    path = data_path(project)
+    if column_store.has_version(path, version):
+        return column_store.read_version(path, version)
+    return helpers.read_project_df(path)
+
+
+def _version_marker(project, version):
+    """The file whose mtime dates a stored version (its manifest, or the legacy pickle)."""
+    path = data_path(project)
+    if column_store.has_version(path, version):
+        return column_store.manifest_path(path, version)
+    return path
+
+
+# --- The log ---
+
+def _log(project):
+    return {entry.sequence: entry for entry in project.transformations.only('sequence', 'parent', 'step')}
+
+
+def _steps_between(log, ancestor, version):
+    """Steps leading from ancestor to version, oldest first."""
+    steps = []
+    while version != ancestor:
+        if version not in log:
+            raise VersionUnavailable(version)
+        steps.append(log[version].step)
+        version = log[version].parent
+    return steps[::-1]
+
+
+def _stored_ancestor(project, log, version):
+    """(nearest stored version on the path to `version`, steps from it to `version`)."""
+    steps = []
+    while not _is_stored(project, version):
+        if version not in log:
+            raise VersionUnavailable(version)
+        steps.append(log[version].step)
+        version = log[version].parent
+    return version, steps[::-1]
+
+
+def replay(df, project, after=0, upto=None):
+    """Applies the logged steps leading from version `after` to `upto` (default: the current version) to df."""
+    upto = project.data_version if upto is None else upto
+    steps = _steps_between(_log(project), after, upto)
+    if not steps:
+        return df
+    with timing.span('replay'):
+        return cleaning.apply_steps(df, steps)
+
+
+def _build(project, version, log=None):
+    """The frame at `version`: its nearest stored ancestor plus the steps in between."""
+    ancestor, steps = _stored_ancestor(project, log if log is not None else _log(project), version)
+    df = _read_stored(project, ancestor)
+    if steps:
+        with timing.span('replay'):
+            df = cleaning.apply_steps(df, steps)
+    return df
+
+
+def _head_frame(project):
+    """The frame at project.data_version, from the cache or built from the store and the log."""
+    df = _frames.get(project.id, project.data_version)
+    metrics.record_cache('transformation_frame', df is not None)
+    if df is None:
+        df = _build(project, project.data_version)
+        _frames.put(project.id, project.data_version, df)
+    return df
+
+
+def _check_expected(project, expected_version):
+    if expected_version is None:
+        return None
+    try:
+        expected_version = int(expected_version)
+    except (TypeError, ValueError):
+        raise cleaning.CleaningError("expected_version must be an integer.")
+    if project.data_version != expected_version:
+        raise VersionConflict(expected_version, project.data_version)
+    return expected_version
+
+
+# --- Changes ---
+
+def _commit(project, steps, metadata, user):
+    """Appends steps after project.data_version unless another change committed first; returns success."""
+    base = project.data_version
+    with transaction.atomic():
+        first = (project.transformations.aggregate(last=Max('sequence'))['last'] or 0) + 1
+        head = first + len(steps) - 1
+        updated = DataProject.objects.filter(id=project.id, data_version=base).update(
+            data_version=head, metadata_json=metadata, updated_at=timezone.now())
+        if not updated:
+            return False
+        TransformationStep.objects.bulk_create([
+            TransformationStep(project=project, sequence=sequence, parent=sequence - 1 if sequence > first else base, step=step,
+                               metadata_json=metadata if sequence == head else None, created_by=user)
+            for sequence, step in enumerate(steps, start=first)
+        ])
+    project.data_version = head
+    project.metadata_json = metadata
+    return True
+
+
+def _after_change(project, user):
+    if getattr(settings, 'TRANSFORMATION_MATERIALIZE', 'lazy') == 'background':
+        project_pk = project.id
+        jobs.submit(user, 'materialize', lambda handle: _materialize_job(project_pk), meta={'project_id': project_pk})
+
+
+def apply(project, steps, user=None, expected_version=None):
+    """
+    Validates and applies cleaning steps to the current version, appends them
+    to the log and refreshes the project's metadata. Nothing is logged if any
+    step fails. With expected_version, raises VersionConflict unless that is
+    still the current version. Returns the new head frame (shared with the
+    cache: do not mutate).
+    """
+    cleaning.validate_steps(steps)
+    with _project_lock(project.id):
+        for _attempt in range(COMMIT_ATTEMPTS):
+            project.refresh_from_db(fields=['data_version', 'materialized_version'])
+            based_on = project.data_version
+            _check_expected(project, expected_version)
+            # Shallow copy: the steps replace columns of their own frame, so readers can keep using the cached head
+            df = _head_frame(project).copy(deep=False)
+            with timing.span('clean'):
+                df = cleaning.apply_steps(df, steps)
+            with timing.span('metadata'):
+                metadata = column_types.build_metadata(df)
+            if _commit(project, steps, metadata, user):
+                break
+            # Another worker committed first: recompute on top of its version
+            logger.info("Version conflict on project %s at version %s, retrying", project.id, based_on)
+        else:
+            project.refresh_from_db(fields=['data_version'])
+            raise VersionConflict(based_on, project.data_version)
+        _frames.put(project.id, project.data_version, df)
+    _after_change(project, user)
+    return df
+
+
+def apply_in_background(project, steps, user=None, expected_version=None):
+    """
+    apply() for steps too slow for a request (cleaning.BACKGROUND_OPERATIONS):
+    a job computes them on the current version without holding the project
+    lock, reporting progress and honouring cancellation, and commits only if
+    that version is still current (else the job fails with a conflict). The
+    new version is materialized by the job. Returns the job state.
+    """
+    cleaning.validate_steps(steps, background=True)
+    project.refresh_from_db(fields=['data_version'])
+    _check_expected(project, expected_version)
+    project_pk, based_on = project.id, project.data_version
+
+    def run(handle):
+        job_project = DataProject.objects.get(id=project_pk)
+        if job_project.data_version != based_on:
+            raise VersionConflict(based_on, job_project.data_version)
+        df = load_frame(job_project)
+        with timing.span('clean'):
+            df = cleaning.apply_steps(df, steps, handle=handle)
+        handle.check_cancelled()
+        handle.set_progress(1.0, "Saving")
+        with timing.span('metadata'):
+            metadata = column_types.build_metadata(df)
+        with _project_lock(project_pk):
+            job_project.data_version = based_on
+            if not _commit(job_project, steps, metadata, user):
+                job_project.refresh_from_db(fields=['data_version'])
+                raise VersionConflict(based_on, job_project.data_version)
+            _frames.put(project_pk, job_project.data_version, df)
+        ensure_materialized(job_project)
+        return {'project_id': project_pk, 'data_version': job_project.data_version}
+
+    return jobs.submit(user, steps[0]['operation'], run, meta={'project_id': project_pk, 'based_on': based_on})
+
+
+def _version_metadata(project, log, version):
+    """Column metadata of a version: from its log entry or manifest, else computed from its data."""
+    if version in log:
+        metadata = TransformationStep.objects.filter(project=project, sequence=version).values_list('metadata_json', flat=True).first()
+    elif column_store.has_version(data_path(project), version):
+        metadata = column_store.load_manifest(data_path(project), version).get('metadata')
+    else:
+        metadata = None
+    if metadata is None:
+        with timing.span('metadata'):
+            metadata = column_types.build_metadata(_build(project, version, log))
+    return metadata
+
+
+def _undo_target(log, version):
+    return log[version].parent if version in log else None
+
+
+def _redo_target(log, version):
+    # The newest step applied to this version: redo follows the branch that was undone last
+    children = [sequence for sequence, entry in log.items() if entry.parent == version]
+    return max(children, default=None)
+
+
+def _move(project, target_of, nothing_message, user, expected_version):
+    with _project_lock(project.id):
+        project.refresh_from_db(fields=['data_version', 'materialized_version'])
+        _check_expected(project, expected_version)
+        log = _log(project)
+        base = project.data_version
+        target = target_of(log, base)
+        if target is None:
+            raise cleaning.CleaningError(nothing_message, status_code=409)
+        _stored_ancestor(project, log, target)  # raises VersionUnavailable before anything changes
+        metadata = _version_metadata(project, log, target)
+        updated = DataProject.objects.filter(id=project.id, data_version=base).update(
+            data_version=target, metadata_json=metadata, updated_at=timezone.now())
+        if not updated:
+            project.refresh_from_db(fields=['data_version'])
+            raise VersionConflict(base, project.data_version)
+        project.data_version = target
+        project.metadata_json = metadata
+        logger.info("Moved project %s from version %s to %s", project.id, base, target, extra={'project': project.id, 'version': target})
+    _after_change(project, user)
+
+
+def undo(project, user=None, expected_version=None):
+    """Makes the version before the last step current again."""
+    _move(project, _undo_target, "Nothing to undo.", user, expected_version)
+
+
+def redo(project, user=None, expected_version=None):
+    """Re-applies the most recently undone step."""
+    _move(project, _redo_target, "Nothing to redo.", user, expected_version)
+
+
+def history(project):
+    """The log with the steps leading to the current version marked active, and whether undo/redo are possible."""
+    log = _log(project)
+    active, version = set(), project.data_version
+    while version in log:
+        active.add(version)
+        version = log[version].parent
+
+    def available(target):
+        if target is None:
+            return False
+        try:
+            _stored_ancestor(project, log, target)
+        except VersionUnavailable:
+            return False
+        return True
+
+    entries = project.transformations.select_related('created_by')
+    return {
+        'entries': entries, 'active': active,
+        'can_undo': available(_undo_target(log, project.data_version)),
+        'can_redo': available(_redo_target(log, project.data_version)),
+    }
+
+
+# --- Materialization and reads ---
+
+def ensure_materialized(project):
+    """Stores the current version (and its stored sample) unless it is stored already."""
+    if _is_stored(project, project.data_version):
+        return
+    with _project_lock(project.id):
+        project.refresh_from_db(fields=['data_version', 'materialized_version'])
+        version = project.data_version
+        if _is_stored(project, version):
+            return
+        path = data_path(project)
+        ancestor, steps = _stored_ancestor(project, _log(project), version)
+        df = _head_frame(project)
+        if column_store.has_version(path, ancestor):
+            column_store.write_version(path, df, version, base_version=ancestor, changed=cleaning.written_columns(steps),
+                                       metadata=project.metadata_json)
+        else:
+            column_store.write_version(path, df, version, metadata=project.metadata_json)
+        with timing.span('sample'):
+            sampling.write_stored_sample(df, column_store.manifest_path(path, version))
+        DataProject.objects.filter(id=project.id).update(materialized_version=version)
+        project.materialized_version = version
+        column_store.prune(path, version)
+        if os.path.exists(path):
+            # Converted from a single pickle: the column store now holds the data
+            os.remove(path)
+            sampling.remove_stored_sample(path)
+        logger.info("Materialized project %s at version %s", project.id, version, extra={'project': project.id, 'version': version})
+
+
+def _materialize_job(project_pk):
+    project = DataProject.objects.get(id=project_pk)
+    ensure_materialized(project)
+    return {'project_id': project_pk, 'materialized_version': project.materialized_version}
+
+
+def load_frame(project, resolution='full'):
+    """
+    Loads the project's current data at the requested resolution
+    (sampling.RESOLUTIONS), materializing it first. Full-resolution reads are
+    served from a shallow copy of the cached head frame when there is one:
+    callers may add, drop or replace columns but must not write into the
+    values (no inplace=, .loc/.iloc assignments). Never waits for a change
+    in progress on the same project.
+    """
+    version = project.data_version
+    if resolution == 'full':
+        with timing.span('load'):
+            df = _frames.get(project.id, version)
+            if df is not None:
+                metrics.record_cache('transformation_frame', True)
+                return df.copy(deep=False)  # as apply(): columns are replaced, never written into
+
+    if not _is_stored(project, version):
+        lock = _project_lock(project.id)
+        if not lock.acquire(blocking=False):
+            # A change is in progress: serve the current version without storing it
+            df = _build(project, version)
+            return df if resolution == 'full' else sampling.stored_sample(df)
+        try:
+            ensure_materialized(project)
+        finally:
+            lock.release()
+        version = project.data_version
+
+    if resolution == 'full':
+        return _read_stored(project, version)
+    return sampling.load_sample(_version_marker(project, version), lambda: _read_stored(project, version))
+
+
+def forget(project_id):
+    """Drops a deleted project's cached frame and lock."""
+    _frames.discard(project_id)
+    with _locks_guard:
+        _locks.pop(project_id, None)
@@ -1,5 +1,5 @@
 import os
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework_simplejwt.views import TokenRefreshView
 
 # --- UPDATED IMPORTS (Pointing to views folder) ---
@@ -12,8 +12,10 @@ from .views.auth_views import (
 from .views.data_cleaning_views import (
     CreateProjectView, DataProjectListView, DeleteProjectView,
     DataProjectDetailView, RawDataView, FetchUniqueValuesView,
-    ImputeMissingValuesView, RemoveColumnView, DetectOutliersView,
-    TreatOutliersView, RecodeColumnView
+    ImputeMissingValuesView, ModelImputeView, RemoveColumnView,
+    DeriveColumnView, DetectOutliersView, TreatOutliersView,
+    RecodeColumnView, CleaningPipelineView,
+    TransformationLogView, UndoCleaningView, RedoCleaningView
 )
 from .views.db_views import (
     DbConnectionListCreateView, DbConnectionTestView,
@@ -21,11 +23,14 @@ from .views.db_views import (
     QueryAndExportView, DbDiscoveryTestView, SimpleDbTestView,
     SchemaFetchView
 )
-from .views.visualization_views import GenerateChartView
+from .views.visualization_views import GenerateChartView, ChartImageView
 from .views.reporting_views import ( # NEW IMPORT
     ReportListCreateView, ReportRetrieveUpdateDestroyView
 )
 # -------------------------
+from .views.job_views import JobStatusView, JobCancelView
+from .views.metrics_views import MetricsView
+from .views.profiling_views import ProfileListView, ProfileDetailView
 from .views.sharing_views import (
     CreateShareLinkView, PublicReportView
 )
@@ -48,16 +53,34 @@ urlpatterns = [
     path("projects/delete/<int:pk>/", DeleteProjectView.as_view(), name="delete_project"),
     path("projects/<int:pk>/", DataProjectDetailView.as_view(), name="project_detail"),
     path("projects/impute/", ImputeMissingValuesView.as_view(), name="impute-missing-values"),
+    path("projects/model-impute/", ModelImputeView.as_view(), name="model-impute"),
     path("projects/remove-column/", RemoveColumnView.as_view(), name="remove-column"),
+    path("projects/derive-column/", DeriveColumnView.as_view(), name="derive-column"),
     path("projects/detect-outliers/", DetectOutliersView.as_view(), name="detect-outliers"),
     path("projects/treat-outliers/", TreatOutliersView.as_view(), name="treat-outliers"),
+    path("projects/cleaning-pipeline/", CleaningPipelineView.as_view(), name="cleaning-pipeline"),
+    path("projects/undo/", UndoCleaningView.as_view(), name="undo-cleaning"),
+    path("projects/redo/", RedoCleaningView.as_view(), name="redo-cleaning"),
     path('recode-column/', RecodeColumnView.as_view(), name='recode-column'),
     path('projects/<int:project_id>/unique-values/<str:column_name>/', FetchUniqueValuesView.as_view(), name='fetch-unique-values'),
     path("projects/<int:project_id>/raw-data/", RawDataView.as_view(), name="raw-data-view"),
+    path("projects/<int:project_id>/transformations/", TransformationLogView.as_view(), name="transformation-log"),
     
     # Visualization Routes (from visualization_views.py)
     path('generate-chart/', GenerateChartView.as_view(), name='generate_chart'),
+    re_path(r'^chart-images/(?P<project_id>[0-9]+)/(?P<digest>[0-9a-f]{64})\.(?P<image_format>png|webp|svg)$', ChartImageView.as_view(), name='chart-image'),
     
+    # Background Job Routes (from job_views.py)
+    path('jobs/<str:job_id>/', JobStatusView.as_view(), name='job-status'),
+    path('jobs/<str:job_id>/cancel/', JobCancelView.as_view(), name='job-cancel'),
+
+    # Metrics Routes (from metrics_views.py)
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+
+    # Request Profiling Routes (from profiling_views.py)
+    path('profiles/', ProfileListView.as_view(), name='profile-list'),
+    path('profiles/<str:profile_id>/', ProfileDetailView.as_view(), name='profile-detail'),
+
     # DB Connection Routes (from db_views.py)
     path('db/connections/', DbConnectionListCreateView.as_view(), name='db-connection-list-create'),
     path('db/connections/test/', DbConnectionTestView.as_view(), name='db-connection-test'),
@@ -1,10 +1,13 @@
 """
 Utility functions for sending OTP via SMS and Email
 """
+import logging
 import random
 from django.core.mail import send_mail
 from django.conf import settings
 
+logger = logging.getLogger(__name__)
+
 
 def generate_otp():
     """Generate a 6-digit OTP"""
@@ -26,13 +29,9 @@ def send_otp_via_sms(mobile_number, otp_code):
         # Check if Twilio is configured
         if not hasattr(settings, 'TWILIO_ACCOUNT_SID') or not settings.TWILIO_ACCOUNT_SID or settings.TWILIO_ACCOUNT_SID == 'your_twilio_account_sid':
             # Twilio not configured - use console fallback
-            print(f"\n{'='*70}")
-            print(f"📱 SMS OTP (Console Fallback)")
-            print(f"{'='*70}")
-            print(f"Mobile: {mobile_number}")
-            print(f"OTP Code: {otp_code}")
-            print(f"Message: Your verification code is {otp_code}. Valid for 5 minutes.")
-            print(f"{'='*70}\n")
+            logger.warning("SMS OTP for %s not sent (SMS service not configured)", mobile_number,
+                           extra={'channel': 'sms', 'fallback': 'not_configured'})
+            _log_otp_for_development(mobile_number, otp_code)
             return True, "OTP printed in console (SMS service not configured)"
         
         # Import Twilio only if configured
@@ -55,31 +54,32 @@ def send_otp_via_sms(mobile_number, otp_code):
             to=mobile_number
         )
         
-        print(f"✓ SMS sent successfully to {mobile_number}. SID: {message.sid}")
+        logger.info("SMS sent to %s", mobile_number, extra={'channel': 'sms', 'sid': message.sid})
         return True, "OTP sent via SMS"
         
     except ImportError:
         # Twilio not installed
-        print(f"\n{'='*70}")
-        print(f"📱 SMS OTP (Console Fallback - Twilio not installed)")
-        print(f"{'='*70}")
-        print(f"Mobile: {mobile_number}")
-        print(f"OTP Code: {otp_code}")
-        print(f"{'='*70}\n")
+        logger.warning("SMS OTP for %s not sent (Twilio not installed)", mobile_number,
+                       extra={'channel': 'sms', 'fallback': 'twilio_missing'})
+        _log_otp_for_development(mobile_number, otp_code)
         return True, "OTP printed in console (Twilio not installed)"
         
     except Exception as e:
         # Twilio error - fallback to console
-        print(f"\n{'='*70}")
-        print(f"📱 SMS OTP (Console Fallback - Twilio Error)")
-        print(f"{'='*70}")
-        print(f"Mobile: {mobile_number}")
-        print(f"OTP Code: {otp_code}")
-        print(f"Error: {str(e)}")
-        print(f"{'='*70}\n")
+        logger.warning("SMS OTP for %s not sent (Twilio error: %s)", mobile_number, e,
+                       extra={'channel': 'sms', 'fallback': 'twilio_error'})
+        _log_otp_for_development(mobile_number, otp_code)
         return True, "OTP printed in console (SMS sending failed)"
 
 
+def _log_otp_for_development(recipient, otp_code):
+    """
+    Logs an undelivered code at DEBUG only (API_OTP_LOG_LEVEL=DEBUG in
+    development), so codes never reach the persisted WARNING/ERROR records.
+    """
+    logger.debug("OTP for %s: %s", recipient, otp_code)
+
+
 def send_otp_via_email(email, otp_code, username=None):
     """
     Send OTP via Email
@@ -164,19 +164,14 @@ Visualization Software Team
             fail_silently=False,
         )
         
-        print(f"✅ Email sent successfully to {email}")
+        logger.info("OTP email sent to %s", email, extra={'channel': 'email'})
         return True, "OTP sent via email"
         
     except Exception as e:
-        print(f"❌ Email sending failed: {str(e)}")
-        # Fallback: Print OTP in console for development
-        print(f"\n{'='*70}")
-        print(f"📧 EMAIL OTP (Console Fallback)")
-        print(f"{'='*70}")
-        print(f"To: {email}")
-        print(f"OTP Code: {otp_code}")
-        print(f"Error: {str(e)}")
-        print(f"{'='*70}\n")
+        # Fallback: log the OTP for development
+        logger.warning("Email OTP for %s not sent (sending failed: %s)", email, e,
+                       extra={'channel': 'email', 'fallback': 'send_failed'})
+        _log_otp_for_development(email, otp_code)
         return False, f"Email sending failed: {str(e)}"
 
 
@@ -200,9 +195,7 @@ def send_otp_multi_channel(mobile_number=None, email=None, otp_code=None, userna
     channels = []
     messages = []
     
-    print(f"\n{'='*70}")
-    print(f"🔐 SENDING OTP: {otp_code}")
-    print(f"{'='*70}")
+    logger.debug("Sending OTP via %s", ", ".join(c for c, v in (('sms', mobile_number), ('email', email)) if v))
     
     if mobile_number:
         sms_success, sms_msg = send_otp_via_sms(mobile_number, otp_code)
@@ -226,5 +219,5 @@ def send_otp_multi_channel(mobile_number=None, email=None, otp_code=None, userna
         return True, f"OTP sent via {channel_str}", otp_code
     else:
         # Even if sending fails, return OTP for development/fallback
-        print(f"\n⚠️ All delivery methods failed. OTP Code: {otp_code}\n")
+        logger.error("All OTP delivery methods failed.")
         return False, "OTP delivery failed, check console for code", otp_code
\ No newline at end of file
@@ -1,25 +1,34 @@
 # api/views/data_cleaning_views.py
 
+import logging
 import os
 import json
 import pandas as pd
 from django.conf import settings
+from django.urls import reverse
 from rest_framework import generics, status, serializers
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser
 
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import io
-import base64
-from scipy import stats # Kept for DetectOutliersView
+from ..lazy_imports import plt # Imported on first use (DetectOutliersView)
 
-from ..serializers import DataProjectSerializer
+from ..serializers import DataProjectSerializer, TransformationStepSerializer
 from ..models import DataProject, Report # <-- Import Report model
+from .. import cleaning
+from .. import column_store
+from .. import column_types
+from .. import dry_run
+from .. import expressions
 from .. import helpers # CORRECTED: Import helpers file from parent directory
+from .. import image_cache
+from .. import outliers
+from .. import sampling
+from .. import timing
+from .. import transformations
+
+logger = logging.getLogger(__name__)
 
 # --- Project Management Views ---
 class CreateProjectView(generics.CreateAPIView):
@@ -69,24 +78,32 @@ class DeleteProjectView(generics.DestroyAPIView):
         return DataProject.objects.filter(owner=self.request.user)
 
     def perform_destroy(self, instance):
-        # Store file path before deletion
+        # Store file path and id before deletion
         file_path = os.path.join(settings.MEDIA_ROOT, instance.data_file.name)
+        project_pk = instance.id
         
         try:
-            # 1. Delete the file from filesystem first (before DB deletion)
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                print(f"Successfully deleted file: {file_path}")
+            # 1. Delete the data from filesystem first (before DB deletion): a single pickle
+            #    for projects stored before the column store, otherwise the store directory
+            pickle_exists = os.path.exists(file_path)
+            if pickle_exists or os.path.isdir(column_store.store_dir(file_path)):
+                if pickle_exists:
+                    os.remove(file_path)
+                column_store.remove(file_path)
+                logger.info("Deleted project data %s", file_path)
             else:
-                print(f"Warning: File not found at path {file_path}. Continuing with database record deletion.")
+                logger.warning("Project file %s not found. Continuing with database record deletion.", file_path)
+            sampling.remove_stored_sample(file_path)
+            image_cache.remove_project_images(project_pk)
             
             # 2. Delete the database record (Reports will cascade automatically due to CASCADE on_delete)
             instance.delete()
-            print(f"Successfully deleted project {instance.id} from database")
+            transformations.forget(project_pk)
+            logger.info("Deleted project %s from database", project_pk)
             
         except Exception as e:
             # If anything fails, raise a proper error
-            print(f"Error during project deletion: {str(e)}")
+            logger.exception("Project deletion failed")
             raise serializers.ValidationError({
                 "detail": f"Project deletion failed: {str(e)}"
             })
@@ -102,10 +119,13 @@ class RawDataView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request, project_id, *args, **kwargs):
+        try:
+            resolution = sampling.get_resolution(request.query_params.get('resolution'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         try:
             project = DataProject.objects.get(id=project_id, owner=request.user)
-            file_path = os.path.join(settings.MEDIA_ROOT, project.data_file.name)
-            df = pd.read_pickle(file_path)
+            df = transformations.load_frame(project, resolution)
             
             # --- START: SERVER-SIDE OPTIMIZATION (Sorting) ---
             sort_key = request.query_params.get('sort_key')
@@ -113,15 +133,18 @@ class RawDataView(APIView):
             
             if sort_key and sort_key in df.columns:
                 ascending = True if sort_direction == 'asc' else False
-                if pd.api.types.is_numeric_dtype(df[sort_key]):
-                    df = df.sort_values(by=sort_key, ascending=ascending)
-                else:
-                    df = df.sort_values(by=sort_key, ascending=ascending, key=lambda col: col.str.lower())
+                with timing.span('sort'):
+                    if pd.api.types.is_numeric_dtype(df[sort_key]):
+                        df = df.sort_values(by=sort_key, ascending=ascending)
+                    else:
+                        df = df.sort_values(by=sort_key, ascending=ascending, key=lambda col: col.str.lower())
             # --- END: SERVER-SIDE OPTIMIZATION ---
 
-            raw_data = json.loads(df.to_json(orient='records', date_format='iso'))
+            with timing.span('records'):
+                raw_data = json.loads(df.to_json(orient='records', date_format='iso'))
             
-            return Response({'raw_data': raw_data}, status=status.HTTP_200_OK)
+            total_rows = (project.metadata_json or {}).get('rows', len(df))
+            return Response({'raw_data': raw_data, 'resolution': resolution, 'row_count': len(df), 'total_rows': total_rows}, status=status.HTTP_200_OK)
             
         except DataProject.DoesNotExist:
             return Response({"error": "Project not found."}, status=status.HTTP_404_NOT_FOUND)
@@ -134,14 +157,13 @@ class FetchUniqueValuesView(APIView):
     def get(self, request, project_id, column_name, *args, **kwargs):
         try:
             project = DataProject.objects.get(id=project_id, owner=request.user)
-            file_path = os.path.join(settings.MEDIA_ROOT, project.data_file.name)
-            df = pd.read_pickle(file_path)
+            df = transformations.load_frame(project)
             
             if column_name not in df.columns:
                 return Response({"error": f"Column '{column_name}' not found."}, status=status.HTTP_404_NOT_FOUND)
 
-            unique_values = df[column_name].dropna().astype(str).unique().tolist()
-            unique_values.sort()
+            # Distinct values first: only they are converted to strings (the recode map keys)
+            unique_values = sorted(set(pd.Index(df[column_name].dropna().unique()).astype(str)))
 
             return Response({'unique_values': unique_values}, status=status.HTTP_200_OK)
             
@@ -162,71 +184,112 @@ class ImputeMissingValuesView(APIView):
              
         try:
             project = DataProject.objects.get(id=project_id, owner=request.user)
-            file_path = os.path.join(settings.MEDIA_ROOT, project.data_file.name)
-            df = pd.read_pickle(file_path)
-            
-            if column_name not in df.columns:
-                 return Response({"error": f"Column '{column_name}' not found."}, status=status.HTTP_404_NOT_FOUND)
-
-            # Check column type consistency for methods
-            col_type = df[column_name].dtype
-            is_numeric = pd.api.types.is_numeric_dtype(col_type)
-            
-            if method in ['mean', 'median'] and not is_numeric:
-                 return Response({"error": f"Method '{method}' is only valid for numerical columns."}, status=status.HTTP_400_BAD_REQUEST)
-
-            if method == 'mean': 
-                df[column_name].fillna(df[column_name].mean(), inplace=True)
-            elif method == 'median': 
-                df[column_name].fillna(df[column_name].median(), inplace=True)
-            elif method == 'mode': 
-                df[column_name].fillna(df[column_name].mode()[0], inplace=True)
-            elif method == 'constant': 
-                constant_value = request.data.get('constant_value')
-                # Attempt to convert constant value to the column type for consistency
-                if is_numeric:
-                    try:
-                        value_to_fill = pd.to_numeric(constant_value)
-                    except ValueError:
-                        return Response({"error": "Constant value must be numeric for this column."}, status=status.HTTP_400_BAD_REQUEST)
-                else:
-                    value_to_fill = constant_value
-                    
-                df[column_name].fillna(value_to_fill, inplace=True)
-                
-            else:
-                 return Response({"error": f"Invalid imputation method: {method}."}, status=status.HTTP_400_BAD_REQUEST)
-
-            df.to_pickle(file_path)
-            # Use imported helper for metadata update
-            helpers.update_project_metadata(project, df) 
+            steps = [{'operation': 'impute', 'column_name': column_name, 'method': method, 'constant_value': request.data.get('constant_value')}]
+            if dry_run.requested(request):
+                return Response(dry_run.preview(project, steps))
+            # Logged, not written: the data file is rewritten when the data is next read (api/transformations.py)
+            transformations.apply(project, steps, request.user, expected_version=request.data.get('expected_version'))
             return Response(DataProjectSerializer(project).data, status=status.HTTP_200_OK)
+        except cleaning.CleaningError as e:
+            return Response({"error": str(e)}, status=e.status_code)
         except Exception as e: 
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class ModelImputeView(APIView):
+    """
+    Fills missing values of several numerical columns with a KNN or iterative
+    imputer (api/cleaning.py: model_impute) as a background job. Answers 202
+    with the job; poll job_url for progress and the new data_version, or
+    cancel it with POST <job_url>cancel/.
+    """
+    permission_classes = [IsAuthenticated]
+    def post(self, request, *args, **kwargs):
+        project_id = request.data.get('project_id')
+        step = {'operation': 'model_impute', 'columns': request.data.get('columns'), 'method': request.data.get('method')}
+        for field in ('n_neighbors', 'max_iter', 'sample_rows', 'seed'):
+            if request.data.get(field) is not None:
+                step[field] = request.data.get(field)
+        try:
+            project = DataProject.objects.get(id=project_id, owner=request.user)
+            if isinstance(step['columns'], list):
+                # Checked against the registry now rather than failing in the job
+                registry = column_types.ColumnTypes.from_metadata(project.metadata_json)
+                invalid = [name for name in step['columns'] if registry.type_of(name) != 'numerical']
+                if invalid:
+                    return Response({"error": f"Not numerical columns: {', '.join(map(str, invalid))}."}, status=status.HTTP_400_BAD_REQUEST)
+            if dry_run.requested(request):
+                # Previewed in the request on at most settings.DRY_RUN_MODEL_ROWS rows
+                return Response(dry_run.preview(project, [step]))
+            job = transformations.apply_in_background(project, [step], request.user, expected_version=request.data.get('expected_version'))
+            job['job_url'] = request.build_absolute_uri(reverse('job-status', kwargs={'job_id': job['id']}))
+            return Response(job, status=status.HTTP_202_ACCEPTED)
+        except DataProject.DoesNotExist:
+            return Response({"error": "Project not found."}, status=status.HTTP_404_NOT_FOUND)
+        except cleaning.CleaningError as e: return Response({"error": str(e)}, status=e.status_code)
+        except Exception as e: return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 class RemoveColumnView(APIView):
     permission_classes = [IsAuthenticated]
     def post(self, request, *args, **kwargs):
         project_id = request.data.get('project_id'); column_name = request.data.get('column_name')
         try:
             project = DataProject.objects.get(id=project_id, owner=request.user)
-            file_path = os.path.join(settings.MEDIA_ROOT, project.data_file.name)
-            df = pd.read_pickle(file_path)
-            df.drop(columns=[column_name], inplace=True)
-            df.to_pickle(file_path)
-            helpers.update_project_metadata(project, df)
+            steps = [{'operation': 'remove_column', 'column_name': column_name}]
+            if dry_run.requested(request):
+                return Response(dry_run.preview(project, steps))
+            transformations.apply(project, steps, request.user, expected_version=request.data.get('expected_version'))
             return Response(DataProjectSerializer(project).data, status=status.HTTP_200_OK)
+        except cleaning.CleaningError as e: return Response({"error": str(e)}, status=e.status_code)
+        except Exception as e: return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class DeriveColumnView(APIView):
+    """
+    Adds (or replaces) column_name with the values of an expression over other
+    columns (api/expressions.py), checked against the column type registry
+    before the data is loaded (or against the stored sample when the registry
+    does not know a column).
+    """
+    permission_classes = [IsAuthenticated]
+    def post(self, request, *args, **kwargs):
+        project_id = request.data.get('project_id'); column_name = request.data.get('column_name'); expression = request.data.get('expression')
+        if not all([project_id, column_name, expression]):
+            return Response({"error": "Missing project_id, column_name, or expression."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            project = DataProject.objects.get(id=project_id, owner=request.user)
+            try:
+                try:
+                    compiled = expressions.check(expression, column_types.ColumnTypes.from_metadata(project.metadata_json))
+                except expressions.UnknownColumnError:
+                    # The registry may predate a column (older metadata): check against the stored sample instead
+                    compiled = expressions.for_frame(expression, transformations.load_frame(project, resolution='sample'))
+            except expressions.ExpressionError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            steps = [{'operation': 'derive_column', 'column_name': column_name, 'expression': expression}]
+            if dry_run.requested(request):
+                return Response(dict(dry_run.preview(project, steps), result_type=compiled.type))
+            transformations.apply(project, steps, request.user, expected_version=request.data.get('expected_version'))
+            return Response(DataProjectSerializer(project).data, status=status.HTTP_200_OK)
+        except DataProject.DoesNotExist:
+            return Response({"error": "Project not found."}, status=status.HTTP_404_NOT_FOUND)
+        except cleaning.CleaningError as e: return Response({"error": str(e)}, status=e.status_code)
         except Exception as e: return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class DetectOutliersView(APIView):
+    """
+    One column: IQR bounds, sample outliers and a rendered box plot.
+    With "mode": "scan": box-plot statistics and IQR/z-score/MAD outlier counts
+    for all numerical columns (or "columns") as JSON, in one pass (api/outliers.py).
+    """
     permission_classes = [IsAuthenticated]
     def post(self, request, *args, **kwargs):
         project_id = request.data.get('project_id'); column_name = request.data.get('column_name')
-        from scipy import stats 
+        hypertune_params = request.data.get('hypertune_params', {})
+        if request.data.get('mode') == 'scan':
+            return self.scan(request, project_id)
 
         try:
             project = DataProject.objects.get(id=project_id, owner=request.user)
-            df = pd.read_pickle(os.path.join(settings.MEDIA_ROOT, project.data_file.name))
+            df = transformations.load_frame(project)
             
             if not pd.api.types.is_numeric_dtype(df[column_name]):
                  raise ValueError(f"Outlier detection requires a numerical column, not '{df[column_name].dtype}'.")
@@ -235,22 +298,57 @@ class DetectOutliersView(APIView):
             if col.empty:
                 raise ValueError("Column contains no valid numerical data to analyze.")
 
-            Q1 = col.quantile(0.25); Q3 = col.quantile(0.75); IQR = Q3 - Q1
-            lower = Q1 - 1.5 * IQR; upper = Q3 + 1.5 * IQR
+            lower, upper = cleaning.outlier_bounds(col)
             outliers = col[(col < lower) | (col > upper)]
             
             # Matplotlib plotting
-            fig, ax = plt.subplots(figsize=(6, 4)); ax.boxplot(col, vert=False, patch_artist=True, boxprops=dict(facecolor='#add8e6')); plt.tight_layout()
-            buf = io.BytesIO(); plt.savefig(buf, format='png'); buf.seek(0); image_base64 = base64.b64encode(buf.read()).decode('utf-8'); plt.close(fig)
+            with image_cache.render_slot():
+                fig, ax = plt.subplots(figsize=(6, 4)); ax.boxplot(col, vert=False, patch_artist=True, boxprops=dict(facecolor='#add8e6')); plt.tight_layout()
+                image_fields = image_cache.figure_to_image_payload(fig, hypertune_params, project.id)
             
-            return Response({
+            response_data = {
                 'column_name': column_name, 
                 'outlier_count': len(outliers), 
                 'lower_bound': lower, 
                 'upper_bound': upper, 
                 'sample_outliers': outliers.head(10).tolist(), 
-                'plot_base64': f"data:image/png;base64,{image_base64}"
-            })
+            }
+            if image_fields.get('chart_image'):
+                # Cached image delivery: return a cacheable URL instead of inline base64
+                response_data['plot_url'] = request.build_absolute_uri(image_fields['chart_image']['url'])
+                response_data['plot_etag'] = image_fields['chart_image']['etag']
+            else:
+                response_data['plot_base64'] = image_fields['chart_data']
+            return Response(response_data)
+        except Exception as e: return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def scan(self, request, project_id):
+        columns = request.data.get('columns')
+        try:
+            params = {
+                'z_threshold': float(request.data.get('z_threshold', outliers.Z_THRESHOLD)),
+                'mad_threshold': float(request.data.get('mad_threshold', outliers.MAD_THRESHOLD)),
+                'max_fliers': int(request.data.get('max_fliers', outliers.MAX_FLIERS)),
+            }
+        except (TypeError, ValueError):
+            return Response({"error": "z_threshold, mad_threshold and max_fliers must be numbers."}, status=status.HTTP_400_BAD_REQUEST)
+        if columns is not None and not isinstance(columns, list):
+            return Response({"error": "columns must be a list of column names."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            project = DataProject.objects.get(id=project_id, owner=request.user)
+            if columns is not None:
+                registry = column_types.ColumnTypes.from_metadata(project.metadata_json)
+                invalid = [name for name in columns if registry.type_of(name) != 'numerical']
+                if invalid:
+                    return Response({"error": f"Not numerical columns: {', '.join(map(str, invalid))}."}, status=status.HTTP_400_BAD_REQUEST)
+                params['columns'] = columns
+            with timing.span('stats'):
+                results = outliers.get_scan(lambda: transformations.load_frame(project),
+                                            (project.id, helpers.get_project_version(project)), **params)
+            return Response({'columns': results, 'version': project.data_version})
+        except DataProject.DoesNotExist:
+            return Response({"error": "Project not found."}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e: return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class TreatOutliersView(APIView):
@@ -259,55 +357,127 @@ class TreatOutliersView(APIView):
         project_id = request.data.get('project_id'); column_name = request.data.get('column_name'); method = request.data.get('method')
         try:
             project = DataProject.objects.get(id=project_id, owner=request.user)
-            file_path = os.path.join(settings.MEDIA_ROOT, project.data_file.name)
-            df = pd.read_pickle(file_path)
-            
-            if not pd.api.types.is_numeric_dtype(df[column_name]):
-                 raise ValueError(f"Outlier treatment requires a numerical column, not '{df[column_name].dtype}'.")
-
-            col = df[column_name].dropna()
-            Q1 = col.quantile(0.25); Q3 = col.quantile(0.75); IQR = Q3 - Q1
-            lower = Q1 - 1.5 * IQR; upper = Q3 + 1.5 * IQR
-            
-            if method == 'remove': 
-                df = df[(df[column_name].between(lower, upper, inclusive='both')) | (df[column_name].isnull())]
-            elif method == 'cap': 
-                df[column_name] = df[column_name].clip(lower=lower, upper=upper)
-                
-            df.to_pickle(file_path)
-            helpers.update_project_metadata(project, df)
+            steps = [{'operation': 'treat_outliers', 'column_name': column_name, 'method': method}]
+            if dry_run.requested(request):
+                return Response(dry_run.preview(project, steps))
+            transformations.apply(project, steps, request.user, expected_version=request.data.get('expected_version'))
             return Response(DataProjectSerializer(project).data)
+        except cleaning.CleaningError as e: return Response({"error": str(e)}, status=e.status_code)
         except Exception as e: return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class RecodeColumnView(APIView):
+    """
+    Recodes one column (column_name + recode_map) or several in one change
+    (recode_maps: {column name: recode map}).
+    """
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
         project_id = request.data.get('project_id')
         column_name = request.data.get('column_name')
         recode_map = request.data.get('recode_map') 
+        recode_maps = request.data.get('recode_maps')
 
-        if not all([project_id, column_name, recode_map]):
+        if recode_maps is None and column_name:
+            recode_maps = {column_name: recode_map}
+        if not project_id or not isinstance(recode_maps, dict) or not recode_maps or not all(recode_maps.values()):
             return Response({"error": "Missing project_id, column_name, or recode_map."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
             project = DataProject.objects.get(id=project_id, owner=request.user)
-            file_path = os.path.join(settings.MEDIA_ROOT, project.data_file.name)
-            df = pd.read_pickle(file_path)
-
-            if column_name not in df.columns:
-                return Response({"error": f"Column '{column_name}' not found."}, status=status.HTTP_404_NOT_FOUND)
+            steps = [{'operation': 'recode', 'column_name': name, 'recode_map': mapping} for name, mapping in recode_maps.items()]
+            if dry_run.requested(request):
+                return Response(dry_run.preview(project, steps))
+            transformations.apply(project, steps, request.user, expected_version=request.data.get('expected_version'))
             
-            if not isinstance(recode_map, dict):
-                return Response({"error": "Recode map format is incorrect."}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(DataProjectSerializer(project).data, status=status.HTTP_200_OK)
+        except DataProject.DoesNotExist:
+            return Response({"error": "Project not found."}, status=status.HTTP_404_NOT_FOUND)
+        except cleaning.CleaningError as e:
+            return Response({"error": str(e)}, status=e.status_code)
+        except Exception as e:
+            return Response({"error": f"An unexpected error occurred during recoding: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            df[column_name] = df[column_name].astype(str).replace(recode_map)
-            
-            df.to_pickle(file_path)
-            helpers.update_project_metadata(project, df)
-            
+
+class CleaningPipelineView(APIView):
+    """
+    Applies an ordered list of cleaning steps (api/cleaning.py) in one
+    cycle: every step runs on the same DataFrame, then the steps are appended
+    to the transformation log and the metadata is refreshed once. Steps are
+    all-or-nothing: if any step fails, nothing is logged.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        project_id = request.data.get('project_id'); steps = request.data.get('steps')
+        if not project_id:
+            return Response({"error": "Missing project_id."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            cleaning.validate_steps(steps)
+        except cleaning.CleaningError as e:
+            return Response({"error": str(e), "step_index": e.step_index}, status=e.status_code)
+
+        try:
+            project = DataProject.objects.get(id=project_id, owner=request.user)
+            if dry_run.requested(request):
+                return Response(dry_run.preview(project, steps))
+            transformations.apply(project, steps, request.user, expected_version=request.data.get('expected_version'))
+            response_data = DataProjectSerializer(project).data
+            response_data['steps_applied'] = len(steps)
+            return Response(response_data, status=status.HTTP_200_OK)
+        except DataProject.DoesNotExist:
+            return Response({"error": "Project not found."}, status=status.HTTP_404_NOT_FOUND)
+        except cleaning.CleaningError as e:
+            return Response({"error": str(e), "step_index": e.step_index}, status=e.status_code)
+        except Exception as e:
+            return Response({"error": f"An unexpected error occurred while applying the pipeline: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class TransformationLogView(APIView):
+    """
+    Lineage of a project's data: the log of cleaning steps applied since
+    upload (api/transformations.py), oldest first. Undone steps are listed
+    with active=false.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, project_id, *args, **kwargs):
+        try:
+            project = DataProject.objects.get(id=project_id, owner=request.user)
+        except DataProject.DoesNotExist:
+            return Response({"error": "Project not found."}, status=status.HTTP_404_NOT_FOUND)
+        history = transformations.history(project)
+        return Response({
+            'project_id': project.id,
+            'data_version': project.data_version,
+            'materialized_version': project.materialized_version,
+            'can_undo': history['can_undo'],
+            'can_redo': history['can_redo'],
+            'steps': TransformationStepSerializer(history['entries'], many=True, context={'active': history['active']}).data,
+        }, status=status.HTTP_200_OK)
+
+
+class UndoCleaningView(APIView):
+    """Returns the project to the version before its last cleaning step (redo re-applies it)."""
+    permission_classes = [IsAuthenticated]
+    action = staticmethod(transformations.undo)
+
+    def post(self, request, *args, **kwargs):
+        project_id = request.data.get('project_id')
+        if not project_id:
+            return Response({"error": "Missing project_id."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            project = DataProject.objects.get(id=project_id, owner=request.user)
+            self.action(project, request.user, expected_version=request.data.get('expected_version'))
             return Response(DataProjectSerializer(project).data, status=status.HTTP_200_OK)
         except DataProject.DoesNotExist:
             return Response({"error": "Project not found."}, status=status.HTTP_404_NOT_FOUND)
+        except cleaning.CleaningError as e:
+            return Response({"error": str(e)}, status=e.status_code)
         except Exception as e:
-            return Response({"error": f"An unexpected error occurred during recoding: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            return Response({"error": f"An unexpected error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class RedoCleaningView(UndoCleaningView):
+    """Re-applies the most recently undone cleaning step."""
+    action = staticmethod(transformations.redo)
@@ -13,13 +13,16 @@ from rest_framework.permissions import IsAuthenticated
 
 from sqlalchemy import create_engine,text
 from sqlalchemy.exc import OperationalError, ProgrammingError
-import pymysql
-import psycopg2 # Required for PostgreSQL discovery
-import pymssql
+# DB drivers are imported on first use (see api/lazy_imports.py)
+from ..lazy_imports import pymysql, psycopg2, pymssql
 
 from ..serializers import DbConnectionSerializer, DbConnectionTestSerializer
 from ..models import DbConnection, DataProject # DataProject needed for QueryAndExport
+from .. import column_store
 from .. import helpers 
+from .. import metrics
+from .. import sampling
+from .. import timing
 
 # --- DB CONNECTION VIEWS ---
 
@@ -79,7 +82,7 @@ class DbConnectionTestView(APIView):
         
         try:
             db_url = helpers.get_db_url(**data) # Uses helper
-            engine = create_engine(db_url)
+            engine = metrics.instrument_engine(create_engine(db_url), 'test')
             
             with engine.connect() as connection:
                 connection.execute(text("SELECT 1"))
@@ -235,21 +238,18 @@ class DbDiscoveryTestView(APIView):
         try:
             # Uses direct driver imports for discovery before SQLAlchemy kicks in
             if db_type == 'mysql':
-                import pymysql
                 connection = pymysql.connect(host=host, port=int(port), user=username, password=password, connect_timeout=5)
                 cursor = connection.cursor(); cursor.execute("SHOW DATABASES")
                 databases = [row[0] for row in cursor.fetchall()]
                 user_databases = [db for db in databases if db not in ('mysql', 'information_schema', 'performance_schema', 'sys')]
                 cursor.close(); connection.close()
             elif db_type == 'postgres':
-                import psycopg2
                 connection = psycopg2.connect(host=host, port=int(port), user=username, password=password, database='postgres', connect_timeout=5)
                 cursor = connection.cursor(); cursor.execute("SELECT datname FROM pg_database WHERE datistemplate = false AND datname NOT IN ('postgres', 'template0', 'template1')")
                 user_databases = [row[0] for row in cursor.fetchall()]
                 cursor.close(); connection.close()
             elif db_type == 'mssql':
-                import pymysql # Assuming pymysql is used for MS SQL connection in this code base
-                connection = pymysql.connect(host=host, port=int(port), user=username, password=password, timeout=5)
+                connection = pymysql.connect(host=host, port=int(port), user=username, password=password, timeout=5) # Assuming pymysql is used for MS SQL connection in this code base
                 cursor = connection.cursor(); cursor.execute("SELECT name FROM sys.databases WHERE name NOT IN ('master', 'tempdb', 'model', 'msdb')")
                 user_databases = [row[0] for row in cursor.fetchall()]
                 cursor.close(); connection.close()
@@ -284,7 +284,7 @@ class SchemaFetchView(APIView):
         try:
             connection = DbConnection.objects.get(id=connection_id, owner=request.user)
             db_url = helpers.get_db_url(db_type=connection.db_type, host=connection.host, port=connection.port, database=database, username=connection.username, password=connection.password)
-            engine = create_engine(db_url); tables_info = []
+            engine = metrics.instrument_engine(create_engine(db_url), connection.id); tables_info = []
             
             # DB-specific schema queries
             if connection.db_type == 'mysql': query = f"SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_SCHEMA = '{database}'"; col_query_template = f"SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_SCHEMA = '{database}' AND TABLE_NAME = ";
@@ -346,7 +346,7 @@ class QueryAndExportView(APIView):
                 
             final_query = cleaned_query 
             db_url = helpers.get_db_url(db_type=connection.db_type, host=connection.host, port=connection.port, database=database_name, username=connection.username, password=connection.password)
-            engine = create_engine(db_url)
+            engine = metrics.instrument_engine(create_engine(db_url), connection.id)
 
             query_upper = final_query.upper()
             is_select_query = (query_upper.startswith('SELECT') or query_upper.startswith('SHOW') or query_upper.startswith('DESCRIBE') or query_upper.startswith('DESC ') or query_upper.startswith('EXPLAIN') or query_upper.startswith('WITH'))
@@ -355,7 +355,8 @@ class QueryAndExportView(APIView):
             if action == 'preview':
                 if is_select_query:
                     preview_query = final_query if query_upper.startswith(('SHOW', 'DESCRIBE', 'DESC ', 'EXPLAIN')) else f"SELECT * FROM ({final_query}) AS subquery LIMIT 50"
-                    df = pd.read_sql(preview_query, engine)
+                    with timing.span('query'):
+                        df = pd.read_sql(preview_query, engine)
                     
                     preview_data = json.loads(df.to_json(orient='records', date_format='iso'))
                     
@@ -364,7 +365,7 @@ class QueryAndExportView(APIView):
                         "columns": df.columns.tolist(), "rowCount": len(df)
                     }, status=status.HTTP_200_OK)
                 else:
-                    with engine.connect() as conn:
+                    with engine.connect() as conn, timing.span('query'):
                         result = conn.execute(text(final_query)); conn.commit()
                         rows_affected = result.rowcount if hasattr(result, 'rowcount') else 0
                         
@@ -379,7 +380,8 @@ class QueryAndExportView(APIView):
                 if not is_select_query: return Response({"error": "Export is only available for SELECT queries (DQL)."}, status=status.HTTP_400_BAD_REQUEST)
 
                 # 3. Execute SELECT query and save as project
-                df = pd.read_sql(final_query, engine)
+                with timing.span('query'):
+                    df = pd.read_sql(final_query, engine)
                 
                 # Use project_title for the initial name, ensure it's valid
                 valid_title = project_title[:255]
@@ -396,11 +398,14 @@ class QueryAndExportView(APIView):
                 file_name = f"{project.project_id}.pkl"
                 file_path = os.path.join(settings.MEDIA_ROOT, f"user_{request.user.id}", file_name)
                 os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                df.to_pickle(file_path)
+                with timing.span('metadata'):
+                    project.metadata_json = helpers.extract_metadata_from_df(df)
+                column_store.write_version(file_path, df, 0, metadata=project.metadata_json)
+                with timing.span('sample'):
+                    sampling.write_stored_sample(df, column_store.manifest_path(file_path, 0))
 
                 # 3c. Update the DataProject model with the correct file path and metadata
                 project.data_file.name = os.path.relpath(file_path, settings.MEDIA_ROOT)
-                project.metadata_json = helpers.extract_metadata_from_df(df)
                 project.save()
 
                 return Response({"message": f"Data successfully imported and saved as project: {project.title}", "project_id": project.id}, status=status.HTTP_201_CREATED)
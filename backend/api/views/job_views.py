@@ -0,0 +1,39 @@
+# api/views/job_views.py
+
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.permissions import IsAuthenticated
+
+from .. import jobs
+
+
+def _get_owned_job(request, job_id):
+    job = jobs.get_job(job_id)
+    if not job or job.get('owner_id') != request.user.id:
+        return None
+    return job
+
+
+class JobStatusView(APIView):
+    """Polling endpoint for background jobs: status, progress and (when done) the result."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id, *args, **kwargs):
+        job = _get_owned_job(request, job_id)
+        if job is None:
+            return Response({"error": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(job, status=status.HTTP_200_OK)
+
+
+class JobCancelView(APIView):
+    """Requests cancellation of a pending or running background job."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, job_id, *args, **kwargs):
+        job = _get_owned_job(request, job_id)
+        if job is None:
+            return Response({"error": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
+        if job['status'] in jobs.FINISHED_STATES:
+            return Response({"error": f"Job already {job['status']}."}, status=status.HTTP_409_CONFLICT)
+        return Response(jobs.cancel(job_id), status=status.HTTP_202_ACCEPTED)
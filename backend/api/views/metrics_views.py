@@ -0,0 +1,32 @@
+# api/views/metrics_views.py
+
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.permissions import AllowAny
+
+from .. import metrics
+
+
+class MetricsView(APIView):
+    """
+    Prometheus scrape endpoint for this process's metrics (api/metrics.py).
+    Open to staff users and, when METRICS_TOKEN is set, to requests with a
+    matching X-Metrics-Token header. Without a token it is hidden (404) from
+    everyone else.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_staff:
+            expected = getattr(settings, 'METRICS_TOKEN', '')
+            if not expected:
+                return Response({"error": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+            supplied = request.headers.get('X-Metrics-Token', '')
+            if not hmac.compare_digest(supplied.encode(), expected.encode()):
+                return Response({"error": "Invalid metrics token."}, status=status.HTTP_403_FORBIDDEN)
+        return HttpResponse(metrics.REGISTRY.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,50 @@
+# api/views/profiling_views.py
+
+from django.http import FileResponse
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.permissions import IsAdminUser
+
+from .. import profiling
+
+
+class ProfileListView(APIView):
+    """Recent request profiles captured with X-Profile: 1 (newest first)."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response({'profiles': profiling.list_profiles()}, status=status.HTTP_200_OK)
+
+
+class ProfileDetailView(APIView):
+    """
+    One stored profile. Without options returns the stored summary; with
+    ?filter=<module>, ?sort=cumulative|tottime|calls or ?limit=N the function
+    table is recomputed from the raw stats. ?download=1 returns the .prof file.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, profile_id, *args, **kwargs):
+        try:
+            summary = profiling.load_summary(profile_id)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except FileNotFoundError:
+            return Response({"error": "Profile not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        if request.query_params.get('download') in ('1', 'true'):
+            return FileResponse(open(profiling.profile_path(profile_id, 'prof'), 'rb'), as_attachment=True,
+                                filename=f"{profile_id}.prof", content_type='application/octet-stream')
+
+        filter_text = request.query_params.get('filter')
+        sort = request.query_params.get('sort')
+        limit = request.query_params.get('limit')
+        if filter_text or sort or limit:
+            try:
+                limit = int(limit) if limit else profiling.SUMMARY_FUNCTIONS
+                summary['functions'] = profiling.function_rows(profiling.load_stats(profile_id), sort or 'cumulative', limit, filter_text)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            summary.update(filter=filter_text, sort=sort or 'cumulative')
+        return Response(summary, status=status.HTTP_200_OK)
@@ -1,47 +1,52 @@
 # api/views/visualization_views.py
 
+import logging
 import os
-import json
 from django.conf import settings
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, AllowAny
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.urls import reverse
+from django.core.cache import cache
 
-from scipy import stats
 import pandas as pd
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import io
-import base64
-import seaborn as sns
-import plotly.express as px
-import plotly.graph_objects as go
+# matplotlib / seaborn / plotly are imported on first use (see api/lazy_imports.py)
+from ..lazy_imports import plt, sns, px, go
 import random
 import numpy as np 
 from ast import literal_eval 
 from ..models import DataProject
 from .. import helpers 
+from .. import approximate
+from .. import column_types
+from .. import correlation
+from .. import figure_serialization
+from .. import image_cache
+from .. import jobs
+from .. import metrics
+from .. import sampling
+from .. import timeseries
+from .. import timing
+from .. import transformations
+
+logger = logging.getLogger(__name__)
 
 
 # --- Visualization Helpers (Functions moved from the original class) ---
 
-def _get_column_type(df, column_name):
-    """Determines if a column is numerical, temporal, or categorical."""
+def _get_column_type(df, column_name, context=None):
+    """
+    Determines if a column is numerical, temporal, or categorical. Served from the
+    project's column type registry (no data scan) when the context carries one.
+    """
     if column_name not in df.columns: return None
-    col_dtype = df[column_name].dtype
-    if pd.api.types.is_numeric_dtype(col_dtype): return 'numerical'
-    if pd.api.types.is_datetime64_any_dtype(col_dtype): return 'temporal'
-    # Check if object type might be convertible to datetime
-    if col_dtype == 'object':
-        try:
-            # Attempt conversion on a small sample, ignore errors for performance
-            pd.to_datetime(df[column_name].dropna().sample(min(10, len(df[column_name].dropna()))), errors='raise', infer_datetime_format=True)
-            return 'temporal'
-        except (ValueError, TypeError):
-            return 'categorical' # If conversion fails, assume categorical
-    return 'categorical' # Default assumption
+    registry = context.column_types if context is not None else None
+    if registry is not None:
+        col_type = registry.type_of(column_name, df[column_name].dtype)
+        if col_type: return col_type
+    return column_types.infer_type(df[column_name])
 
 def _interpret_correlation(r):
     r_abs = abs(r); direction = "positive" if r > 0 else "negative"
@@ -82,6 +87,45 @@ def _get_dynamic_range(series):
 
     return lower_bound, upper_bound
 
+# --- Request Context & Shared Statistics ---
+
+class ChartContext:
+    """Per-request state shared by the chart generators (project identity, filters, cache keys)."""
+
+    def __init__(self, project=None, filters=None, variant='full', analytics=None, seed=sampling.DEFAULT_SEED, column_types=None):
+        self.project = project
+        self.filters = filters or {}
+        self.column_types = column_types # ColumnTypes registry from the project's metadata_json
+        self.seed = seed # Seed for every randomized step (sampling, column picks) of this request
+        self.analytics = analytics or approximate.Analytics(random_state=seed) # Exact unless analytics_mode='approximate'
+        self.variant = variant # Which rows the generators see: 'full', 'sample' (stored tier) or 'preview<n>'
+        self.project_version = helpers.get_project_version(project)
+        self.filter_fingerprint = correlation.filter_fingerprint(self.filters)
+
+    @property
+    def cache_key(self):
+        if self.project is None:
+            return None
+        return (self.project.id, self.project_version, self.filter_fingerprint, self.variant)
+
+def _get_analytics(context=None):
+    return context.analytics if context is not None else approximate.Analytics(random_state=sampling.DEFAULT_SEED)
+
+def _get_seed(context=None):
+    return context.seed if context is not None else sampling.DEFAULT_SEED
+
+def _get_project_id(context=None):
+    return context.project.id if context is not None and context.project is not None else None
+
+def _get_correlations(df, columns, context=None):
+    """
+    Reads correlation/p-value matrices for `columns` from the shared (cached) correlation
+    service, or estimates them from a sample in approximate analytics mode.
+    """
+    exact = lambda: correlation.get_correlations(df, columns, context.cache_key if context else None)
+    with timing.span('stats'):
+        return _get_analytics(context).correlations(df, columns, exact)
+
 # --- Core Plotly Chart Generator (Updated to take hypertune_params and add barmode support) ---
 def _apply_plotly_hypertune(fig, chart_type, hypertune_params, x_col=None, y_col=None):
     """Applies common hypertune parameters to a Plotly figure."""
@@ -149,15 +193,15 @@ def _apply_plotly_hypertune(fig, chart_type, hypertune_params, x_col=None, y_col
 
 
 # --- *** NEW FILTER HELPER FUNCTION *** ---
-def _apply_filters_to_df(df, filters):
+def _apply_filters_to_df(df, filters, context=None):
     """Applies filters received from the frontend to the DataFrame."""
     if not filters or not isinstance(filters, dict): return df
     filtered_df = df.copy()
-    print(f"Applying filters: {filters}") # Debug
+    logger.debug("Applying filters: %s", filters)
     for col_name, f_val in filters.items():
-        if col_name not in filtered_df.columns: print(f"Warn: Filter col '{col_name}' not found."); continue
-        col_type = _get_column_type(filtered_df, col_name)
-        print(f"  - Filtering '{col_name}' (type: {col_type}) with value: {f_val}") # Debug
+        if col_name not in filtered_df.columns: logger.warning("Filter column '%s' not found.", col_name); continue
+        col_type = _get_column_type(filtered_df, col_name, context)
+        logger.debug("Filtering '%s' (type: %s) with value: %s", col_name, col_type, f_val)
         try:
             if isinstance(f_val, list) and col_type == 'categorical': # Categorical
                 if not f_val: continue
@@ -168,29 +212,30 @@ def _apply_filters_to_df(df, filters):
                 # Convert to numeric, errors='coerce' turns invalid inputs into NaN
                 min_n = pd.to_numeric(min_v, errors='coerce') if min_v not in [None, ''] else None
                 max_n = pd.to_numeric(max_v, errors='coerce') if max_v not in [None, ''] else None
-                print(f"    Min: {min_n}, Max: {max_n}") # Debug
+                logger.debug("Range filter on '%s': min=%s, max=%s", col_name, min_n, max_n)
                 # Apply filters only if conversion was successful (not NaN)
                 if pd.notna(min_n): filtered_df = filtered_df[pd.to_numeric(filtered_df[col_name], errors='coerce') >= min_n]
                 if pd.notna(max_n): filtered_df = filtered_df[pd.to_numeric(filtered_df[col_name], errors='coerce') <= max_n]
-        except Exception as e: print(f"Error applying filter for '{col_name}': {e}"); continue
-    print(f"  -> Filtered shape: {filtered_df.shape}") # Debug
+        except Exception as e: logger.warning("Error applying filter for '%s': %s", col_name, e); continue
+    logger.debug("Filtered shape: %s -> %s", df.shape, filtered_df.shape)
     return filtered_df
 # --- *** END NEW FILTER HELPER FUNCTION *** ---
 
 
 # --- Visualization Generation Methods (Updated signature for hypertune_params) ---
 # --- (These functions remain the same as before) ---
-def _generate_histogram(df, column_config, hypertune_params): # ADDED hypertune_params
+def _generate_histogram(df, column_config, hypertune_params, context=None): # ADDED hypertune_params
     col = column_config.get("x_axis")
     if not col: raise ValueError("Histogram requires one numerical column (X-Axis) to be selected.")
-    if _get_column_type(df, col) != 'numerical': raise ValueError(f"Histogram requires a numerical column. '{col}' is {_get_column_type(df, col)}.")
+    if _get_column_type(df, col, context) != 'numerical': raise ValueError(f"Histogram requires a numerical column. '{col}' is {_get_column_type(df, col, context)}.")
 
     col_data = df[col].dropna()
     if col_data.empty: raise ValueError(f"The selected column ('{col}') contains no valid data to plot.")
 
     analysis_parts = [f"Distribution analysis for '{col}':"]
     try:
-        count = len(col_data); mean = col_data.mean(); median = col_data.median(); std_dev = col_data.std(); min_val = col_data.min(); max_val = col_data.max(); skewness = col_data.skew()
+        analytics = _get_analytics(context)
+        count = len(col_data); mean = analytics.mean(col_data); median = analytics.median(col_data); std_dev = analytics.std(col_data); min_val = col_data.min(); max_val = col_data.max(); skewness = analytics.skew(col_data)
         analysis_parts.append("\nKey Statistics:"); analysis_parts.append(f"- Count: {count:,.0f}"); analysis_parts.append(f"- Mean: {mean:,.2f}"); analysis_parts.append(f"- Median: {median:,.2f}"); analysis_parts.append(f"- Std. Deviation: {std_dev:,.2f}"); analysis_parts.append(f"- Min: {min_val:,.2f}, Max: {max_val:,.2f}")
         analysis_parts.append("\nDistribution Shape:")
         if skewness > 0.5: skew_desc = f"positively skewed (skewed right), (Skewness: {skewness:.2f})."
@@ -220,19 +265,20 @@ def _generate_histogram(df, column_config, hypertune_params): # ADDED hypertune_
     fig = _apply_plotly_hypertune(fig, 'histogram', hypertune_params, x_col=col)
     fig.update_layout(font_family="Inter", title_font_family="Inter")
 
-    return {"chart_data": json.loads(fig.to_json()), "analysis_text": analysis_text}
+    return {"chart_data": figure_serialization.figure_to_payload(fig, hypertune_params), "analysis_text": analysis_text}
 
-def _generate_kde_plot(df, column_config, hypertune_params): # ADDED hypertune_params
+def _generate_kde_plot(df, column_config, hypertune_params, context=None): # ADDED hypertune_params
     col = column_config.get("x_axis");
     if not col: raise ValueError("KDE Plot requires one numerical column (X-Axis) to be selected.")
-    if _get_column_type(df, col) != 'numerical': raise ValueError(f"KDE Plot requires a numerical column. '{col}' is {_get_column_type(df, col)}.")
+    if _get_column_type(df, col, context) != 'numerical': raise ValueError(f"KDE Plot requires a numerical column. '{col}' is {_get_column_type(df, col, context)}.")
 
     col_data = df[col].dropna()
     if col_data.empty: raise ValueError(f"The selected column ('{col}') contains no valid data to plot.")
 
     analysis_parts = [f"Density plot (KDE) for '{col}'."]
     try:
-        count = len(col_data); mean = col_data.mean(); median = col_data.median(); std_dev = col_data.std(); min_val = col_data.min(); max_val = col_data.max(); skewness = col_data.skew()
+        analytics = _get_analytics(context)
+        count = len(col_data); mean = analytics.mean(col_data); median = analytics.median(col_data); std_dev = analytics.std(col_data); min_val = col_data.min(); max_val = col_data.max(); skewness = analytics.skew(col_data)
         analysis_parts.append("\nKey Statistics:"); analysis_parts.append(f"- Count: {count:,.0f}"); analysis_parts.append(f"- Mean: {mean:,.2f}"); analysis_parts.append(f"- Median: {median:,.2f}"); analysis_parts.append(f"- Std. Deviation: {std_dev:,.2f}"); analysis_parts.append(f"- Min: {min_val:,.2f}, Max: {max_val:,.2f}")
         analysis_parts.append("\nDistribution Shape:")
         if skewness > 0.5: skew_desc = f"positively skewed (skewed right), (Skewness: {skewness:.2f})."
@@ -250,14 +296,13 @@ def _generate_kde_plot(df, column_config, hypertune_params): # ADDED hypertune_p
     plt.title(custom_title if custom_title else f'Density Plot (KDE) of {col}');
 
     plt.xlabel(col); plt.ylabel('Density'); plt.tight_layout()
-    buf = io.BytesIO(); plt.savefig(buf, format='png'); buf.seek(0); 
-    image_base64 = base64.b64encode(buf.read()).decode('utf-8'); plt.close()
+    image_fields = image_cache.figure_to_image_payload(plt.gcf(), hypertune_params, _get_project_id(context))
 
-    return {"chart_data": f"data:image/png;base64,{image_base64}", "analysis_text": analysis_text}
+    return {**image_fields, "analysis_text": analysis_text}
 
-def _generate_count_plot(df, column_config, hypertune_params): # ADDED hypertune_params
+def _generate_count_plot(df, column_config, hypertune_params, context=None): # ADDED hypertune_params
     col = column_config.get("x_axis")
-    col_type = _get_column_type(df, col)
+    col_type = _get_column_type(df, col, context)
     if not col: raise ValueError("Count Plot requires one categorical column (X-Axis) to be selected.")
     if col_type != 'categorical': raise ValueError(f"Count Plot requires a categorical column. '{col}' is {col_type}.")
 
@@ -283,12 +328,12 @@ def _generate_count_plot(df, column_config, hypertune_params): # ADDED hypertune
     plt.title(custom_title if custom_title else f'Count Plot of {col}');
 
     plt.xlabel(col); plt.ylabel('Frequency (Count)'); plt.xticks(rotation=45, ha='right'); plt.tight_layout()
-    buf = io.BytesIO(); plt.savefig(buf, format='png'); buf.seek(0); image_base64 = base64.b64encode(buf.read()).decode('utf-8'); plt.close()
+    image_fields = image_cache.figure_to_image_payload(plt.gcf(), hypertune_params, _get_project_id(context))
 
-    return {"chart_data": f"data:image/png;base64,{image_base64}", "analysis_text": analysis_text}
+    return {**image_fields, "analysis_text": analysis_text}
 
-def _generate_pie_chart(df, column_config, hypertune_params): # ADDED hypertune_params
-    col = column_config.get("names"); col_type = _get_column_type(df, col)
+def _generate_pie_chart(df, column_config, hypertune_params, context=None): # ADDED hypertune_params
+    col = column_config.get("names"); col_type = _get_column_type(df, col, context)
     if not col: raise ValueError("Pie Chart requires one categorical column ('Slice By') to be selected.")
     if col_type != 'categorical': raise ValueError(f"Pie Chart requires a categorical column. '{col}' is {col_type}.")
     col_data = df[col].dropna()
@@ -318,10 +363,10 @@ def _generate_pie_chart(df, column_config, hypertune_params): # ADDED hypertune_
     fig = _apply_plotly_hypertune(fig, 'pie_chart', hypertune_params)
     fig.update_traces(textposition='inside', textinfo='percent+label'); fig.update_layout(font_family="Inter", title_font_family="Inter", showlegend=True)
 
-    return {"chart_data": json.loads(fig.to_json()), "analysis_text": analysis_text}
+    return {"chart_data": figure_serialization.figure_to_payload(fig, hypertune_params), "analysis_text": analysis_text}
 
-def _generate_pie_chart_3d(df, column_config, hypertune_params): # ADDED hypertune_params
-    col = column_config.get("names"); col_type = _get_column_type(df, col)
+def _generate_pie_chart_3d(df, column_config, hypertune_params, context=None): # ADDED hypertune_params
+    col = column_config.get("names"); col_type = _get_column_type(df, col, context)
     if not col: raise ValueError("3D Pie Chart requires one categorical column ('Slice By') to be selected.")
     if col_type != 'categorical': raise ValueError(f"3D Pie Chart requires a categorical column. '{col}' is {col_type}.")
     col_data = df[col].dropna()
@@ -348,10 +393,10 @@ def _generate_pie_chart_3d(df, column_config, hypertune_params): # ADDED hypertu
 
     fig.update_layout(title_text=f'3D Pie Chart: Proportion of Categories in {col}', font_family="Inter", title_font_family="Inter", showlegend=True)
 
-    return {"chart_data": json.loads(fig.to_json()), "analysis_text": analysis_text}
+    return {"chart_data": figure_serialization.figure_to_payload(fig, hypertune_params), "analysis_text": analysis_text}
 
-def _generate_rug_plot(df, column_config, hypertune_params): # ADDED hypertune_params
-    col = column_config.get("x_axis"); col_type = _get_column_type(df, col)
+def _generate_rug_plot(df, column_config, hypertune_params, context=None): # ADDED hypertune_params
+    col = column_config.get("x_axis"); col_type = _get_column_type(df, col, context)
     if not col: raise ValueError("Rug Plot requires one numerical column (X-Axis) to be selected.")
     if col_type != 'numerical': raise ValueError(f"Rug Plot requires a numerical column. '{col}' is {col_type}.")
     col_data = df[col].dropna()
@@ -374,25 +419,25 @@ def _generate_rug_plot(df, column_config, hypertune_params): # ADDED hypertune_p
     ax.set_title(custom_title if custom_title else f'Rug Plot of {col}')
 
     ax.set_xlabel(col); ax.get_yaxis().set_visible(False); plt.tight_layout()
-    buf = io.BytesIO(); plt.savefig(buf, format='png'); buf.seek(0); image_base64 = base64.b64encode(buf.read()).decode('utf-8'); plt.close(fig)
+    image_fields = image_cache.figure_to_image_payload(fig, hypertune_params, _get_project_id(context))
 
-    return {"chart_data": f"data:image/png;base64,{image_base64}", "analysis_text": analysis_text}
+    return {**image_fields, "analysis_text": analysis_text}
 
-def _generate_scatter_plot(df, column_config, hypertune_params): # ADDED hypertune_params
+def _generate_scatter_plot(df, column_config, hypertune_params, context=None): # ADDED hypertune_params
     x_col, y_col = column_config.get("x_axis"), column_config.get("y_axis")
-    if _get_column_type(df, x_col) != 'numerical' or _get_column_type(df, y_col) != 'numerical': raise ValueError(f"Scatter Plot requires numerical columns. '{x_col}' is {_get_column_type(df, x_col)} and '{y_col}' is {_get_column_type(df, y_col)}.")
+    if _get_column_type(df, x_col, context) != 'numerical' or _get_column_type(df, y_col, context) != 'numerical': raise ValueError(f"Scatter Plot requires numerical columns. '{x_col}' is {_get_column_type(df, x_col, context)} and '{y_col}' is {_get_column_type(df, y_col, context)}.")
 
     temp_df = df[[x_col, y_col]].dropna()
     if len(temp_df) < 2: raise ValueError(f"Not enough common valid data points between '{x_col}' and '{y_col}' to generate a plot or analysis.")
 
     analysis_parts = []
-    try:
-        corr, p_val = stats.pearsonr(temp_df[x_col], temp_df[y_col])
+    corr, p_val, _ = _get_correlations(df, [x_col, y_col], context).pair(x_col, y_col)
+    if pd.notna(corr):
         analysis_parts.append(f"Pearson Correlation (r): {corr:.2f}")
         analysis_parts.append(f"- This value indicates {_interpret_correlation(corr)}.")
         if p_val < 0.05: analysis_parts.append(f"- The relationship is statistically significant (p-value: {p_val:.3g}), meaning it is unlikely to be due to random chance.")
         else: analysis_parts.append(f"- The relationship is not statistically significant (p-value: {p_val:.3g}), so the observed correlation could be due to random chance.")
-    except ValueError: analysis_parts.append("- Could not calculate Pearson correlation (likely due to constant data).")
+    else: analysis_parts.append("- Could not calculate Pearson correlation (likely due to constant data).")
     analysis_parts.append("\nVisual Inspection:"); analysis_parts.append("- The blue line shows the linear trend."); analysis_parts.append("- Look for non-linear patterns or distinct clusters, which correlation does not measure.")
     analysis_text = "\n".join(analysis_parts)
 
@@ -400,29 +445,27 @@ def _generate_scatter_plot(df, column_config, hypertune_params): # ADDED hypertu
 
     custom_title = hypertune_params.get('custom_title')
     plt.title(custom_title if custom_title else f'Relationship between {x_col} and {y_col}'); plt.tight_layout()
-    buf = io.BytesIO(); plt.savefig(buf, format='png'); buf.seek(0); image_base64 = base64.b64encode(buf.read()).decode('utf-8'); plt.close()
+    image_fields = image_cache.figure_to_image_payload(plt.gcf(), hypertune_params, _get_project_id(context))
 
-    return {"chart_data": f"data:image/png;base64,{image_base64}", "analysis_text": analysis_text}
+    return {**image_fields, "analysis_text": analysis_text}
 
-def _generate_correlation_heatmap(df, column_config, hypertune_params): # ADDED hypertune_params
+def _generate_correlation_heatmap(df, column_config, hypertune_params, context=None): # ADDED hypertune_params
     selected_cols = column_config.get("columns")
     if not selected_cols or not isinstance(selected_cols, list) or len(selected_cols) < 2: raise ValueError("Heatmap requires at least two numerical columns to be selected.")
     numerical_df = df[selected_cols].select_dtypes(include='number')
     if numerical_df.shape[1] < 2: raise ValueError("Heatmap requires at least two valid numerical columns.")
 
-    corr_matrix = numerical_df.corr()
-    corr_pairs = corr_matrix.unstack().sort_values(ascending=False); corr_pairs = corr_pairs[corr_pairs != 1.0];
-    corr_pairs.index = corr_pairs.index.map(lambda x: tuple(sorted(x))); corr_pairs = corr_pairs[~corr_pairs.index.duplicated(keep='first')]
-
-    pos_corr = corr_pairs[corr_pairs > 0].sort_values(ascending=False); neg_corr = corr_pairs[corr_pairs < 0].sort_values(ascending=True)
+    numeric_cols = numerical_df.columns.tolist()
+    corrs = _get_correlations(df, numeric_cols, context); corr_matrix = corrs.matrix(numeric_cols)
+    pos_corr, neg_corr = correlation.ranked_pairs(corr_matrix)
 
     analysis_parts = [f"Correlation matrix of {len(numerical_df.columns)} selected numerical columns."]; num_pairs_to_report = 3
 
     if not pos_corr.empty: analysis_parts.append("\nStrongest Positive Correlations:");
-    for pair, value in pos_corr.head(num_pairs_to_report).items(): analysis_parts.append(f"- {pair[0]} & {pair[1]}: {value:.2f}")
+    for pair, value in pos_corr.head(num_pairs_to_report).items(): analysis_parts.append(f"- {pair[0]} & {pair[1]}: {corrs.estimate(*pair):.2f}")
 
     if not neg_corr.empty: analysis_parts.append("\nStrongest Negative Correlations:");
-    for pair, value in neg_corr.head(num_pairs_to_report).items(): analysis_parts.append(f"- {pair[0]} & {pair[1]}: {value:.2f}")
+    for pair, value in neg_corr.head(num_pairs_to_report).items(): analysis_parts.append(f"- {pair[0]} & {pair[1]}: {corrs.estimate(*pair):.2f}")
 
     analysis_text = "\n".join(analysis_parts)
 
@@ -431,11 +474,11 @@ def _generate_correlation_heatmap(df, column_config, hypertune_params): # ADDED
 
     custom_title = hypertune_params.get('custom_title')
     plt.title(custom_title if custom_title else f"Correlation Heatmap ({len(numerical_df.columns)} columns)"); plt.tight_layout()
-    buf = io.BytesIO(); plt.savefig(buf, format='png'); buf.seek(0); image_base64 = base64.b64encode(buf.read()).decode('utf-8'); plt.close()
+    image_fields = image_cache.figure_to_image_payload(plt.gcf(), hypertune_params, _get_project_id(context))
 
-    return {"chart_data": f"data:image/png;base64,{image_base64}", "analysis_text": analysis_text}
+    return {**image_fields, "analysis_text": analysis_text}
 
-def _generate_pair_plot(df, column_config, hypertune_params): # ADDED hypertune_params
+def _generate_pair_plot(df, column_config, hypertune_params, context=None): # ADDED hypertune_params
     selected_cols = column_config.get("columns")
     if not selected_cols or not isinstance(selected_cols, list) or len(selected_cols) < 2: raise ValueError("Pair Plot requires at least two numerical columns to be selected.")
 
@@ -444,23 +487,23 @@ def _generate_pair_plot(df, column_config, hypertune_params): # ADDED hypertune_
 
     max_cols_plot = 7; plot_df = numerical_df; analysis_base = f"Pair plot showing scatterplots for all {len(numerical_df.columns)} selected numerical columns and their distributions (diagonal)."
     if numerical_df.shape[1] > max_cols_plot:
-        plot_cols = random.sample(numerical_df.columns.tolist(), max_cols_plot); plot_df = numerical_df[plot_cols]; analysis_base = f"Pair plot showing relationships between a sample of {len(plot_cols)} numerical columns (from {len(numerical_df.columns)} selected)."
+        plot_cols = random.Random(_get_seed(context)).sample(numerical_df.columns.tolist(), max_cols_plot); plot_df = numerical_df[plot_cols]; analysis_base = f"Pair plot showing relationships between a sample of {len(plot_cols)} numerical columns (from {len(numerical_df.columns)} selected)."
 
     analysis_parts = [analysis_base]; num_pairs_to_report = 2
     if plot_df.shape[1] >= 2:
-        corr_matrix = plot_df.corr(); corr_pairs = corr_matrix.unstack().sort_values(ascending=False); corr_pairs = corr_pairs[corr_pairs != 1.0];
-        corr_pairs.index = corr_pairs.index.map(lambda x: tuple(sorted(x))); corr_pairs = corr_pairs[~corr_pairs.index.duplicated(keep='first')]
-        pos_corr = corr_pairs[corr_pairs > 0].sort_values(ascending=False); neg_corr = corr_pairs[corr_pairs < 0].sort_values(ascending=True)
+        plot_cols = plot_df.columns.tolist()
+        corrs = _get_correlations(df, plot_cols, context); corr_matrix = corrs.matrix(plot_cols)
+        pos_corr, neg_corr = correlation.ranked_pairs(corr_matrix)
 
         if not pos_corr.empty: analysis_parts.append("\nStrongest Positive Correlations observed:");
-        for pair, value in pos_corr.head(num_pairs_to_report).items(): analysis_parts.append(f"- {pair[0]} & {pair[1]}: {value:.2f}")
+        for pair, value in pos_corr.head(num_pairs_to_report).items(): analysis_parts.append(f"- {pair[0]} & {pair[1]}: {corrs.estimate(*pair):.2f}")
 
         if not neg_corr.empty: analysis_parts.append("\nStrongest Negative Correlations observed:");
-        for pair, value in neg_corr.head(num_pairs_to_report).items(): analysis_parts.append(f"- {pair[0]} & {pair[1]}: {value:.2f}")
+        for pair, value in neg_corr.head(num_pairs_to_report).items(): analysis_parts.append(f"- {pair[0]} & {pair[1]}: {corrs.estimate(*pair):.2f}")
 
     skewed_cols = []
     for col in plot_df.columns:
-        skewness = plot_df[col].dropna().skew();
+        skewness = _get_analytics(context).skew(plot_df[col].dropna(), name=f"skewness({col})");
         if abs(skewness) > 0.5:
             direction = "right (positive)" if skewness > 0 else "left (negative)"; skewed_cols.append(f"{col} (skewness: {skewness:.2f}, skewed {direction})")
 
@@ -473,16 +516,16 @@ def _generate_pair_plot(df, column_config, hypertune_params): # ADDED hypertune_
     custom_title = hypertune_params.get('custom_title')
     g.fig.suptitle(custom_title if custom_title else "Pair Plot of Numerical Variables", y=1.02)
 
-    buf = io.BytesIO(); g.savefig(buf, format='png'); buf.seek(0); image_base64 = base64.b64encode(buf.read()).decode('utf-8'); plt.close(g.fig)
+    image_fields = image_cache.figure_to_image_payload(g.fig, hypertune_params, _get_project_id(context), bbox_inches='tight')
 
-    return {"chart_data": f"data:image/png;base64,{image_base64}", "analysis_text": analysis_text}
+    return {**image_fields, "analysis_text": analysis_text}
 
-def _generate_bubble_chart(df, column_config, hypertune_params): # ADDED hypertune_params
+def _generate_bubble_chart(df, column_config, hypertune_params, context=None): # ADDED hypertune_params
     x_col = column_config.get("x_axis"); y_col = column_config.get("y_axis"); size_col = column_config.get("size")
     if not all([x_col, y_col, size_col]): raise ValueError("Bubble chart requires X-axis, Y-axis, and Size columns.")
     required_cols = [x_col, y_col, size_col];
     for col in required_cols:
-         col_type = _get_column_type(df, col);
+         col_type = _get_column_type(df, col, context);
          if col_type != 'numerical': raise ValueError(f"Bubble Chart requires numerical columns. '{col}' is {col_type}.")
 
     analysis_parts = [f"Bubble chart displaying '{x_col}' vs. '{y_col}', with bubble size determined by '{size_col}'."]
@@ -490,17 +533,18 @@ def _generate_bubble_chart(df, column_config, hypertune_params): # ADDED hypertu
     if analysis_df.empty: raise ValueError("Not enough valid data points (after removing missing values) to generate analysis.")
 
     if len(analysis_df) >= 2:
-        try:
-            corr_xy, p_val_xy = stats.pearsonr(analysis_df[x_col], analysis_df[y_col])
+        corrs = _get_correlations(df, required_cols, context)
+        corr_xy, p_val_xy, _ = corrs.pair(x_col, y_col)
+        corr_sx, p_val_sx, _ = corrs.pair(size_col, x_col)
+        corr_sy, p_val_sy, _ = corrs.pair(size_col, y_col)
+        if pd.notna(corr_xy) and pd.notna(corr_sx) and pd.notna(corr_sy):
             analysis_parts.append(f"\n- Correlation between {x_col} and {y_col}: {corr_xy:.2f} (p={p_val_xy:.3g}).")
-            corr_sx, p_val_sx = stats.pearsonr(analysis_df[size_col], analysis_df[x_col])
-            corr_sy, p_val_sy = stats.pearsonr(analysis_df[size_col], analysis_df[y_col])
             size_impact_desc = [];
             if abs(corr_sx) > 0.3: size_impact_desc.append(f"larger bubbles tend to be associated with {'higher' if corr_sx > 0 else 'lower'} values of '{x_col}' (r={corr_sx:.2f})")
             if abs(corr_sy) > 0.3: size_impact_desc.append(f"larger bubbles tend to be associated with {'higher' if corr_sy > 0 else 'lower'} values of '{y_col}' (r={corr_sy:.2f})")
             if size_impact_desc: analysis_parts.append("\n- Size Impact: " + " and ".join(size_impact_desc) + ".")
             else: analysis_parts.append(f"\n- Size Impact: No strong linear relationship detected between bubble size ('{size_col}') and the X/Y axes.")
-        except ValueError: analysis_parts.append(f"\n- Could not calculate correlations (likely constant data).")
+        else: analysis_parts.append(f"\n- Could not calculate correlations (likely constant data).")
 
     size_data = analysis_df[size_col]; Q1 = size_data.quantile(0.25); Q3 = size_data.quantile(0.75); IQR = Q3 - Q1; lower_bound = Q1 - 1.5 * IQR; upper_bound = Q3 + 1.5 * IQR
     outliers = size_data[(size_data < lower_bound) | (size_data > upper_bound)];
@@ -529,14 +573,14 @@ def _generate_bubble_chart(df, column_config, hypertune_params): # ADDED hypertu
     fig = _apply_plotly_hypertune(fig, 'bubble_chart', hypertune_params, x_col=x_col, y_col=y_col)
     fig.update_layout(font_family="Inter", title_font_family="Inter")
 
-    return {"chart_data": json.loads(fig.to_json()), "analysis_text": analysis_text}
+    return {"chart_data": figure_serialization.figure_to_payload(fig, hypertune_params), "analysis_text": analysis_text}
 
-def _generate_scatter_3d(df, column_config, hypertune_params): # ADDED hypertune_params
+def _generate_scatter_3d(df, column_config, hypertune_params, context=None): # ADDED hypertune_params
     x_col = column_config.get("x_axis"); y_col = column_config.get("y_axis"); z_col = column_config.get("z_axis")
     if not all([x_col, y_col, z_col]): raise ValueError("3D Scatter Plot requires X-axis, Y-axis, and Z-axis columns.")
     required_cols = [x_col, y_col, z_col];
     for col in required_cols:
-         col_type = _get_column_type(df, col);
+         col_type = _get_column_type(df, col, context);
          if col_type != 'numerical': raise ValueError(f"3D Scatter Plot requires numerical columns. '{col}' is {col_type}.")
 
     analysis_parts = [f"3D scatter plot showing the relationship between '{x_col}', '{y_col}', and '{z_col}'."]
@@ -544,12 +588,13 @@ def _generate_scatter_3d(df, column_config, hypertune_params): # ADDED hypertune
 
     if analysis_df.empty or len(analysis_df) < 2: analysis_parts.append("\n- Not enough valid data to calculate pairwise correlations.")
     else:
-        try:
+        corrs = _get_correlations(df, required_cols, context)
+        pairs = [(x_col, y_col), (x_col, z_col), (y_col, z_col)]
+        pair_stats = [corrs.pair(a, b) for a, b in pairs]
+        if all(pd.notna(r) for r, _, _ in pair_stats):
             analysis_parts.append("\nPairwise Pearson Correlations (on valid data):")
-            corr_xy, p_xy = stats.pearsonr(analysis_df[x_col], analysis_df[y_col]); analysis_parts.append(f"- {x_col} & {y_col}: r={corr_xy:.2f} (p={p_xy:.3g})")
-            corr_xz, p_xz = stats.pearsonr(analysis_df[x_col], analysis_df[z_col]); analysis_parts.append(f"- {x_col} & {z_col}: r={corr_xz:.2f} (p={p_xz:.3g})")
-            corr_yz, p_yz = stats.pearsonr(analysis_df[y_col], analysis_df[z_col]); analysis_parts.append(f"- {y_col} & {z_col}: r={corr_yz:.2f} (p={p_yz:.3g})")
-        except ValueError: analysis_parts.append("\n- Could not calculate pairwise correlations (likely due to constant data).")
+            for (a, b), (r, p, _) in zip(pairs, pair_stats): analysis_parts.append(f"- {a} & {b}: r={r:.2f} (p={p:.3g})")
+        else: analysis_parts.append("\n- Could not calculate pairwise correlations (likely due to constant data).")
 
     analysis_parts.append("\nVisual Inspection:"); analysis_parts.append("- Interact with the 3D plot (drag to rotate) to look for clusters, layers, or distinct non-linear patterns.")
     analysis_parts.append("- Check for any points (outliers) far from the main cloud of data.")
@@ -574,24 +619,24 @@ def _generate_scatter_3d(df, column_config, hypertune_params): # ADDED hypertune
     fig = _apply_plotly_hypertune(fig, 'scatter_3d', hypertune_params, x_col=x_col, y_col=y_col)
     fig.update_layout(font_family="Inter", title_font_family="Inter", scene=scene_config)
 
-    return {"chart_data": json.loads(fig.to_json()), "analysis_text": analysis_text}
+    return {"chart_data": figure_serialization.figure_to_payload(fig, hypertune_params), "analysis_text": analysis_text}
 
-def _generate_parallel_coordinates(df, column_config, hypertune_params): # ADDED hypertune_params
+def _generate_parallel_coordinates(df, column_config, hypertune_params, context=None): # ADDED hypertune_params
     selected_cols = column_config.get("columns")
     if not selected_cols or not isinstance(selected_cols, list) or len(selected_cols) < 3: raise ValueError("Parallel Coordinates Plot requires at least three numerical columns to be selected.")
     numerical_df = df[selected_cols].select_dtypes(include='number')
     if numerical_df.shape[1] < 3: raise ValueError("Parallel Coordinates Plot requires at least three valid numerical columns.")
 
     analysis_parts = [f"Parallel coordinates plot for {len(numerical_df.columns)} selected numerical variables."]; num_pairs_to_report = 2
-    corr_matrix = numerical_df.corr(); corr_pairs = corr_matrix.unstack().sort_values(ascending=False); corr_pairs = corr_pairs[corr_pairs != 1.0];
-    corr_pairs.index = corr_pairs.index.map(lambda x: tuple(sorted(x))); corr_pairs = corr_pairs[~corr_pairs.index.duplicated(keep='first')]
-    pos_corr = corr_pairs[corr_pairs > 0].sort_values(ascending=False); neg_corr = corr_pairs[corr_pairs < 0].sort_values(ascending=True)
+    numeric_cols = numerical_df.columns.tolist()
+    corrs = _get_correlations(df, numeric_cols, context)
+    pos_corr, neg_corr = correlation.ranked_pairs(corrs.matrix(numeric_cols))
 
     if not pos_corr.empty: analysis_parts.append("\nStrongest Positive Correlations observed:");
-    for pair, value in pos_corr.head(num_pairs_to_report).items(): analysis_parts.append(f"- {pair[0]} & {pair[1]}: {value:.2f}")
+    for pair, value in pos_corr.head(num_pairs_to_report).items(): analysis_parts.append(f"- {pair[0]} & {pair[1]}: {corrs.estimate(*pair):.2f}")
 
     if not neg_corr.empty: analysis_parts.append("\nStrongest Negative Correlations observed:");
-    for pair, value in neg_corr.head(num_pairs_to_report).items(): analysis_parts.append(f"- {pair[0]} & {pair[1]}: {value:.2f}")
+    for pair, value in neg_corr.head(num_pairs_to_report).items(): analysis_parts.append(f"- {pair[0]} & {pair[1]}: {corrs.estimate(*pair):.2f}")
 
     analysis_parts.append("\nHow to read this chart:"); analysis_parts.append("- Lines crossing between two axes (an 'X' shape) suggest a negative correlation."); analysis_parts.append("- Lines remaining parallel between two axes suggest a positive correlation.")
     analysis_text = "\n".join(analysis_parts)
@@ -600,7 +645,7 @@ def _generate_parallel_coordinates(df, column_config, hypertune_params): # ADDED
     dimensions = []
     for col in numerical_df.columns:
         lower, upper = _get_dynamic_range(df[col])
-        dim = dict(label=col, values=df[col].tolist())
+        dim = dict(label=col, values=df[col].to_numpy())
         if lower is not None and upper is not None:
              dim['range'] = [lower, upper]
         dimensions.append(dim)
@@ -609,17 +654,17 @@ def _generate_parallel_coordinates(df, column_config, hypertune_params): # ADDED
     fig = _apply_plotly_hypertune(fig, 'parallel_coordinates', hypertune_params)
     fig.update_layout(title_text="Parallel Coordinates Plot of Selected Variables", template="plotly_white", font_family="Inter", title_font_family="Inter")
 
-    return {"chart_data": json.loads(fig.to_json()), "analysis_text": analysis_text}
+    return {"chart_data": figure_serialization.figure_to_payload(fig, hypertune_params), "analysis_text": analysis_text}
 
-def _generate_sunburst_chart(df, column_config, hypertune_params): # ADDED hypertune_params
+def _generate_sunburst_chart(df, column_config, hypertune_params, context=None): # ADDED hypertune_params
     path_cols = column_config.get("path"); values_col = column_config.get("values")
     if not path_cols or not isinstance(path_cols, list) or len(path_cols) < 2: raise ValueError("Sunburst Chart requires at least two categorical columns for the hierarchy path.")
     if not values_col or not isinstance(values_col, str): raise ValueError("Sunburst Chart requires one numerical column for the values.")
 
     for col in path_cols:
-        col_type = _get_column_type(df, col);
+        col_type = _get_column_type(df, col, context);
         if col_type != 'categorical': raise ValueError(f"Path columns must be categorical. '{col}' is {col_type}.")
-    val_type = _get_column_type(df, values_col);
+    val_type = _get_column_type(df, values_col, context);
     if val_type != 'numerical': raise ValueError(f"Values column must be numerical. '{values_col}' is {val_type}.")
 
     all_selected_cols = path_cols + [values_col]; analysis_df = df[all_selected_cols].dropna(); missing_rows_dropped = len(df) - len(analysis_df)
@@ -629,7 +674,7 @@ def _generate_sunburst_chart(df, column_config, hypertune_params): # ADDED hyper
     if missing_rows_dropped > 0: analysis_parts.append(f"Note: {missing_rows_dropped} rows with missing data in these columns were excluded from the analysis.")
 
     try:
-        top_level_col = path_cols[0]; top_level_groups = analysis_df.groupby(top_level_col)[values_col].sum(); total_value = top_level_groups.sum()
+        top_level_col = path_cols[0]; top_level_groups = _get_analytics(context).group_sums(analysis_df, top_level_col, values_col); total_value = top_level_groups.sum()
         if total_value > 0 and not top_level_groups.empty:
             top_category_name = top_level_groups.idxmax(); top_category_value = top_level_groups.max(); top_category_percent = top_level_groups.max() / total_value
             analysis_parts.append(f"\nTop-Level Breakdown ('{top_level_col}'):"); analysis_parts.append(f"- The largest category is '{top_category_name}', accounting for {top_category_value:,.2f} ({top_category_percent:.1%}) of the total.")
@@ -648,17 +693,17 @@ def _generate_sunburst_chart(df, column_config, hypertune_params): # ADDED hyper
     fig = _apply_plotly_hypertune(fig, 'sunburst_chart', hypertune_params)
     fig.update_layout(font_family="Inter", title_font_family="Inter")
 
-    return {"chart_data": json.loads(fig.to_json()), "analysis_text": analysis_text}
+    return {"chart_data": figure_serialization.figure_to_payload(fig, hypertune_params), "analysis_text": analysis_text}
 
-def _generate_treemap(df, column_config, hypertune_params): # ADDED hypertune_params
+def _generate_treemap(df, column_config, hypertune_params, context=None): # ADDED hypertune_params
     path_cols = column_config.get("path"); values_col = column_config.get("values")
     if not path_cols or not isinstance(path_cols, list) or len(path_cols) < 2: raise ValueError("Treemap requires at least two categorical columns for the hierarchy path.")
     if not values_col or not isinstance(values_col, str): raise ValueError("Treemap requires one numerical column for the values.")
 
     for col in path_cols:
-        col_type = _get_column_type(df, col);
+        col_type = _get_column_type(df, col, context);
         if col_type != 'categorical': raise ValueError(f"Path columns must be categorical. '{col}' is {col_type}.")
-    val_type = _get_column_type(df, values_col);
+    val_type = _get_column_type(df, values_col, context);
     if val_type != 'numerical': raise ValueError(f"Values column must be numerical. '{values_col}' is {val_type}.")
 
     all_selected_cols = path_cols + [values_col]; analysis_df = df[all_selected_cols].dropna(); missing_rows_dropped = len(df) - len(analysis_df)
@@ -668,7 +713,7 @@ def _generate_treemap(df, column_config, hypertune_params): # ADDED hypertune_pa
     if missing_rows_dropped > 0: analysis_parts.append(f"Note: {missing_rows_dropped} rows with missing data in these columns were excluded from the analysis.")
 
     try:
-        top_level_col = path_cols[0]; top_level_groups = analysis_df.groupby(top_level_col)[values_col].sum(); total_value = top_level_groups.sum()
+        top_level_col = path_cols[0]; top_level_groups = _get_analytics(context).group_sums(analysis_df, top_level_col, values_col); total_value = top_level_groups.sum()
         if total_value > 0 and not top_level_groups.empty:
             top_category_name = top_level_groups.idxmax(); top_category_value = top_level_groups.max(); top_category_percent = top_level_groups.max() / total_value
             analysis_parts.append(f"\nTop-Level Breakdown ('{top_level_col}'):"); analysis_parts.append(f"- The largest category is '{top_category_name}', accounting for {top_category_value:,.2f} ({top_category_percent:.1%}) of the total.")
@@ -687,17 +732,18 @@ def _generate_treemap(df, column_config, hypertune_params): # ADDED hypertune_pa
     fig = _apply_plotly_hypertune(fig, 'treemap', hypertune_params)
     fig.update_layout(font_family="Inter", title_font_family="Inter")
 
-    return {"chart_data": json.loads(fig.to_json()), "analysis_text": analysis_text}
+    return {"chart_data": figure_serialization.figure_to_payload(fig, hypertune_params), "analysis_text": analysis_text}
 
-def _generate_line_chart(df, column_config, hypertune_params): # ADDED hypertune_params
-    x_col_num = column_config.get("x_axis"); y_col_num = column_config.get("y_axis"); time_col = column_config.get("time_axis")
+def _generate_line_chart(df, column_config, hypertune_params, context=None): # ADDED hypertune_params
+    x_col_num = column_config.get("x_axis"); y_col_num = column_config.get("y_axis"); time_col = column_config.get("time_axis"); color_col = column_config.get("color")
     true_x = None; true_y = None; analysis_parts = []; is_time_series = False
+    if color_col and _get_column_type(df, color_col, context) != 'categorical': raise ValueError(f"The 'Color' column ('{color_col}') must be categorical.")
 
     if time_col:
         true_x = time_col; true_y = y_col_num if y_col_num else x_col_num; is_time_series = True
         if not true_y: raise ValueError("Please select one numerical column (X-Axis or Y-Axis) to plot against the Time Axis.")
-        if _get_column_type(df, true_x) != 'temporal': raise ValueError(f"Time Axis column must be temporal. '{true_x}' is not.")
-        if _get_column_type(df, true_y) != 'numerical': raise ValueError(f"Y-Axis column must be numerical. '{true_y}' is not.")
+        if _get_column_type(df, true_x, context) != 'temporal': raise ValueError(f"Time Axis column must be temporal. '{true_x}' is not.")
+        if _get_column_type(df, true_y, context) != 'numerical': raise ValueError(f"Y-Axis column must be numerical. '{true_y}' is not.")
         try:
             df[true_x] = pd.to_datetime(df[true_x]); df = df.sort_values(by=true_x)
         except Exception:
@@ -705,8 +751,8 @@ def _generate_line_chart(df, column_config, hypertune_params): # ADDED hypertune
         analysis_parts.append(f"Line chart showing trend of '{true_y}' over '{true_x}'.")
     elif x_col_num and y_col_num:
         true_x = x_col_num; true_y = y_col_num; is_time_series = False
-        if _get_column_type(df, true_x) != 'numerical': raise ValueError(f"X-Axis column must be numerical. '{true_x}' is not.")
-        if _get_column_type(df, true_y) != 'numerical': raise ValueError(f"Y-Axis column must be numerical. '{true_y}' is not.")
+        if _get_column_type(df, true_x, context) != 'numerical': raise ValueError(f"X-Axis column must be numerical. '{true_x}' is not.")
+        if _get_column_type(df, true_y, context) != 'numerical': raise ValueError(f"Y-Axis column must be numerical. '{true_y}' is not.")
         analysis_parts.append(f"Line chart showing relationship between '{true_x}' and '{true_y}'.")
     else: raise ValueError("Invalid column combination. Line Chart requires either (Time Axis and one Numerical Axis) or (two Numerical Axes).")
 
@@ -720,31 +766,36 @@ def _generate_line_chart(df, column_config, hypertune_params): # ADDED hypertune
         analysis_parts.append("\nKey Points:"); analysis_parts.append(f"- Highest value: {max_val:,.2f} (occurred at {true_x} = {x_at_max})"); analysis_parts.append(f"- Lowest value: {min_val:,.2f} (occurred at {true_x} = {x_at_min})")
     except Exception: analysis_parts.append("\n- Could not determine min/max points.")
 
+    plot_df = df; time_bucket = None
     if is_time_series:
+        # Aggregate into calendar buckets so long/fine-grained series stay within the point budget
+        plot_df, time_bucket = timeseries.resample(df, true_x, true_y, hypertune_params, color_col)
         first_val = analysis_df[true_y].iloc[0]; last_val = analysis_df[true_y].iloc[-1];
         if last_val > first_val: trend = "a generally increasing trend"
         elif last_val < first_val: trend = "a generally decreasing trend"
         else: trend = "a relatively stable/flat trend"
         analysis_parts.append(f"\n- The data shows {trend} from start to end.")
+        if timeseries.describe(time_bucket): analysis_parts.append(timeseries.describe(time_bucket))
         analysis_parts.append("\nVisual Inspection:"); analysis_parts.append("- Look for repeating cycles (seasonality).")
     else:
-        try:
-            corr, p_val = stats.pearsonr(analysis_df[true_x], analysis_df[true_y]); interpretation = _interpret_correlation(corr)
+        corr, p_val, _ = _get_correlations(df, [true_x, true_y], context).pair(true_x, true_y)
+        if pd.notna(corr):
+            interpretation = _interpret_correlation(corr)
             analysis_parts.append(f"\nCorrelation (r): {corr:.2f}"); analysis_parts.append(f"- This indicates {interpretation}.")
             if p_val < 0.05: analysis_parts.append(f"- The relationship is statistically significant (p-value: {p_val:.3g}).")
             else: analysis_parts.append(f"- The relationship is not statistically significant (p-value: {p_val:.3g}).")
-        except ValueError: analysis_parts.append("\n- Could not calculate Pearson correlation (likely due to constant data).")
+        else: analysis_parts.append("\n- Could not calculate Pearson correlation (likely due to constant data).")
         analysis_parts.append("\nVisual Inspection:"); analysis_parts.append("- Look for non-linear patterns (e.g., a curve) that correlation doesn't capture.")
 
     analysis_text = "\n".join(analysis_parts)
 
     # --- Dynamic Scaling for Line Chart ---
-    y_lower, y_upper = _get_dynamic_range(df[true_y])
+    y_lower, y_upper = _get_dynamic_range(plot_df[true_y])
 
     color_palette = hypertune_params.get('color_palette')
 
     fig = px.line(
-        df, x=true_x, y=true_y, title=f"Line Chart: {true_y} vs. {true_x}", template="plotly_white",
+        plot_df, x=true_x, y=true_y, color=color_col, title=f"Line Chart: {true_y} vs. {true_x}", template="plotly_white",
         color_discrete_sequence=px.colors.named_colorscales[color_palette] if color_palette and color_palette != 'plotly' and color_palette in px.colors.named_colorscales else None
     )
 
@@ -754,17 +805,20 @@ def _generate_line_chart(df, column_config, hypertune_params): # ADDED hypertune
     fig = _apply_plotly_hypertune(fig, 'line_chart', hypertune_params)
     fig.update_layout(font_family="Inter", title_font_family="Inter")
 
-    return {"chart_data": json.loads(fig.to_json()), "analysis_text": analysis_text}
+    result = {"chart_data": figure_serialization.figure_to_payload(fig, hypertune_params), "analysis_text": analysis_text}
+    if time_bucket: result["time_bucket"] = time_bucket
+    return result
 
-def _generate_area_chart(df, column_config, hypertune_params): # ADDED hypertune_params
-    x_col_num = column_config.get("x_axis"); y_col_num = column_config.get("y_axis"); time_col = column_config.get("time_axis")
+def _generate_area_chart(df, column_config, hypertune_params, context=None): # ADDED hypertune_params
+    x_col_num = column_config.get("x_axis"); y_col_num = column_config.get("y_axis"); time_col = column_config.get("time_axis"); color_col = column_config.get("color")
     true_x = None; true_y = None; analysis_parts = []; is_time_series = False
+    if color_col and _get_column_type(df, color_col, context) != 'categorical': raise ValueError(f"The 'Color' column ('{color_col}') must be categorical.")
 
     if time_col:
         true_x = time_col; true_y = y_col_num if y_col_num else x_col_num; is_time_series = True
         if not true_y: raise ValueError("Please select one numerical column (X-Axis or Y-Axis) to plot against the Time Axis.")
-        if _get_column_type(df, true_x) != 'temporal': raise ValueError(f"Time Axis column must be temporal. '{true_x}' is not.")
-        if _get_column_type(df, true_y) != 'numerical': raise ValueError(f"Y-Axis column must be numerical. '{true_y}' is not.")
+        if _get_column_type(df, true_x, context) != 'temporal': raise ValueError(f"Time Axis column must be temporal. '{true_x}' is not.")
+        if _get_column_type(df, true_y, context) != 'numerical': raise ValueError(f"Y-Axis column must be numerical. '{true_y}' is not.")
         try:
             df[true_x] = pd.to_datetime(df[true_x]); df = df.sort_values(by=true_x)
         except Exception:
@@ -772,8 +826,8 @@ def _generate_area_chart(df, column_config, hypertune_params): # ADDED hypertune
         analysis_parts.append(f"Area chart showing the cumulative trend of '{true_y}' over '{true_x}'.")
     elif x_col_num and y_col_num:
         true_x = x_col_num; true_y = y_col_num; is_time_series = False
-        if _get_column_type(df, true_x) != 'numerical': raise ValueError(f"X-Axis column must be numerical. '{true_x}' is not.")
-        if _get_column_type(df, true_y) != 'numerical': raise ValueError(f"Y-Axis column must be numerical. '{true_y}' is not.")
+        if _get_column_type(df, true_x, context) != 'numerical': raise ValueError(f"X-Axis column must be numerical. '{true_x}' is not.")
+        if _get_column_type(df, true_y, context) != 'numerical': raise ValueError(f"Y-Axis column must be numerical. '{true_y}' is not.")
         analysis_parts.append(f"Area chart showing the relationship between '{true_x}' and '{true_y}'.")
     else: raise ValueError("Invalid column combination. Area Chart requires either (Time Axis and one Numerical Axis) or (two Numerical Axes).")
 
@@ -787,31 +841,36 @@ def _generate_area_chart(df, column_config, hypertune_params): # ADDED hypertune
         analysis_parts.append("\nKey Points:"); analysis_parts.append(f"- Highest value: {max_val:,.2f} (occurred at {true_x} = {x_at_max})"); analysis_parts.append(f"- Lowest value: {min_val:,.2f} (occurred at {true_x} = {x_at_min})")
     except Exception: analysis_parts.append("\n- Could not determine min/max points.")
 
+    plot_df = df; time_bucket = None
     if is_time_series:
+        # Aggregate into calendar buckets so long/fine-grained series stay within the point budget
+        plot_df, time_bucket = timeseries.resample(df, true_x, true_y, hypertune_params, color_col)
         first_val = analysis_df[true_y].iloc[0]; last_val = analysis_df[true_y].iloc[-1];
         if last_val > first_val: trend = "a generally increasing trend"
         elif last_val < first_val: trend = "a generally decreasing trend"
         else: trend = "a relatively stable/flat trend"
         analysis_parts.append(f"\n- The data shows {trend} from start to end.")
+        if timeseries.describe(time_bucket): analysis_parts.append(timeseries.describe(time_bucket))
         analysis_parts.append("\nHow to read this chart:"); analysis_parts.append("- The shaded area visualizes the total volume or magnitude over time.")
     else:
-        try:
-            corr, p_val = stats.pearsonr(analysis_df[true_x], analysis_df[true_y]); interpretation = _interpret_correlation(corr)
+        corr, p_val, _ = _get_correlations(df, [true_x, true_y], context).pair(true_x, true_y)
+        if pd.notna(corr):
+            interpretation = _interpret_correlation(corr)
             analysis_parts.append(f"\nCorrelation (r): {corr:.2f}"); analysis_parts.append(f"- This indicates {interpretation}.")
             if p_val < 0.05: analysis_parts.append(f"- The relationship is statistically significant (p-value: {p_val:.3g}).")
             else: analysis_parts.append(f"- The relationship is not statistically significant (p-value: {p_val:.3g}).")
-        except ValueError: analysis_parts.append("\n- Could not calculate Pearson correlation (likely due to constant data).")
+        else: analysis_parts.append("\n- Could not calculate Pearson correlation (likely due to constant data).")
         analysis_parts.append("\nHow to read this chart:"); analysis_parts.append(f"- The shaded area helps visualize the magnitude of '{true_y}' relative to '{true_x}'.")
 
     analysis_text = "\n".join(analysis_parts)
 
     # --- Dynamic Scaling for Area Chart ---
-    y_lower, y_upper = _get_dynamic_range(df[true_y])
+    y_lower, y_upper = _get_dynamic_range(plot_df[true_y])
 
     color_palette = hypertune_params.get('color_palette')
 
     fig = px.area(
-        df, x=true_x, y=true_y, title=f"Area Chart: {true_y} vs. {true_x}", template="plotly_white",
+        plot_df, x=true_x, y=true_y, color=color_col, title=f"Area Chart: {true_y} vs. {true_x}", template="plotly_white",
         color_discrete_sequence=px.colors.named_colorscales[color_palette] if color_palette and color_palette != 'plotly' and color_palette in px.colors.named_colorscales else None
     )
 
@@ -821,13 +880,15 @@ def _generate_area_chart(df, column_config, hypertune_params): # ADDED hypertune
     fig = _apply_plotly_hypertune(fig, 'area_chart', hypertune_params)
     fig.update_layout(font_family="Inter", title_font_family="Inter")
 
-    return {"chart_data": json.loads(fig.to_json()), "analysis_text": analysis_text}
+    result = {"chart_data": figure_serialization.figure_to_payload(fig, hypertune_params), "analysis_text": analysis_text}
+    if time_bucket: result["time_bucket"] = time_bucket
+    return result
 
-def _generate_bar_chart(df, column_config, hypertune_params): # ADDED hypertune_params
+def _generate_bar_chart(df, column_config, hypertune_params, context=None): # ADDED hypertune_params
     x_col = column_config.get("x_axis"); y_col = column_config.get("y_axis")
     if not x_col or not y_col: raise ValueError("Bar Chart requires both an X-Axis and a Y-Axis to be selected.")
     if df[x_col].isnull().any() or df[y_col].isnull().any(): raise ValueError(f"Plotting failed. One or both of your selected columns ('{x_col}', '{y_col}') contain missing values. Please clean them first.")
-    x_type = _get_column_type(df, x_col); y_type = _get_column_type(df, y_col); orientation = 'v'; category_col = None; value_col = None
+    x_type = _get_column_type(df, x_col, context); y_type = _get_column_type(df, y_col, context); orientation = 'v'; category_col = None; value_col = None
 
     if x_type == 'numerical' and (y_type == 'categorical' or y_type == 'temporal'): orientation = 'h'; value_col = x_col; category_col = y_col
     elif (x_type == 'categorical' or x_type == 'temporal') and y_type == 'numerical': orientation = 'v'; value_col = y_col; category_col = x_col
@@ -841,7 +902,7 @@ def _generate_bar_chart(df, column_config, hypertune_params): # ADDED hypertune_
         # FIX: Explicitly convert value column to numeric before aggregation
         analysis_df[value_col] = pd.to_numeric(analysis_df[value_col], errors='coerce').fillna(0)
 
-        grouped_data = analysis_df.groupby(category_col)[value_col].sum().sort_values(ascending=False);
+        grouped_data = _get_analytics(context).group_sums(analysis_df, category_col, value_col).sort_values(ascending=False);
         if not grouped_data.empty:
             num_categories = len(grouped_data); num_to_report = min(3, num_categories); overall_mean = grouped_data.mean()
             analysis_parts.append(f"\n- The average sum per category is {overall_mean:,.2f}.")
@@ -876,13 +937,13 @@ def _generate_bar_chart(df, column_config, hypertune_params): # ADDED hypertune_
     fig = _apply_plotly_hypertune(fig, 'bar_chart', hypertune_params, x_col=x_col, y_col=y_col)
     fig.update_layout(font_family="Inter", title_font_family="Inter")
 
-    return {"chart_data": json.loads(fig.to_json()), "analysis_text": analysis_text}
+    return {"chart_data": figure_serialization.figure_to_payload(fig, hypertune_params), "analysis_text": analysis_text}
 
-def _generate_violin_plot(df, column_config, hypertune_params): # ADDED hypertune_params
+def _generate_violin_plot(df, column_config, hypertune_params, context=None): # ADDED hypertune_params
     x_col = column_config.get("x_axis"); y_col = column_config.get("y_axis")
     if not x_col or not y_col: raise ValueError("Violin Plot requires both an X-Axis and a Y-Axis to be selected.")
     if df[x_col].isnull().any() or df[y_col].isnull().any(): raise ValueError(f"Plotting failed. One or both of your selected columns ('{x_col}', '{y_col}') contain missing values. Please clean them first.")
-    x_type = _get_column_type(df, x_col); y_type = _get_column_type(df, y_col); orientation = 'v'; category_col = None; value_col = None
+    x_type = _get_column_type(df, x_col, context); y_type = _get_column_type(df, y_col, context); orientation = 'v'; category_col = None; value_col = None
 
     if x_type == 'numerical' and y_type == 'categorical': orientation = 'h'; value_col = x_col; category_col = y_col
     elif x_type == 'categorical' and y_type == 'numerical': orientation = 'v'; value_col = y_col; category_col = x_col
@@ -931,12 +992,12 @@ def _generate_violin_plot(df, column_config, hypertune_params): # ADDED hypertun
     fig = _apply_plotly_hypertune(fig, 'violin_plot', hypertune_params, x_col=x_col, y_col=y_col)
     fig.update_layout(font_family="Inter", title_font_family="Inter")
 
-    return {"chart_data": json.loads(fig.to_json()), "analysis_text": analysis_text}
+    return {"chart_data": figure_serialization.figure_to_payload(fig, hypertune_params), "analysis_text": analysis_text}
 
-def _generate_density_plot(df, column_config, hypertune_params): # ADDED hypertune_params
+def _generate_density_plot(df, column_config, hypertune_params, context=None): # ADDED hypertune_params
     x_col = column_config.get("x_axis"); y_col = column_config.get("y_axis")
     if not x_col or not y_col: raise ValueError("2D Density Plot requires both an X-Axis and a Y-Axis to be selected.")
-    x_type = _get_column_type(df, x_col); y_type = _get_column_type(df, y_col)
+    x_type = _get_column_type(df, x_col, context); y_type = _get_column_type(df, y_col, context)
     if x_type != 'numerical' or y_type != 'numerical': raise ValueError(f"2D Density Plot requires two numerical columns. '{x_col}' is {x_type} and '{y_col}' is {y_type}.")
 
     analysis_df = df[[x_col, y_col]].dropna()
@@ -944,12 +1005,13 @@ def _generate_density_plot(df, column_config, hypertune_params): # ADDED hypertu
     if len(analysis_df) < 2: raise ValueError("Not enough common valid data points to calculate correlation.")
 
     analysis_parts = [f"2D Density plot showing the concentration of data points between '{x_col}' and '{y_col}'."];
-    try:
-        corr, p_val = stats.pearsonr(analysis_df[x_col], analysis_df[y_col]); analysis_parts.append(f"\nPearson Correlation (r): {corr:.2f}")
+    corr, p_val, _ = _get_correlations(df, [x_col, y_col], context).pair(x_col, y_col)
+    if pd.notna(corr):
+        analysis_parts.append(f"\nPearson Correlation (r): {corr:.2f}")
         interpretation = _interpret_correlation(corr); analysis_parts.append(f"- This value indicates {interpretation}.")
         if p_val < 0.05: analysis_parts.append(f"- The relationship is statistically significant (p-value: {p_val:.3g}).")
         else: analysis_parts.append(f"- The relationship is not statistically significant (p-value: {p_val:.3g}).")
-    except ValueError: analysis_parts.append("\n- Could not calculate Pearson correlation (likely due to constant data).")
+    else: analysis_parts.append("\n- Could not calculate Pearson correlation (likely due to constant data).")
     analysis_parts.append("\nHow to read this chart:"); analysis_parts.append("- The darkest areas show the highest concentration of data points."); analysis_parts.append("- Look for multiple 'peaks' (dark areas) which may indicate distinct clusters.")
     analysis_text = "\n".join(analysis_parts)
 
@@ -957,14 +1019,14 @@ def _generate_density_plot(df, column_config, hypertune_params): # ADDED hypertu
 
     custom_title = hypertune_params.get('custom_title')
     plt.title(custom_title if custom_title else f"2D Density Plot: {y_col} vs. {x_col}"); plt.tight_layout()
-    buf = io.BytesIO(); plt.savefig(buf, format='png'); buf.seek(0); image_base64 = base64.b64encode(buf.read()).decode('utf-8'); plt.close()
+    image_fields = image_cache.figure_to_image_payload(plt.gcf(), hypertune_params, _get_project_id(context))
 
-    return {"chart_data": f"data:image/png;base64,{image_base64}", "analysis_text": analysis_text}
+    return {**image_fields, "analysis_text": analysis_text}
 
-def _generate_hexbin_plot(df, column_config, hypertune_params): # ADDED hypertune_params
+def _generate_hexbin_plot(df, column_config, hypertune_params, context=None): # ADDED hypertune_params
     x_col = column_config.get("x_axis"); y_col = column_config.get("y_axis")
     if not x_col or not y_col: raise ValueError("Hexbin Plot requires both an X-Axis and a Y-Axis to be selected.")
-    x_type = _get_column_type(df, x_col); y_type = _get_column_type(df, y_col)
+    x_type = _get_column_type(df, x_col, context); y_type = _get_column_type(df, y_col, context)
     if x_type != 'numerical' or y_type != 'numerical': raise ValueError(f"Hexbin Plot requires two numerical columns. '{x_col}' is {x_type} and '{y_col}' is {y_type}.")
 
     analysis_df = df[[x_col, y_col]].dropna()
@@ -972,12 +1034,13 @@ def _generate_hexbin_plot(df, column_config, hypertune_params): # ADDED hypertun
     if len(analysis_df) < 2: raise ValueError("Not enough common valid data points to calculate correlation.")
 
     analysis_parts = [f"Hexbin plot showing the density of data points between '{x_col}' and '{y_col}'. This plot is ideal for large datasets where a scatter plot would be overcrowded."];
-    try:
-        corr, p_val = stats.pearsonr(analysis_df[x_col], analysis_df[y_col]); analysis_parts.append(f"\nPearson Correlation (r): {corr:.2f}")
+    corr, p_val, _ = _get_correlations(df, [x_col, y_col], context).pair(x_col, y_col)
+    if pd.notna(corr):
+        analysis_parts.append(f"\nPearson Correlation (r): {corr:.2f}")
         interpretation = _interpret_correlation(corr); analysis_parts.append(f"- This value indicates {interpretation}.")
         if p_val < 0.05: analysis_parts.append(f"- The relationship is statistically significant (p-value: {p_val:.3g}).")
         else: analysis_parts.append(f"- The relationship is not statistically significant (p-value: {p_val:.3g}).")
-    except ValueError: analysis_parts.append("\n- Could not calculate Pearson correlation (likely due to constant data).")
+    else: analysis_parts.append("\n- Could not calculate Pearson correlation (likely due to constant data).")
     analysis_parts.append("\nHow to read this chart:"); analysis_parts.append("- The color (from blue to yellow) shows the number of data points that fall inside each hexagon."); analysis_parts.append("- Brighter/hotter colors (yellow) represent a high concentration of data points.")
     analysis_text = "\n".join(analysis_parts)
 
@@ -991,11 +1054,11 @@ def _generate_hexbin_plot(df, column_config, hypertune_params): # ADDED hypertun
     custom_title = hypertune_params.get('custom_title')
     plt.title(custom_title if custom_title else f"Hexbin Plot: {y_col} vs. {x_col}"); plt.tight_layout()
 
-    buf = io.BytesIO(); plt.savefig(buf, format='png'); buf.seek(0); image_base64 = base64.b64encode(buf.read()).decode('utf-8'); plt.close()
+    image_fields = image_cache.figure_to_image_payload(plt.gcf(), hypertune_params, _get_project_id(context))
 
-    return {"chart_data": f"data:image/png;base64,{image_base64}", "analysis_text": analysis_text}
+    return {**image_fields, "analysis_text": analysis_text}
 
-def _generate_stacked_bar_chart(df, column_config, hypertune_params): # ADDED hypertune_params
+def _generate_stacked_bar_chart(df, column_config, hypertune_params, context=None): # ADDED hypertune_params
     x_col = column_config.get("x_axis"); y_col = column_config.get("y_axis"); color_col = column_config.get("color")
     if not x_col or not y_col: raise ValueError("Stacked Bar Chart requires both an X-Axis and a Y-Axis to be selected.")
     if df[x_col].isnull().any() or df[y_col].isnull().any(): raise ValueError(f"Plotting failed. One or both of your selected columns ('{x_col}', '{y_col}') contain missing values. Please clean them first.")
@@ -1005,19 +1068,19 @@ def _generate_stacked_bar_chart(df, column_config, hypertune_params): # ADDED hy
     analysis_df = df[required_cols].dropna()
     if analysis_df.empty: raise ValueError(f"Plotting failed. No valid data remains after removing missing values from selected columns.")
 
-    x_type = _get_column_type(df, x_col); y_type = _get_column_type(df, y_col); orientation = 'v'; category_col = None; value_col = None
+    x_type = _get_column_type(df, x_col, context); y_type = _get_column_type(df, y_col, context); orientation = 'v'; category_col = None; value_col = None
 
     if x_type == 'numerical' and (y_type == 'categorical' or y_type == 'temporal'): orientation = 'h'; value_col = x_col; category_col = y_col
     elif (x_type == 'categorical' or x_type == 'temporal') and y_type == 'numerical': orientation = 'v'; value_col = y_col; category_col = x_col
     else: raise ValueError(f"Invalid column combination for Stacked Bar Chart: {x_type} vs {y_type}. Requires one categorical/temporal and one numerical column.")
-    if color_col and _get_column_type(df, color_col) != 'categorical': raise ValueError(f"The 'Color/Stack By' column ('{color_col}') must be categorical.")
+    if color_col and _get_column_type(df, color_col, context) != 'categorical': raise ValueError(f"The 'Color/Stack By' column ('{color_col}') must be categorical.")
 
     num_to_report = 3; analysis_parts = [f"Stacked bar chart showing the total (sum) of '{value_col}' aggregated by '{category_col}'."];
     if color_col: analysis_parts[0] += f" Segments are stacked by '{color_col}'."
     try:
         analysis_df[value_col] = pd.to_numeric(analysis_df[value_col], errors='coerce').fillna(0)
 
-        total_groups = analysis_df.groupby(category_col)[value_col].sum().sort_values(ascending=False)
+        total_groups = _get_analytics(context).group_sums(analysis_df, category_col, value_col).sort_values(ascending=False)
         if not total_groups.empty:
             num_categories = len(total_groups); num_to_report_main = min(num_to_report, num_categories);
             analysis_parts.append(f"\nTop {num_to_report_main} Categories (by Total Sum):")
@@ -1050,8 +1113,99 @@ def _generate_stacked_bar_chart(df, column_config, hypertune_params): # ADDED hy
     fig = _apply_plotly_hypertune(fig, 'stacked_bar_chart', hypertune_params, x_col=x_col, y_col=y_col)
     fig.update_layout(font_family="Inter", title_font_family="Inter")
 
-    return {"chart_data": json.loads(fig.to_json()), "analysis_text": analysis_text}
-
+    return {"chart_data": figure_serialization.figure_to_payload(fig, hypertune_params), "analysis_text": analysis_text}
+
+
+# --- Map chart type to generator function ---
+chart_generator_map = {
+    'histogram': _generate_histogram,
+    'kde_plot': _generate_kde_plot,
+    'count_plot': _generate_count_plot,
+    'pie_chart': _generate_pie_chart,
+    'pie_chart_3d': _generate_pie_chart_3d,
+    'scatter': _generate_scatter_plot,
+    'line_chart': _generate_line_chart,
+    'area_chart': _generate_area_chart,
+    'bar_chart': _generate_bar_chart,
+    'stacked_bar_chart': _generate_stacked_bar_chart,
+    'violin_plot': _generate_violin_plot,
+    'density_plot': _generate_density_plot,
+    'hexbin_plot': _generate_hexbin_plot,
+    'heatmap': _generate_correlation_heatmap,
+    'pair_plot': _generate_pair_plot,
+    'bubble_chart': _generate_bubble_chart,
+    'scatter_3d': _generate_scatter_3d,
+    'parallel_coordinates': _generate_parallel_coordinates,
+    'sunburst_chart': _generate_sunburst_chart,
+    'treemap': _generate_treemap,
+    'rug_plot': _generate_rug_plot
+}
+
+# Chart types drawn with matplotlib/seaborn. pyplot keeps global state, so
+# these are rendered one at a time (requests and background jobs alike).
+MATPLOTLIB_CHART_TYPES = {
+    'kde_plot', 'count_plot', 'rug_plot', 'scatter', 'heatmap', 'pair_plot', 'density_plot', 'hexbin_plot',
+}
+
+def _run_chart_generator(chart_type, df, columns, hypertune_params, context, build_absolute_uri):
+    """Runs one chart generator and finalizes its result for the API response."""
+    chart_generator = chart_generator_map[chart_type]
+    with timing.span('chart'):
+        if chart_type in MATPLOTLIB_CHART_TYPES:
+            with image_cache.render_slot():
+                result = chart_generator(df, columns, hypertune_params, context)
+        else:
+            result = chart_generator(df, columns, hypertune_params, context)
+    analytics = _get_analytics(context)
+    if analytics.approximate:
+        note = analytics.summary_line()
+        if note and result.get('analysis_text'):
+            result['analysis_text'] += note
+        result['analytics'] = analytics.report()
+    if result.get('chart_image'):
+        # Cached image delivery: hand the client an absolute, cacheable URL.
+        result['chart_image']['url'] = build_absolute_uri(result['chart_image']['url'])
+        result['chart_data'] = result['chart_image']['url']
+    return result
+
+def _make_context(project, filters, variant, hypertune_params, seed):
+    analytics = approximate.Analytics.from_params(hypertune_params, random_state=seed)
+    return ChartContext(project=project, filters=filters, variant=variant, analytics=analytics, seed=seed,
+                        column_types=column_types.ColumnTypes.from_metadata(project.metadata_json))
+
+def _request_seed(project, request_fingerprint, hypertune_params):
+    """The client's hypertune_params['seed'], or one derived from the project version and request fingerprint."""
+    seed = hypertune_params.get('seed')
+    if seed not in (None, ''):
+        try:
+            return int(seed)
+        except (TypeError, ValueError):
+            raise ValueError("seed must be an integer.")
+    return sampling.derive_seed(project.id, helpers.get_project_version(project), request_fingerprint)
+
+def _chart_cache_key(project, request_fingerprint, seed):
+    return f"chart:{project.id}:{helpers.get_project_version(project)}:{request_fingerprint}:{seed}"
+
+def _get_preview_rows(value):
+    """Sample size of a progressive preview: the request's preview_rows (a positive integer) or the setting."""
+    if value in (None, ''):
+        return getattr(settings, 'PROGRESSIVE_PREVIEW_ROWS', 20000)
+    try:
+        preview_rows = int(value)
+    except (TypeError, ValueError):
+        preview_rows = 0
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer() or preview_rows < 1:
+        raise ValueError("preview_rows must be a positive integer.")
+    return preview_rows
+
+def _mapped_columns(column_config):
+    """Flattens a column mapping ({'x_axis': 'a', 'path': ['b', 'c']}) into a list of column names."""
+    names = []
+    for value in column_config.values():
+        for name in (value if isinstance(value, list) else [value]):
+            if isinstance(name, str) and name not in names:
+                names.append(name)
+    return names
 
 # --- Main API View ---
 
@@ -1062,6 +1216,8 @@ class GenerateChartView(APIView):
         project_id = request.data.get('project_id')
         chart_type = request.data.get('chart_type')
         columns = request.data.get('columns') # Column mapping from frontend
+        if chart_type in chart_generator_map:
+            metrics.annotate_request(chart_type=chart_type) # Latency histogram label (api/metrics.py)
 
         # --- Extract Hyper-Tuning Parameters ---
         hypertune_params = request.data.get('hypertune_params', {})
@@ -1069,14 +1225,46 @@ class GenerateChartView(APIView):
         # --- *** NEW: Extract Filters *** ---
         filters = request.data.get('filters', {}) # Get filters from request, default to empty dict
 
+        # Progressive rendering: return a sampled preview first, the exact chart via a job handle
+        progressive = request.data.get('progressive') in (True, 'true', 'True', '1', 1)
+
+        # 'full' (default) reads all rows, 'sample' the project's stored stratified sample
+        try:
+            resolution = sampling.get_resolution(request.data.get('resolution'))
+            approximate.Analytics.from_params(hypertune_params) # Validate analytics options up front
+            timeseries.get_resample_options(hypertune_params) # ... and the time-series bucketing options
+            image_cache.get_image_options(hypertune_params) # ... and the image format, dpi and delivery
+            figure_serialization.get_float_precision(hypertune_params) # ... and the Plotly payload precision
+            preview_rows = _get_preview_rows(request.data.get('preview_rows'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         try:
             project = DataProject.objects.get(id=project_id, owner=request.user)
-            df = pd.read_pickle(os.path.join(settings.MEDIA_ROOT, project.data_file.name))
+
+            # --- Reproducible results: seeded randomness + chart cache ---
+            # Identical requests on the same project version get the same seed, hence the same result.
+            request_fingerprint = sampling.request_fingerprint(
+                chart_type, columns, {k: v for k, v in hypertune_params.items() if k != 'seed'}, filters, resolution)
+            try:
+                seed = _request_seed(project, request_fingerprint, hypertune_params)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            chart_cache_key = _chart_cache_key(project, request_fingerprint, seed)
+            with timing.span('cache'):
+                cached_result = cache.get(chart_cache_key)
+            metrics.record_cache('chart', cached_result is not None)
+            if cached_result is not None:
+                cached_result['cached'] = True
+                return Response(cached_result, status=status.HTTP_200_OK)
+
+            df = transformations.load_frame(project, resolution)
 
             # --- *** NEW: Apply Filters BEFORE chart generation *** ---
-            print(f"Original DataFrame shape: {df.shape}") # Debugging
-            filtered_df = _apply_filters_to_df(df, filters)
-            print(f"Filtered DataFrame shape: {filtered_df.shape}") # Debugging
+            with timing.span('filter'):
+                filtered_df = _apply_filters_to_df(df, filters, ChartContext(column_types=column_types.ColumnTypes.from_metadata(project.metadata_json)))
+            logger.debug("Chart data for project %s: %s rows before filters, %s after", project.id, len(df), len(filtered_df),
+                         extra={'chart_type': chart_type})
             # --- *** END NEW *** ---
 
 
@@ -1086,31 +1274,6 @@ class GenerateChartView(APIView):
                     "error": "Invalid column mapping format. Expected a dictionary."
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            # --- Map chart type to generator function ---
-            chart_generator_map = {
-                'histogram': _generate_histogram,
-                'kde_plot': _generate_kde_plot,
-                'count_plot': _generate_count_plot,
-                'pie_chart': _generate_pie_chart,
-                'pie_chart_3d': _generate_pie_chart_3d,
-                'scatter': _generate_scatter_plot,
-                'line_chart': _generate_line_chart,
-                'area_chart': _generate_area_chart,
-                'bar_chart': _generate_bar_chart,
-                'stacked_bar_chart': _generate_stacked_bar_chart,
-                'violin_plot': _generate_violin_plot,
-                'density_plot': _generate_density_plot,
-                'hexbin_plot': _generate_hexbin_plot,
-                'heatmap': _generate_correlation_heatmap,
-                'pair_plot': _generate_pair_plot,
-                'bubble_chart': _generate_bubble_chart,
-                'scatter_3d': _generate_scatter_3d,
-                'parallel_coordinates': _generate_parallel_coordinates,
-                'sunburst_chart': _generate_sunburst_chart,
-                'treemap': _generate_treemap,
-                'rug_plot': _generate_rug_plot
-            }
-
             chart_generator = chart_generator_map.get(chart_type)
 
             if not chart_generator:
@@ -1124,11 +1287,20 @@ class GenerateChartView(APIView):
                     "error": "Column mapping is required and must be a valid dictionary."
                 }, status=status.HTTP_400_BAD_REQUEST)
 
+            # --- Progressive mode: instant preview on a sample, exact result as a background job ---
+            if progressive and len(filtered_df) > preview_rows:
+                return self._progressive_response(request, project, chart_type, filtered_df, columns, hypertune_params, filters,
+                                                  preview_rows, resolution, seed, chart_cache_key)
+
             # --- *** UPDATE: Pass the FILTERED DataFrame *** ---
             # Pass columns (mapping), the FILTERED DataFrame, AND hypertune params
-            result = chart_generator(filtered_df, columns, hypertune_params)
+            context = _make_context(project, filters, resolution, hypertune_params, seed)
+            result = _run_chart_generator(chart_type, filtered_df, columns, hypertune_params, context, request.build_absolute_uri)
+            result.update(resolution=resolution, seed=seed)
             # --- *** END UPDATE *** ---
 
+            cache.set(chart_cache_key, result, getattr(settings, 'CHART_CACHE_TTL', 60 * 60))
+            result['cached'] = False
             return Response(result, status=status.HTTP_200_OK)
 
         except DataProject.DoesNotExist:
@@ -1137,9 +1309,62 @@ class GenerateChartView(APIView):
             }, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             # Catch DataFrame errors, column missing errors, and runtime exceptions
-            import traceback
-            print("Chart Generation Error:")
-            print(traceback.format_exc())
+            logger.exception("Chart generation failed", extra={'chart_type': chart_type, 'project_id': project_id})
             return Response({
                 "error": str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def _progressive_response(self, request, project, chart_type, filtered_df, columns, hypertune_params, filters,
+                              preview_rows, resolution, seed, chart_cache_key):
+        """Renders the chart on a stratified sample now and queues the exact chart as a background job."""
+        total_rows = len(filtered_df)
+        strata_cols = sampling.low_cardinality_columns(filtered_df, _mapped_columns(columns))
+        sample_df = sampling.stratified_sample(filtered_df, preview_rows, strata_cols, random_state=seed).copy()
+
+        preview_context = _make_context(project, filters, f"{resolution}-preview{len(sample_df)}", hypertune_params, seed)
+        result = _run_chart_generator(chart_type, sample_df, columns, hypertune_params, preview_context, request.build_absolute_uri)
+
+        build_absolute_uri = request.build_absolute_uri
+        def compute_exact(job):
+            job.check_cancelled()
+            exact = _run_chart_generator(chart_type, filtered_df, columns, hypertune_params,
+                                         _make_context(project, filters, resolution, hypertune_params, seed), build_absolute_uri)
+            exact.update(resolution=resolution, seed=seed)
+            # Identical follow-up requests are answered from the chart cache
+            cache.set(chart_cache_key, exact, getattr(settings, 'CHART_CACHE_TTL', 60 * 60))
+            exact.update(preview=False, sample_size=None, total_rows=total_rows)
+            return exact
+
+        job = jobs.submit(request.user, 'chart', compute_exact, meta={'project_id': project.id, 'chart_type': chart_type})
+        result.update(
+            preview=True, sample_size=len(sample_df), total_rows=total_rows, resolution=resolution, seed=seed,
+            job_id=job['id'], job_url=request.build_absolute_uri(reverse('job-status', kwargs={'job_id': job['id']})),
+        )
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class ChartImageView(APIView):
+    """
+    Serves a cached chart image as raw bytes. The URL is content-addressed
+    (SHA-256 of the image), so responses are immutable and the digest itself
+    acts as the access token, like the public report share links. Images are
+    kept per project: they are gone once the project is deleted or they are
+    older than CHART_IMAGE_MAX_AGE.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request, project_id, digest, image_format, *args, **kwargs):
+        path = image_cache.image_path(project_id, digest, image_format)
+        if not os.path.exists(path) or image_cache.is_expired(path):
+            raise Http404("Image not found.")
+
+        etag = f'"{digest}"'
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=image_cache.IMAGE_CONTENT_TYPES[image_format])
+        response['ETag'] = etag
+        # Images are evicted after CHART_IMAGE_MAX_AGE or with their project: keep them out of shared caches
+        response['Cache-Control'] = f'private, max-age={image_cache.get_max_age()}, immutable'
+        return response
@@ -41,6 +41,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Request id for every log record, including the timing record below (api/structured_logging.py)
+    "api.structured_logging.RequestIdMiddleware",
+    # Outermost, so the Server-Timing total covers the whole request (api/timing.py)
+    "api.timing.ServerTimingMiddleware",
+    # Request latency histograms for /api/metrics/ (api/metrics.py)
+    "api.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     # ADDED: CORS Middleware for allowing frontend requests
@@ -50,6 +56,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    # Staff-only per-request cProfile/tracemalloc capture with X-Profile: 1 (api/profiling.py)
+    "api.profiling.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "backend.urls"
@@ -112,7 +120,105 @@ CORS_ALLOWED_ORIGINS = [
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+    ),
+    # Single-pass JSON rendering (orjson when installed, DRF's encoder otherwise)
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+}
+
+# Plotly chart payloads: numeric trace arrays are sent as base64 typed arrays.
+# 'double' keeps float64 precision; 'single' sends float32 (half the bytes).
+PLOTLY_FLOAT_PRECISION = 'double'
+
+# Matplotlib chart images: 'inline' embeds a base64 data URI in the JSON body,
+# 'url' stores the image in a content-addressed cache and returns its URL.
+# Clients can override per request with hypertune_params['image_delivery'].
+CHART_IMAGE_DELIVERY = 'inline'
+CHART_IMAGE_CACHE_DIR = BASE_DIR / 'chart_image_cache'
+CHART_IMAGE_MAX_AGE = 7 * 24 * 60 * 60  # seconds; older cached images are evicted
+CHART_IMAGE_CACHE_MAX_BYTES = 512 * 1024 * 1024  # least recently rendered images are evicted beyond this
+
+# matplotlib/seaborn/plotly/scipy and the DB drivers are imported lazily.
+# Set PRELOAD_HEAVY_MODULES=1 to import them at startup instead (useful with a
+# pre-forking server so workers share the loaded modules).
+PRELOAD_HEAVY_MODULES = os.environ.get('PRELOAD_HEAVY_MODULES', '') == '1'
+
+# Background jobs (exact chart results for progressive mode, long-running
+# cleaning operations). Job state is kept in the Django cache; use a shared
+# cache backend when running more than one worker process.
+JOB_WORKERS = 2
+JOB_RESULT_TTL = 60 * 60  # seconds
+
+# Progressive chart rendering: above this many (filtered) rows, a request with
+# "progressive": true gets a preview computed on a sample of this size first.
+PROGRESSIVE_PREVIEW_ROWS = 20000
+
+# Stored sample tier: projects larger than this keep a stratified sample of
+# this many rows next to their data, served with resolution=sample.
+STORED_SAMPLE_ROWS = 100_000
+
+# Dry runs of model-based imputation (KNN / iterative) are computed on at most
+# this many rows of the stored sample, so the preview stays interactive.
+DRY_RUN_MODEL_ROWS = 2000
+
+# Approximate analytics (hypertune_params analytics_mode='approximate'):
+# analysis-text statistics are estimated from a sample of this many rows and
+# recomputed exactly when their confidence interval exceeds the tolerance.
+APPROX_SAMPLE_ROWS = 200_000
+APPROX_TOLERANCE = 0.01  # relative half-width (absolute for correlations)
+
+# Line/area charts over a time axis: series longer than this are aggregated
+# into calendar buckets (hypertune_params time_bucket='auto').
+TIME_SERIES_MAX_POINTS = 2000
+
+# Cleaning steps are appended to a per-project transformation log and the data
+# file is rewritten when the data is next read ('lazy') or by a background job
+# right after each change ('background'). Head frames of recently changed
+# projects are kept in memory up to this many bytes (api/transformations.py).
+TRANSFORMATION_MATERIALIZE = 'lazy'
+TRANSFORMATION_CACHE_BYTES = 512 * 1024 * 1024
+
+# Project data is stored one file per column with a manifest per version;
+# versions share unchanged column files (api/column_store.py). Besides the
+# current version, the newest versions are kept for undo, up to this many
+# versions and this many bytes of column files per project.
+COLUMN_STORE_RETAINED_VERSIONS = 20
+COLUMN_STORE_RETENTION_BYTES = 2 * 1024 ** 3
+
+# Chart results are cached per (project version, request fingerprint, seed).
+CHART_CACHE_TTL = 60 * 60  # seconds
+
+# Per-request stage timing: Server-Timing response header and 'api.timing' log records.
+SERVER_TIMING_ENABLED = True
+
+# Per-request profiling (X-Profile: 1 or ?profile=1, staff only); newest PROFILE_RETENTION profiles are kept.
+PROFILING_ENABLED = True
+PROFILE_DIR = BASE_DIR / 'profiles'  # outside MEDIA_ROOT, so never served as media
+PROFILE_RETENTION = 50
+
+# Shared secret (X-Metrics-Token header) for the Prometheus endpoint /api/metrics/. Empty = staff users only.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Logging: 'api.*' records are written as JSON lines by a queue listener thread,
+# so request threads never block on stdout (api/structured_logging.py).
+# Levels per module can be overridden with the environment variables below.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'api_async': {
+            '()': 'api.structured_logging.AsyncQueueHandler',
+            'stream': 'ext://sys.stderr',
+        },
+    },
+    'loggers': {
+        'api': {'handlers': ['api_async'], 'level': os.environ.get('API_LOG_LEVEL', 'INFO'), 'propagate': False},
+        'api.timing': {'level': os.environ.get('API_TIMING_LOG_LEVEL', 'INFO')},
+        'api.views.visualization_views': {'level': os.environ.get('API_CHART_LOG_LEVEL', 'INFO')},
+        'api.utils': {'level': os.environ.get('API_OTP_LOG_LEVEL', 'INFO')},
+    },
 }
 
 # Email settings (Password moved to local_settings.py)
@@ -19,6 +19,9 @@ const BULK_IMPUTE_STRATEGIES = [
     { key: 'median_mode', label: 'Median (Num) & Mode (Cat)', numerical: 'median', categorical: 'mode' },
     { key: 'mode_mode', label: 'Mode (Num) & Mode (Cat)', numerical: 'mode', categorical: 'mode' },
     { key: 'constant', label: 'Fill with Constant Value(s)...', numerical: 'constant', categorical: 'constant' },
+    // Model-based: numerical columns only, run as a background job
+    { key: 'knn', label: 'KNN Imputation (Num only)', numerical: null, categorical: null, model: 'knn' },
+    { key: 'iterative', label: 'Iterative Imputation (Num only)', numerical: null, categorical: null, model: 'iterative' },
 ];
 
 const BULK_OUTLIER_STRATEGIES = [
@@ -524,6 +527,24 @@ const ImputeModal = ({ column, onClose, onSubmit, isSubmitting, error }) => {
     );
 };
 
+/**
+ * Inline box plot drawn from whole-table outlier scan statistics (no server-side image)
+ */
+const MiniBoxPlot = ({ stats, width = 120, height = 18 }) => {
+    if (stats.min === null || stats.max === null) return null;
+    const span = stats.max - stats.min || 1;
+    const x = (value) => 2 + ((value - stats.min) / span) * (width - 4);
+    const mid = height / 2;
+    return (
+        <svg width={width} height={height} style={{verticalAlign: 'middle'}}>
+            <line x1={x(stats.whisker_low)} x2={x(stats.whisker_high)} y1={mid} y2={mid} stroke="#6c757d" />
+            <rect x={x(stats.q1)} y={3} width={Math.max(x(stats.q3) - x(stats.q1), 1)} height={height - 6} fill="#add8e6" stroke="#6c757d" />
+            <line x1={x(stats.median)} x2={x(stats.median)} y1={3} y2={height - 3} stroke="#343a40" strokeWidth="2" />
+            {stats.fliers.map((value, i) => <circle key={i} cx={x(value)} cy={mid} r="1.5" fill="var(--danger-color)" />)}
+        </svg>
+    );
+};
+
 /**
  * Specific Outlier Modal
  */
@@ -531,6 +552,7 @@ const OutlierModal = ({ column, onClose, onTreat, isTreating }) => {
     const [outlierData, setOutlierData] = useState(null);
     const [isDetecting, setIsDetecting] = useState(true);
     const [error, setError] = useState(null);
+    const [previews, setPreviews] = useState({});
     const { projectId } = useParams(); // Use mock-safe hook
 
     const getAuthHeader = useCallback(() => {
@@ -556,6 +578,17 @@ const OutlierModal = ({ column, onClose, onTreat, isTreating }) => {
         detectOutliers();
     }, [projectId, column.name, getAuthHeader]);
 
+    // Dry runs: how many rows each treatment would change, before committing to one
+    useEffect(() => {
+        if (!outlierData || outlierData.outlier_count === 0) return;
+        ['cap', 'remove'].forEach(method => {
+            const payload = { project_id: projectId, column_name: column.name, method: method, dry_run: true };
+            axios.post('http://127.0.0.1:8000/api/projects/treat-outliers/', payload, getAuthHeader())
+                .then(response => setPreviews(prev => ({ ...prev, [method]: response.data })))
+                .catch(() => {});
+        });
+    }, [outlierData, projectId, column.name, getAuthHeader]);
+
     return (
         <Modal onClose={onClose}>
             <div className="modal-header">
@@ -589,6 +622,13 @@ const OutlierModal = ({ column, onClose, onTreat, isTreating }) => {
                             <div style={{marginTop: '20px', borderTop: '1px solid #eee', paddingTop: '15px'}}>
                                 <h4 style={{marginTop: 0}}>Treatment Options</h4>
                                 <p style={{fontSize: '14px'}}>How would you like to handle the {outlierData.outlier_count} outliers?</p>
+                                {previews.cap && (
+                                    <p style={{fontSize: '13px'}}><strong>Cap:</strong> changes {previews.cap.exact ? '' : '~'}{previews.cap.estimated_rows_affected} rows
+                                        {previews.cap.columns[0]?.after?.mean != null && ` (mean ${previews.cap.columns[0].before.mean.toFixed(2)} → ${previews.cap.columns[0].after.mean.toFixed(2)})`}</p>
+                                )}
+                                {previews.remove && (
+                                    <p style={{fontSize: '13px'}}><strong>Remove:</strong> drops {previews.remove.exact ? '' : '~'}{previews.remove.estimated_rows_affected} of {previews.remove.total_rows} rows</p>
+                                )}
                             </div>
                         )}
                     </>
@@ -618,7 +658,7 @@ const OutlierModal = ({ column, onClose, onTreat, isTreating }) => {
 /**
  * Component for the "Preparation & Cleaning" Tab
  */
-const PreparationTab = ({ metadata, onDataRefreshed, getAuthHeader }) => {
+const PreparationTab = ({ metadata, dataVersion, onDataRefreshed, getAuthHeader }) => {
     const { projectId } = useParams(); // Use mock-safe hook
 
     // --- Modal States ---
@@ -647,6 +687,11 @@ const PreparationTab = ({ metadata, onDataRefreshed, getAuthHeader }) => {
     const [removeError, setRemoveError] = useState(null);
     const [recodeError, setRecodeError] = useState(null);
 
+    // --- Undo/Redo States ---
+    const [history, setHistory] = useState({ can_undo: false, can_redo: false });
+    const [isMovingVersion, setIsMovingVersion] = useState(false);
+    const [historyError, setHistoryError] = useState(null);
+
     // --- Bulk Imputation States ---
     const [isBulkProcessing, setIsBulkProcessing] = useState(false);
     const [bulkStrategy, setBulkStrategy] = useState('none');
@@ -656,6 +701,7 @@ const PreparationTab = ({ metadata, onDataRefreshed, getAuthHeader }) => {
     const [bulkImputeSuccess, setBulkImputeSuccess] = useState(null);
     const [bulkImputeError, setBulkImputeError] = useState(null);
     const [isImputeAllSelected, setIsImputeAllSelected] = useState(false);
+    const [imputeJob, setImputeJob] = useState(null);
 
     // --- Bulk Outlier States ---
     const [isOutlierProcessing, setIsOutlierProcessing] = useState(false);
@@ -664,6 +710,14 @@ const PreparationTab = ({ metadata, onDataRefreshed, getAuthHeader }) => {
     const [isOutlierAllSelected, setIsOutlierAllSelected] = useState(false);
     const [bulkOutlierSuccess, setBulkOutlierSuccess] = useState(null);
     const [bulkOutlierError, setBulkOutlierError] = useState(null);
+    const [outlierScan, setOutlierScan] = useState({});
+
+    // --- Derived Column States ---
+    const [deriveName, setDeriveName] = useState('');
+    const [deriveExpression, setDeriveExpression] = useState('');
+    const [derivePreview, setDerivePreview] = useState(null);
+    const [deriveError, setDeriveError] = useState(null);
+    const [isDeriving, setIsDeriving] = useState(false);
     
     // --- Memoized Derived Data ---
     const missingColumns = useMemo(() => metadata.metadata.filter(col => col.missing_count > 0), [metadata]);
@@ -702,39 +756,70 @@ const PreparationTab = ({ metadata, onDataRefreshed, getAuthHeader }) => {
         setBulkOutlierSuccess(null); setIsOutlierAllSelected(false);
     };
 
+    // 409: the data was changed by another request (tab, user) since it was loaded; show the current version
+    const reloadOnConflict = (err) => { if (err.response?.status === 409) onDataRefreshed(); };
+
+    // --- Undo/Redo ---
+    useEffect(() => {
+        const authHeader = getAuthHeader();
+        if (!authHeader) return;
+        axios.get(`http://127.0.0.1:8000/api/projects/${projectId}/transformations/`, authHeader)
+            .then(response => setHistory({ can_undo: response.data.can_undo, can_redo: response.data.can_redo }))
+            .catch(() => setHistory({ can_undo: false, can_redo: false }));
+    }, [projectId, dataVersion, getAuthHeader]);
+
+    // --- Whole-table outlier scan (one request for every numerical column) ---
+    useEffect(() => {
+        const authHeader = getAuthHeader();
+        if (!authHeader) return;
+        axios.post('http://127.0.0.1:8000/api/projects/detect-outliers/', { project_id: projectId, mode: 'scan' }, authHeader)
+            .then(response => setOutlierScan(Object.fromEntries(response.data.columns.map(c => [c.column_name, c]))))
+            .catch(() => setOutlierScan({}));
+    }, [projectId, dataVersion, getAuthHeader]);
+
+    const handleMoveVersion = async (direction) => {
+        setIsMovingVersion(true); setHistoryError(null);
+        try {
+            await axios.post(`http://127.0.0.1:8000/api/projects/${direction}/`, { project_id: projectId, expected_version: dataVersion }, getAuthHeader());
+            onDataRefreshed(); // Notify parent to refresh
+        } catch (err) { setHistoryError(err.response?.data?.error || `Failed to ${direction}.`); reloadOnConflict(err);
+        } finally { setIsMovingVersion(false); }
+    };
+
     // --- Action Submit Handlers ---
     const handleImputeSubmit = async (method, constantValue) => {
         setIsImputing(true); setImputationError(null);
         try {
-            const payload = { project_id: projectId, column_name: selectedColumn.name, method: method, constant_value: method === 'constant' ? constantValue : null };
+            const payload = { project_id: projectId, expected_version: dataVersion, column_name: selectedColumn.name, method: method, constant_value: method === 'constant' ? constantValue : null };
             await axios.post('http://127.0.0.1:8000/api/projects/impute/', payload, getAuthHeader());
             onDataRefreshed(); // Notify parent to refresh
             handleCloseImputeModal();
-        } catch (err) { setImputationError(err.response?.data?.error || 'An error occurred.');
+        } catch (err) { setImputationError(err.response?.data?.error || 'An error occurred.'); reloadOnConflict(err);
         } finally { setIsImputing(false); }
     };
 
     const handleRemoveConfirm = async () => {
         setIsRemoving(true); setRemoveError(null);
         try {
-            const payload = { project_id: projectId, column_name: columnToRemove.name };
+            const payload = { project_id: projectId, expected_version: dataVersion, column_name: columnToRemove.name };
             await axios.post('http://127.0.0.1:8000/api/projects/remove-column/', payload, getAuthHeader());
             onDataRefreshed(); // Notify parent to refresh
             handleCloseRemoveModal();
-        } catch (err) { setRemoveError(err.response?.data?.error || 'An error occurred.');
+        } catch (err) { setRemoveError(err.response?.data?.error || 'An error occurred.'); reloadOnConflict(err);
         } finally { setIsRemoving(false); }
     };
     
     const handleTreatOutliers = async (method) => {
         setIsTreating(true);
         try {
-            const payload = { project_id: projectId, column_name: selectedColumn.name, method: method };
+            const payload = { project_id: projectId, expected_version: dataVersion, column_name: selectedColumn.name, method: method };
             await axios.post('http://127.0.0.1:8000/api/projects/treat-outliers/', payload, getAuthHeader());
             onDataRefreshed(); // Notify parent to refresh
             handleCloseOutlierModal();
         } catch (err) {
             // Error handling is inside the modal component, but we'll log it too
             console.error("Outlier treatment failed:", err);
+            reloadOnConflict(err);
         } finally {
             setIsTreating(false);
         }
@@ -744,11 +829,11 @@ const PreparationTab = ({ metadata, onDataRefreshed, getAuthHeader }) => {
         setIsRecoding(true); setRecodeError(null);
         const recodeMap = {}; selectedValues.forEach(oldValue => { recodeMap[oldValue] = newValue; });
         try {
-            const payload = { project_id: projectId, column_name: columnToRecode.name, recode_map: recodeMap };
+            const payload = { project_id: projectId, expected_version: dataVersion, column_name: columnToRecode.name, recode_map: recodeMap };
             await axios.post('http://127.0.0.1:8000/api/recode-column/', payload, getAuthHeader());
             onDataRefreshed(); // Notify parent to refresh
             handleCloseRecodeModal();
-        } catch (err) { setRecodeError(err.response?.data?.error || 'An error occurred during recoding.');
+        } catch (err) { setRecodeError(err.response?.data?.error || 'An error occurred during recoding.'); reloadOnConflict(err);
         } finally { setIsRecoding(false); }
     };
     
@@ -765,60 +850,105 @@ const PreparationTab = ({ metadata, onDataRefreshed, getAuthHeader }) => {
             if (catCols.length > 0 && bulkConstantCategorical.trim() === '') { setBulkImputeError("Constant categorical value is required."); return; }
         }
 
-        setIsBulkProcessing(true); setBulkImputeError(null); setBulkImputeSuccess(null);
-        const authHeader = getAuthHeader();
         const strategyDef = BULK_IMPUTE_STRATEGIES.find(s => s.key === bulkStrategy);
-        let errorCount = 0; let successCount = 0;
+        if (strategyDef.model) { await runModelImpute(strategyDef.model, colsToProcess); return; }
 
+        setIsBulkProcessing(true); setBulkImputeError(null); setBulkImputeSuccess(null);
+
+        // One pipeline request: the backend loads and saves the data once for all columns
+        const steps = [];
         for (const colName of colsToProcess) {
             const colMeta = metadata.metadata.find(c => c.name === colName);
             if (!colMeta || colMeta.missing_count === 0) continue;
             const typeKey = colMeta.type === 'numerical' ? 'numerical' : 'categorical';
             let method = strategyDef[typeKey];
             let constant_value = (method === 'constant') ? (colMeta.type === 'numerical' ? bulkConstantNumerical : bulkConstantCategorical) : null;
+            steps.push({ operation: 'impute', column_name: colName, method: method, constant_value: constant_value });
+        }
 
+        let succeeded = steps.length === 0;
+        if (steps.length > 0) {
             try {
-                const payload = { project_id: projectId, column_name: colName, method: method, constant_value: constant_value };
-                await axios.post('http://127.0.0.1:8000/api/projects/impute/', payload, { ...authHeader });
-                successCount++;
-            } catch (err) { errorCount++; setBulkImputeError(`Failed to impute ${colName}: ${err.response?.data?.error || 'Unknown error'}`); break; }
+                await axios.post('http://127.0.0.1:8000/api/projects/cleaning-pipeline/', { project_id: projectId, expected_version: dataVersion, steps: steps }, getAuthHeader());
+                succeeded = true;
+            } catch (err) { setBulkImputeError(`Failed to impute: ${err.response?.data?.error || 'Unknown error'}`); reloadOnConflict(err); }
         }
 
         setIsBulkProcessing(false); setSelectedBulkColumns([]);
         setIsImputeAllSelected(false);
 
-        if (errorCount === 0) {
-            setBulkImputeSuccess(`Successfully imputed ${successCount} column(s).`);
+        if (succeeded) {
+            setBulkImputeSuccess(`Successfully imputed ${steps.length} column(s).`);
             onDataRefreshed(); // Notify parent
         }
     };
     
+    // KNN / iterative imputation runs as a background job: poll its progress until it finishes
+    const runModelImpute = async (method, colNames) => {
+        const columns = metadata.metadata.filter(c => colNames.includes(c.name) && c.type === 'numerical').map(c => c.name);
+        if (columns.length === 0) { setBulkImputeError("Model-based imputation requires numerical columns."); return; }
+        setIsBulkProcessing(true); setBulkImputeError(null); setBulkImputeSuccess(null);
+        try {
+            const response = await axios.post('http://127.0.0.1:8000/api/projects/model-impute/', { project_id: projectId, expected_version: dataVersion, columns: columns, method: method }, getAuthHeader());
+            let job = response.data;
+            setImputeJob(job);
+            while (!['done', 'failed', 'cancelled'].includes(job.status)) {
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                job = (await axios.get(`http://127.0.0.1:8000/api/jobs/${job.id}/`, getAuthHeader())).data;
+                setImputeJob(job);
+            }
+            if (job.status === 'done') { setBulkImputeSuccess(`Successfully imputed ${columns.length} column(s) (${method}).`); onDataRefreshed(); }
+            else if (job.status === 'failed') setBulkImputeError(`Failed to impute: ${job.error}`);
+            else setBulkImputeSuccess('Imputation cancelled.');
+        } catch (err) { setBulkImputeError(`Failed to impute: ${err.response?.data?.error || 'Unknown error'}`); reloadOnConflict(err);
+        } finally { setIsBulkProcessing(false); setImputeJob(null); setSelectedBulkColumns([]); setIsImputeAllSelected(false); }
+    };
+    const handleCancelImputeJob = () => {
+        if (imputeJob) axios.post(`http://127.0.0.1:8000/api/jobs/${imputeJob.id}/cancel/`, {}, getAuthHeader()).catch(() => {});
+    };
+
+    // dryRun: preview the new column on the stored sample instead of adding it
+    const handleDeriveColumn = async (dryRun) => {
+        if (!deriveName.trim() || !deriveExpression.trim()) { setDeriveError("Column name and expression are required."); return; }
+        setIsDeriving(true); setDeriveError(null); setDerivePreview(null);
+        try {
+            const payload = { project_id: projectId, expected_version: dataVersion, column_name: deriveName.trim(), expression: deriveExpression, dry_run: dryRun };
+            const response = await axios.post('http://127.0.0.1:8000/api/projects/derive-column/', payload, getAuthHeader());
+            if (dryRun) { setDerivePreview(response.data); }
+            else { setDeriveName(''); setDeriveExpression(''); onDataRefreshed(); }
+        } catch (err) { setDeriveError(err.response?.data?.error || 'Failed to derive column.'); reloadOnConflict(err);
+        } finally { setIsDeriving(false); }
+    };
+
     const handleExecuteBulkOutlier = async () => {
         if (bulkOutlierStrategy === 'none') { setBulkOutlierError("Please select an outlier treatment strategy."); return; }
         const colsToProcess = isOutlierAllSelected ? numericalColumns : selectedBulkOutlierColumns;
         if (colsToProcess.length === 0) { setBulkOutlierError("No numerical columns selected for treatment."); return; }
 
         setIsOutlierProcessing(true); setBulkOutlierError(null); setBulkOutlierSuccess(null);
-        const authHeader = getAuthHeader();
         const strategyDef = BULK_OUTLIER_STRATEGIES.find(s => s.key === bulkOutlierStrategy);
-        let errorCount = 0; let successCount = 0;
 
+        // One pipeline request: the backend loads and saves the data once for all columns
+        const steps = [];
         for (const colName of colsToProcess) {
             const colMeta = metadata.metadata.find(c => c.name === colName);
             if (!colMeta || colMeta.type !== 'numerical') continue;
+            steps.push({ operation: 'treat_outliers', column_name: colName, method: strategyDef.method });
+        }
 
+        let succeeded = steps.length === 0;
+        if (steps.length > 0) {
             try {
-                const payload = { project_id: projectId, column_name: colName, method: strategyDef.method };
-                await axios.post('http://127.0.0.1:8000/api/projects/treat-outliers/', payload, { ...authHeader });
-                successCount++;
-            } catch (err) { errorCount++; setBulkOutlierError(`Failed to treat outliers in ${colName}: ${err.response?.data?.error || 'Unknown error'}`); break; }
+                await axios.post('http://127.0.0.1:8000/api/projects/cleaning-pipeline/', { project_id: projectId, expected_version: dataVersion, steps: steps }, getAuthHeader());
+                succeeded = true;
+            } catch (err) { setBulkOutlierError(`Failed to treat outliers: ${err.response?.data?.error || 'Unknown error'}`); reloadOnConflict(err); }
         }
 
         setIsOutlierProcessing(false); setSelectedBulkOutlierColumns([]);
         setIsOutlierAllSelected(false);
 
-        if (errorCount === 0) {
-            setBulkOutlierSuccess(`Successfully applied outlier treatment to ${successCount} column(s).`);
+        if (succeeded) {
+            setBulkOutlierSuccess(`Successfully applied outlier treatment to ${steps.length} column(s).`);
             onDataRefreshed(); // Notify parent
         }
     };
@@ -863,6 +993,18 @@ const PreparationTab = ({ metadata, onDataRefreshed, getAuthHeader }) => {
             )}
             
             <h3>Column Analysis & Cleaning Tools</h3>
+
+            {/* Undo/Redo of cleaning steps */}
+            <div className="bulk-action-bar">
+                <h4>History:</h4>
+                <button onClick={() => handleMoveVersion('undo')} disabled={!history.can_undo || isMovingVersion} className="btn btn-secondary">
+                    {isMovingVersion ? <IconLoader/> : 'Undo'}
+                </button>
+                <button onClick={() => handleMoveVersion('redo')} disabled={!history.can_redo || isMovingVersion} className="btn btn-secondary">
+                    {isMovingVersion ? <IconLoader/> : 'Redo'}
+                </button>
+            </div>
+            {historyError && <div className="message-bar message-error"><IconAlert/> {historyError}</div>}
             
             {/* Bulk Imputation UI */}
             <div className="bulk-action-bar">
@@ -880,6 +1022,12 @@ const PreparationTab = ({ metadata, onDataRefreshed, getAuthHeader }) => {
                 <button onClick={handleExecuteBulkImpute} disabled={(selectedBulkColumns.length === 0 && !isImputeAllSelected) || bulkStrategy === 'none' || isBulkProcessing} className="btn btn-success">
                     {isBulkProcessing ? <IconLoader/> : 'Apply'}
                 </button>
+                {imputeJob && (
+                    <>
+                        <span style={{fontSize: '0.9em'}}>{Math.round((imputeJob.progress || 0) * 100)}%</span>
+                        <button onClick={handleCancelImputeJob} className="btn btn-danger">Cancel</button>
+                    </>
+                )}
             </div>
             {bulkImputeSuccess && <div className="message-bar message-success"><IconCheck/> {bulkImputeSuccess}</div>}
             {bulkImputeError && <div className="message-bar message-error"><IconAlert/> {bulkImputeError}</div>}
@@ -898,9 +1046,24 @@ const PreparationTab = ({ metadata, onDataRefreshed, getAuthHeader }) => {
             {bulkOutlierSuccess && <div className="message-bar message-success"><IconCheck/> {bulkOutlierSuccess}</div>}
             {bulkOutlierError && <div className="message-bar message-error"><IconAlert/> {bulkOutlierError}</div>}
 
+            {/* Derived Column UI */}
+            <div className="bulk-action-bar">
+                <h4>Derive Column:</h4>
+                <input type="text" placeholder="New column" value={deriveName} onChange={(e) => { setDeriveName(e.target.value); setDerivePreview(null); }} className="form-input" disabled={isDeriving}/>
+                <input type="text" placeholder='e.g. where(total > 0, paid / total, None)' value={deriveExpression} onChange={(e) => { setDeriveExpression(e.target.value); setDerivePreview(null); }} className="form-input" style={{flex: 1}} disabled={isDeriving}/>
+                <button onClick={() => handleDeriveColumn(true)} disabled={isDeriving} className="btn btn-light">Preview</button>
+                <button onClick={() => handleDeriveColumn(false)} disabled={isDeriving} className="btn btn-success">
+                    {isDeriving ? <IconLoader/> : 'Add'}
+                </button>
+            </div>
+            {derivePreview && (
+                <div className="message-bar message-success"><IconCheck/> {derivePreview.result_type} column; examples: {derivePreview.examples.slice(0, 3).map(row => JSON.stringify(row.after?.[deriveName.trim()])).join(', ')}</div>
+            )}
+            {deriveError && <div className="message-bar message-error"><IconAlert/> {deriveError}</div>}
+
             {/* Column Table */}
             <table className="column-table">
-                <thead><tr><th>Column Name</th><th>Type</th><th>Missing</th><th>Unique</th><th>Actions</th></tr></thead>
+                <thead><tr><th>Column Name</th><th>Type</th><th>Missing</th><th>Unique</th><th>Outliers</th><th>Actions</th></tr></thead>
                 <tbody>
                     {metadata.metadata.map((col) => {
                         const hasMissing = col.missing_count > 0;
@@ -914,6 +1077,12 @@ const PreparationTab = ({ metadata, onDataRefreshed, getAuthHeader }) => {
                                 <td><span style={{backgroundColor: '#6c757d', color: 'white', padding: '3px 8px', borderRadius: '12px', fontSize: '12px'}}>{col.type}</span></td>
                                 <td style={{color: hasMissing ? 'var(--danger-color)' : 'inherit', fontWeight: 'bold'}}>{col.missing_count}</td>
                                 <td>{col.unique_values}</td>
+                                <td>{outlierScan[col.name] && (
+                                    <span title={`IQR: ${outlierScan[col.name].outlier_count}, z-score: ${outlierScan[col.name].z_outlier_count}, MAD: ${outlierScan[col.name].mad_outlier_count}`}>
+                                        <MiniBoxPlot stats={outlierScan[col.name]} />
+                                        <span style={{marginLeft: '6px', color: outlierScan[col.name].outlier_count > 0 ? 'var(--danger-color)' : 'inherit', fontWeight: 'bold'}}>{outlierScan[col.name].outlier_count}</span>
+                                    </span>
+                                )}</td>
                                 <td><div className="actions-cell">
                                     <input type="checkbox" checked={isImputeSelected} onChange={() => handleSelectBulkColumn(col.name)} disabled={!hasMissing || isBulkProcessing || isImputeAllSelected} title={hasMissing ? "Select for Bulk Imputation" : "No missing values"} />
                                     <button onClick={() => handleImputeClick(col)} disabled={!hasMissing} className="btn btn-warning">Impute</button>
@@ -1731,6 +1900,7 @@ const DataPrepPage = () => {
                     {activeTab === 'preparation' && (
                         <PreparationTab 
                             metadata={metadata} 
+                            dataVersion={project.data_version} // Sent as expected_version with every cleaning request
                             onDataRefreshed={fetchProjectDetails} // Pass the refresh function
                             getAuthHeader={getAuthHeader}
                         />